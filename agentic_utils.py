@@ -1,78 +1,154 @@
 import os
 import re
 import json
-import pandas as pd
-import chromadb
-from groq import Groq
-from langgraph.graph import StateGraph, END
+import time
+import uuid
 from typing import Dict, Any, List, TypedDict
 import logging
+import threading
 from datetime import datetime
 from dotenv import load_dotenv
-from chroma_db_utils import get_or_create_collection
+from chroma_db_utils import get_env_var, get_or_create_collection
+from case_result_utils import CaseResult, format_log_field
+from profiling_utils import profile_run, profile_node
+from context_utils import build_context, find_fast_path_hit, render_fast_path_answer
+
+# Heavy clients (groq, chromadb, langgraph) are created on first use so that
+# importing this module - e.g. from the Streamlit app - stays cheap
 
-# Load environment variables - with Streamlit secrets fallback
-def get_env_var(key, default=None):
-    """Get environment variable from Streamlit secrets or os.environ"""
-    try:
-        import streamlit as st
-        return st.secrets[key]
-    except:
-        return os.getenv(key, default)
-
-# Setup logging - single log file per session
-log_dir = get_env_var('LOG_DIR', 'logs')
-os.makedirs(log_dir, exist_ok=True)
-log_filename = f"{log_dir}/agent_flow.log"
-
-# Clear previous handlers
-logging.getLogger().handlers.clear()
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_filename, mode='w'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-# Initialize clients
-groq_api_key = get_env_var('GROQ_API_KEY')
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY not found in environment variables or Streamlit secrets")
+_logging_configured = False
+_groq_client = None
+_collection = None
+_collection_name = None
+_init_lock = threading.Lock()
+# Off in processes that run one pipeline at a time (queue workers) - the
+# batcher only groups concurrent calls of one process, so there it would
+# only add its collect window
+_extraction_batching_allowed = True
+
+def setup_logging(file_mode='w'):
+    """Setup logging - single log file per session, configured on the first run"""
+    global _logging_configured
+    if _logging_configured:
+        return
+    
+    log_dir = get_env_var('LOG_DIR', 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    log_filename = f"{log_dir}/agent_flow.log"
+    
+    # Clear previous handlers
+    logging.getLogger().handlers.clear()
+    
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_filename, mode=file_mode),
+            logging.StreamHandler()
+        ]
+    )
+    _logging_configured = True
+
+def disable_extraction_batching():
+    """Extract each transcript on its own, whatever EXTRACTION_BATCH_SIZE says"""
+    global _extraction_batching_allowed
+    _extraction_batching_allowed = False
+
+def get_groq_client():
+    """Get the shared rate-limited, retrying Groq client, creating it on first use"""
+    with _init_lock:
+        return _get_groq_client_locked()
+
+def _get_groq_client_locked():
+    global _groq_client
+    if _groq_client is None:
+        groq_api_key = get_env_var('GROQ_API_KEY')
+        if not groq_api_key:
+            raise ValueError("GROQ_API_KEY not found in environment variables or Streamlit secrets")
+        
+        from llm_client_utils import create_groq_client
+        _groq_client = create_groq_client(groq_api_key)
+    return _groq_client
+
+def get_collection():
+    """Get the shared ChromaDB collection, connecting on first use"""
+    with _init_lock:
+        return _get_collection_locked()
+
+def _get_collection_locked():
+    global _collection, _collection_name
+    from kb_index_utils import get_active_collection_name
+    # A re-index switches the active collection - follow it without a restart
+    active_name = get_active_collection_name()
+    if _collection is None or _collection_name != active_name:
+        try:
+            # Only queried here - served by the read replica when one is configured
+            _collection = get_or_create_collection(active_name, role="read")
+            logger.info(f"Successfully connected to ChromaDB collection {active_name}")
+        except Exception as e:
+            # A missing collection was already created above - anything else is a real error
+            logger.error(f"Error connecting to ChromaDB: {e}")
+            raise
+        _collection_name = active_name
+    return _collection
 
-groq_client = Groq(api_key=groq_api_key)
+def warm_up_knowledge_base() -> bool:
+    """Load the embedding model and the HNSW index with a dummy query before real requests arrive
 
-# Initialize ChromaDB collection
-try:
-    collection = get_or_create_collection()
-    logger.info("Successfully connected to ChromaDB collection")
-except Exception as e:
-    logger.error(f"Error connecting to ChromaDB: {e}")
-    chroma_db_path = get_env_var('CHROMA_DB_PATH', './chroma_db')
-    chroma_client = chromadb.PersistentClient(path=chroma_db_path)
-    collection = chroma_client.create_collection("customer_service_kb")
+    KB_WARMUP=false skips it. Returns whether the query succeeded.
+    """
+    if str(get_env_var('KB_WARMUP', 'true')).lower() != 'true':
+        return False
+    started = time.perf_counter()
+    try:
+        get_collection().query(query_texts=["warm up"], n_results=1, include=["distances"])
+    except Exception as e:
+        logger.warning(f"Knowledge base warm-up failed: {e}")
+        return False
+    logger.info(f"Knowledge base warmed up in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return True
 
 # Rest of your existing code remains the same...
 class AgentState(TypedDict):
     audio_file: str
+    processed_audio_file: str
     transcript: str
     extracted_info: Dict[str, Any]
     retrieved_context: List[Dict]
     generated_response: str
-    final_output: Dict[str, Any]
+    final_output: Any  # CaseResult once the run is finalized
     agent_logs: List[Dict]
+    deadline: float
+    stage_timings: Dict[str, float]
 
-def log_agent_step(agent_name: str, status: str, message: str, state: AgentState):
-    """Log agent step and store in state"""
+def check_deadline(state: AgentState, agent_name: str):
+    """Raise if the request's end-to-end deadline (epoch seconds) has already passed"""
+    deadline = state.get("deadline")
+    if deadline and time.time() >= deadline:
+        from llm_client_utils import DeadlineExceededError
+        raise DeadlineExceededError(f"Request deadline exceeded before {agent_name}")
+
+def log_agent_step(agent_name: str, status: str, message: str, state: AgentState, path: str = None, field: str = None):
+    """Log agent step and store in state
+
+    With field set the entry only names the state field holding the output,
+    the full text goes to the log file but is not copied into agent_logs.
+    """
     log_entry = {
         "agent": agent_name,
         "status": status,
-        "message": message,
         "timestamp": datetime.now().isoformat()
     }
+    if field:
+        log_entry["field"] = field
+        message = format_log_field(field, state.get(field))
+    else:
+        log_entry["message"] = message
+    # Which branch the agent took, e.g. FAQ fast path vs generated response
+    if path:
+        log_entry["path"] = path
     
     if "agent_logs" not in state:
         state["agent_logs"] = []
@@ -85,12 +161,42 @@ def log_agent_step(agent_name: str, status: str, message: str, state: AgentState
     
     return state
 
+def audio_preprocessing_agent(state: AgentState) -> AgentState:
+    """Optional Agent 0: Downmix, resample and trim silence before transcription"""
+    try:
+        check_deadline(state, "Audio Preprocessing Agent")
+        from audio_utils import preprocess_audio
+        output_path, stats = preprocess_audio(state["audio_file"])
+        if output_path != state["audio_file"]:
+            state["processed_audio_file"] = output_path
+        
+        return log_agent_step(
+            "Audio Preprocessing Agent", 
+            "success", 
+            f"Bytes: {stats['original_bytes']} -> {stats['processed_bytes']} ({stats['bytes_saved']} saved)\n"
+            f"Seconds: {stats['original_seconds']} -> {stats['processed_seconds']} ({stats['seconds_saved']} saved)", 
+            state
+        )
+    except Exception as e:
+        # Transcription still runs on the original file
+        return log_agent_step(
+            "Audio Preprocessing Agent", 
+            "error", 
+            f"Error: {str(e)} - Using original audio", 
+            state
+        )
+
 def transcription_agent(state: AgentState) -> AgentState:
     """Agent 1: Convert speech to text"""
     try:
-        with open(state["audio_file"], "rb") as file:
-            transcription = groq_client.audio.transcriptions.create(
-                file=(state["audio_file"], file.read()),
+        check_deadline(state, "Transcription Agent")
+        audio_file = state.get("processed_audio_file")
+        if not audio_file or not os.path.exists(audio_file):
+            audio_file = state["audio_file"]
+        with open(audio_file, "rb") as file:
+            transcription = get_groq_client().audio.transcriptions.create(
+                file=(audio_file, file.read()),
+                deadline=state.get("deadline"),
                 model="whisper-large-v3",
                 response_format="verbose_json",
             )
@@ -99,8 +205,9 @@ def transcription_agent(state: AgentState) -> AgentState:
         return log_agent_step(
             "Transcription Agent", 
             "success", 
-            f"Transcript: {state['transcript']}", 
-            state
+            None, 
+            state,
+            field="transcript"
         )
     except Exception as e:
         return log_agent_step(
@@ -109,13 +216,19 @@ def transcription_agent(state: AgentState) -> AgentState:
             f"Error: {str(e)}", 
             state
         )
+    finally:
+        # The preprocessed copy only exists for this upload - a retry falls back to the original file
+        processed_audio_file = state.get("processed_audio_file")
+        if processed_audio_file and os.path.exists(processed_audio_file):
+            os.remove(processed_audio_file)
 
-def info_extractor_agent(state: AgentState) -> AgentState:
-    """Agent 2: Extract topic, description, and sentiment"""
-    try:
-        prompt = f"""Analyze this customer conversation from telecom domain and extract the following information in JSON format:
+EXTRACTION_MODEL = "llama-3.1-8b-instant"
 
-Conversation: {state['transcript']}
+def build_extraction_prompt(transcript: str) -> str:
+    """Prompt asking for topic, description and sentiment of one conversation"""
+    return f"""Analyze this customer conversation from telecom domain and extract the following information in JSON format:
+
+Conversation: {transcript}
 
 Extract and return ONLY a valid JSON object with these exact keys:
 - "topic_name": main topic or issue
@@ -124,37 +237,61 @@ Extract and return ONLY a valid JSON object with these exact keys:
 
 Return ONLY the JSON object, no additional text or explanation.
 """
+
+def parse_json_response(response_text: str, pattern: str = r'\{.*\}'):
+    """Parse JSON from an LLM reply, tolerating markdown fences and surrounding text"""
+    # Clean the response - remove any markdown formatting
+    response_text = response_text.replace('```json', '').replace('```', '').strip()
+    
+    # Try to parse JSON directly
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError:
+        # If direct parsing fails, try to extract JSON
+        json_match = re.search(pattern, response_text, re.DOTALL)
+        if json_match:
+            json_str = json_match.group(0).strip()
+            return json.loads(json_str)
+        raise ValueError("No valid JSON found in response")
+
+def extract_info(transcript: str, deadline: float = None) -> Dict[str, Any]:
+    """One extraction round-trip for a single transcript"""
+    from metrics_utils import increment
+    
+    completion = get_groq_client().chat.completions.create(
+        model=EXTRACTION_MODEL,
+        messages=[{"role": "user", "content": build_extraction_prompt(transcript)}],
+        temperature=0,
+        deadline=deadline
+    )
+    
+    increment("extraction.calls")
+    increment("extraction.items")
+    usage = getattr(completion, "usage", None)
+    if usage is not None and getattr(usage, "total_tokens", None):
+        increment("extraction.tokens", usage.total_tokens)
+    
+    return parse_json_response(completion.choices[0].message.content.strip())
+
+def info_extractor_agent(state: AgentState) -> AgentState:
+    """Agent 2: Extract topic, description, and sentiment"""
+    try:
+        check_deadline(state, "Info Extractor Agent")
         
-        completion = groq_client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
-        
-        response_text = completion.choices[0].message.content.strip()
-        
-        # Clean the response - remove any markdown formatting
-        response_text = response_text.replace('```json', '').replace('```', '').strip()
-        
-        # Try to parse JSON directly
-        try:
-            extracted_data = json.loads(response_text)
-            state["extracted_info"] = extracted_data
-        except json.JSONDecodeError:
-            # If direct parsing fails, try to extract JSON
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0).strip()
-                extracted_data = json.loads(json_str)
-                state["extracted_info"] = extracted_data
-            else:
-                raise ValueError("No valid JSON found in response")
+        # Concurrent callers (replay, threaded workers) can share one request per batch
+        if _extraction_batching_allowed and int(get_env_var('EXTRACTION_BATCH_SIZE', 1)) > 1:
+            from batch_extraction_utils import get_extraction_batcher
+            future = get_extraction_batcher().submit(state['transcript'], deadline=state.get("deadline"))
+            state["extracted_info"] = future.result()
+        else:
+            state["extracted_info"] = extract_info(state['transcript'], deadline=state.get("deadline"))
         
         return log_agent_step(
             "Info Extractor Agent", 
             "success", 
-            f"Extracted Info: {json.dumps(state['extracted_info'], indent=2)}", 
-            state
+            None, 
+            state,
+            field="extracted_info"
         )
     except Exception as e:
         state["extracted_info"] = {
@@ -169,31 +306,65 @@ Return ONLY the JSON object, no additional text or explanation.
             state
         )
 
-def context_retrieval_agent(state: AgentState) -> AgentState:
-    """Agent 3: Retrieve context and generate response"""
+def knowledge_base_query_text(extracted_info: Dict[str, Any]) -> str:
+    """Text the knowledge base is queried with - equal texts retrieve the same cases"""
+    return f"{extracted_info['topic_name']} {extracted_info['description']}"
+
+def query_knowledge_base(extracted_info: Dict[str, Any]) -> List[Dict]:
+    """Closest knowledge base cases to the extracted topic and description"""
+    results = get_collection().query(
+        query_texts=[knowledge_base_query_text(extracted_info)],
+        n_results=int(get_env_var('CONTEXT_N_RESULTS', 3)),
+        include=["documents", "metadatas", "distances"]
+    )
+    
+    return [
+        {
+            "content": doc,
+            "metadata": results['metadatas'][0][i],
+            "distance": results['distances'][0][i]
+        }
+        for i, doc in enumerate(results['documents'][0])
+    ]
+
+def context_retrieval_agent(state: AgentState, retrieved_context: List[Dict] = None) -> AgentState:
+    """Agent 3: Retrieve context and generate response
+
+    retrieved_context skips the knowledge base query - live calls pass the
+    cases they already fetched for the same extraction.
+    """
     try:
+        check_deadline(state, "Context Retrieval Agent")
         # Retrieve similar documents
-        query_text = f"{state['extracted_info']['topic_name']} {state['extracted_info']['description']}"
+        if retrieved_context is not None:
+            state["retrieved_context"] = retrieved_context
+        else:
+            try:
+                state["retrieved_context"] = query_knowledge_base(state['extracted_info'])
+            except Exception as e:
+                logger.warning(f"ChromaDB query failed: {e}")
+                state["retrieved_context"] = []
         
-        try:
-            results = collection.query(
-                query_texts=[query_text],
-                n_results=3,
-                include=["documents", "metadatas"]
-            )
-            
-            state["retrieved_context"] = []
-            for i, doc in enumerate(results['documents'][0]):
-                state["retrieved_context"].append({
-                    "content": doc,
-                    "metadata": results['metadatas'][0][i]
-                })
-        except Exception as e:
-            logger.warning(f"ChromaDB query failed: {e}")
-            state["retrieved_context"] = []
+        from metrics_utils import increment
+        
+        # FAQ fast path - an approved answer to a near-identical query is returned as is
+        if str(get_env_var('FAQ_FAST_PATH', 'false')).lower() == 'true':
+            hit = find_fast_path_hit(state["retrieved_context"], state['extracted_info'].get('overall_sentiment'))
+            if hit:
+                increment("retrieval.path.faq_fast_path")
+                logger.info(f"FAQ fast path: case {hit['metadata'].get('id')} at distance {hit['distance']:.3f}")
+                state["generated_response"] = render_fast_path_answer(hit)
+                return log_agent_step(
+                    "Context Retrieval Agent", 
+                    "success", 
+                    None, 
+                    state,
+                    path="faq_fast_path",
+                    field="generated_response"
+                )
         
-        # Generate response
-        context_str = "\n".join([f"• {doc['content']}" for j, doc in enumerate(state["retrieved_context"])]) if state["retrieved_context"] else "No specific solutions found in knowledge base"
+        # Generate response - closest hits first, within the prompt token budget
+        context_str, _ = build_context(state["retrieved_context"])
 
         prompt = f"""You are a telecom customer support agent. Generate a helpful response to the customer.
 
@@ -217,19 +388,23 @@ IMPORTANT INSTRUCTIONS:
 Generate the response:
 """
         
-        completion = groq_client.chat.completions.create(
+        completion = get_groq_client().chat.completions.create(
             model="llama-3.1-8b-instant",
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
+            temperature=0.3,
+            deadline=state.get("deadline")
         )
         
         state["generated_response"] = completion.choices[0].message.content.strip()
+        increment("retrieval.path.generated")
         
         return log_agent_step(
             "Context Retrieval Agent", 
             "success", 
-            f"{state['generated_response']}", 
-            state
+            None, 
+            state,
+            path="generated",
+            field="generated_response"
         )
     except Exception as e:
         return log_agent_step(
@@ -239,47 +414,222 @@ Generate the response:
             state
         )
 
-def create_workflow():
-    """Create and return the complete agent workflow - ONLY processing, no approval/update"""
+# Graph node behind each agent name used in agent_logs - in execution order
+AGENT_NODES = {
+    "Audio Preprocessing Agent": "preprocess",
+    "Transcription Agent": "transcribe",
+    "Info Extractor Agent": "extract",
+    "Context Retrieval Agent": "retrieve"
+}
+
+# State field each node produces - preprocessing is optional and only feeds transcription
+NODE_OUTPUTS = {
+    "transcribe": "transcript",
+    "extract": "extracted_info",
+    "retrieve": "generated_response"
+}
+
+def _first_missing_node(values) -> str:
+    """First node whose output is not in the checkpointed state, None when all are there
+
+    An agent that logged an error but stored usable output (e.g. fallback
+    extraction) counts as done - only missing output is worth paying for again.
+    """
+    return next((node for node, field in NODE_OUTPUTS.items() if not values.get(field)), None)
+
+_checkpointer = None
+
+def get_checkpointer():
+    """Get the shared SQLite checkpointer that records state after every node"""
+    with _init_lock:
+        return _get_checkpointer_locked()
+
+def _get_checkpointer_locked():
+    global _checkpointer
+    if _checkpointer is None:
+        import sqlite3
+        from langgraph.checkpoint.sqlite import SqliteSaver
+        
+        checkpoint_db_path = get_env_var('CHECKPOINT_DB_PATH', 'data/checkpoints.db')
+        checkpoint_dir = os.path.dirname(checkpoint_db_path)
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+        _checkpointer = SqliteSaver(sqlite3.connect(checkpoint_db_path, check_same_thread=False))
+    return _checkpointer
+
+def timed_node(node_name: str, agent):
+    """Wrap an agent so its wall-clock time is recorded in state['stage_timings']"""
+    def run(state: AgentState) -> AgentState:
+        started = time.perf_counter()
+        state = agent(state)
+        timings = dict(state.get("stage_timings") or {})
+        timings[node_name] = round((time.perf_counter() - started) * 1000, 1)
+        state["stage_timings"] = timings
+        return state
+    return run
+
+def create_workflow(preprocess_audio=None, checkpointer=None, entry_point=None):
+    """Create and return the complete agent workflow - ONLY processing, no approval/update
+
+    entry_point starts the graph at a later node, e.g. "extract" to replay
+    stored transcripts without transcribing again.
+    """
+    from langgraph.graph import StateGraph, END
+    
+    if preprocess_audio is None:
+        preprocess_audio = str(get_env_var('AUDIO_PREPROCESSING', 'false')).lower() == 'true'
+    
+    nodes = [
+        ("preprocess", audio_preprocessing_agent),
+        ("transcribe", transcription_agent),
+        ("extract", info_extractor_agent),
+        ("retrieve", context_retrieval_agent)
+    ]
+    if not preprocess_audio:
+        nodes = nodes[1:]
+    if entry_point:
+        names = [name for name, _ in nodes]
+        if entry_point not in names:
+            raise ValueError(f"Unknown entry point: {entry_point}")
+        nodes = nodes[names.index(entry_point):]
+    
     workflow = StateGraph(AgentState)
     
-    workflow.add_node("transcribe", transcription_agent)
-    workflow.add_node("extract", info_extractor_agent)
-    workflow.add_node("retrieve", context_retrieval_agent)
+    for name, agent in nodes:
+        workflow.add_node(name, profile_node(name, timed_node(name, agent)))
     
-    workflow.set_entry_point("transcribe")
-    workflow.add_edge("transcribe", "extract")
-    workflow.add_edge("extract", "retrieve")
-    workflow.add_edge("retrieve", END)
+    workflow.set_entry_point(nodes[0][0])
+    for (name, _), (next_name, _) in zip(nodes, nodes[1:]):
+        workflow.add_edge(name, next_name)
+    workflow.add_edge(nodes[-1][0], END)
     
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
 
-def run_agent_flow(audio_file_path: str):
-    """Execute the complete agent workflow - ONLY processing"""
-    workflow = create_workflow()
+def _thread_config(request_id: str):
+    """LangGraph config that keys checkpoints by request ID"""
+    return {"configurable": {"thread_id": request_id}}
+
+def delete_checkpoint(request_id: str):
+    """Drop a run's checkpoints once nothing will resume it"""
+    try:
+        get_checkpointer().delete_thread(request_id)
+    except Exception as e:
+        logger.warning(f"Could not delete checkpoints of request {request_id}: {e}")
+
+def _finalize_result(result, request_id: str):
+    """Clean up temporary audio and prepare final output for human review"""
+    # Whatever the outcome, the preprocessed copy is not needed any more
+    if result.get("processed_audio_file") and os.path.exists(result["processed_audio_file"]):
+        os.remove(result["processed_audio_file"])
+    
+    # A complete run is never resumed - keep checkpoints.db from growing with every call
+    if _checkpointer is not None and _first_missing_node(result) is None:
+        delete_checkpoint(request_id)
+    
+    # Prepare final output without approval/update
+    result["request_id"] = request_id
+    # Compact view for the case store - shares the field values, nothing is copied
+    result["final_output"] = CaseResult.from_state(result, request_id=request_id)
+    
+    logger.info("🎯 Processing Completed - Ready for Human Review!")
+    
+    return result
+
+@profile_run("agent_flow", per_node=True)
+def run_agent_flow(audio_file_path: str, deadline_seconds: float = None, request_id: str = None,
+                   stop_after: str = None):
+    """Execute the complete agent workflow - ONLY processing
+
+    State is checkpointed after every node under request_id so a failed run
+    can be continued with resume_agent_flow(request_id). stop_after pauses the
+    run after that node and returns the raw state - resume_agent_flow finishes it.
+    """
+    setup_logging()
+    workflow = create_workflow(checkpointer=get_checkpointer())
+    request_id = request_id or uuid.uuid4().hex
+    
+    if deadline_seconds is None:
+        deadline_seconds = float(get_env_var('REQUEST_DEADLINE_SECONDS', 120))
     
     initial_state = AgentState(
         audio_file=audio_file_path,
+        processed_audio_file="",
         transcript="",
         extracted_info={},
         retrieved_context=[],
         generated_response="",
         final_output={},
-        agent_logs=[]
+        agent_logs=[],
+        deadline=time.time() + deadline_seconds,
+        stage_timings={}
     )
     
-    logger.info("🚀 Starting Multi-Agent Workflow...")
-    result = workflow.invoke(initial_state)
+    logger.info(f"🚀 Starting Multi-Agent Workflow (request {request_id})...")
+    if stop_after:
+        result = workflow.invoke(initial_state, _thread_config(request_id), interrupt_after=[stop_after])
+        logger.info(f"⏸️ Paused request {request_id} after {stop_after}")
+        return result
+    result = workflow.invoke(initial_state, _thread_config(request_id))
     
-    # Prepare final output without approval/update
-    result["final_output"] = {
-        "transcript": result["transcript"],
-        "extracted_info": result["extracted_info"],
-        "retrieved_solutions": len(result["retrieved_context"]),
-        "generated_response": result["generated_response"],
-        "requires_human_approval": True  # Flag for support engineer
-    }
+    return _finalize_result(result, request_id)
+
+def has_checkpoint(request_id: str) -> bool:
+    """Whether a run has been checkpointed under this request ID"""
+    workflow = create_workflow(checkpointer=get_checkpointer())
+    return bool(workflow.get_state(_thread_config(request_id)).values)
+
+@profile_run("agent_flow", per_node=True)
+def resume_agent_flow(request_id: str, deadline_seconds: float = None):
+    """Continue a checkpointed run from the last node that succeeded
+
+    A run interrupted mid-graph (e.g. the process died) continues with its
+    pending node. A completed run is rewound to the first node whose output is
+    missing, so e.g. a failed generation is retried without paying for
+    transcription again - non-fatal errors (preprocessing, fallback
+    extraction) do not send it back further.
+    """
+    setup_logging()
+    workflow = create_workflow(checkpointer=get_checkpointer())
+    config = _thread_config(request_id)
     
-    logger.info("🎯 Processing Completed - Ready for Human Review!")
+    snapshot = workflow.get_state(config)
+    if not snapshot.values:
+        raise ValueError(f"No checkpoint found for request {request_id}")
     
-    return result
+    if deadline_seconds is None:
+        deadline_seconds = float(get_env_var('REQUEST_DEADLINE_SECONDS', 120))
+    updates = {"deadline": time.time() + deadline_seconds}
+    
+    if not snapshot.next:
+        resume_node = _first_missing_node(snapshot.values)
+        if resume_node is None:
+            logger.info(f"Request {request_id} already completed - nothing to resume")
+            return _finalize_result(dict(snapshot.values), request_id)
+        
+        # Keep the logs of the agents before the resume point, whatever their status
+        node_order = list(AGENT_NODES.values())
+        resume_index = node_order.index(resume_node)
+        updates["agent_logs"] = [
+            log for log in snapshot.values.get("agent_logs", [])
+            if node_order.index(AGENT_NODES[log['agent']]) < resume_index
+        ]
+        
+        # The preprocessed copy may be gone - fall back to the original upload
+        processed_audio_file = snapshot.values.get("processed_audio_file")
+        if processed_audio_file and not os.path.exists(processed_audio_file):
+            updates["processed_audio_file"] = ""
+        
+        if resume_node == "transcribe":
+            # No transcript - start over from the entry node with the same inputs
+            logger.info(f"🔁 Restarting request {request_id} from the start")
+            result = workflow.invoke({**snapshot.values, **updates}, config)
+            return _finalize_result(result, request_id)
+        
+        workflow.update_state(config, updates, as_node=node_order[resume_index - 1])
+        logger.info(f"🔁 Resuming request {request_id} at {resume_node}")
+    else:
+        workflow.update_state(config, updates)
+        logger.info(f"🔁 Resuming interrupted request {request_id} at {', '.join(snapshot.next)}")
+    
+    result = workflow.invoke(None, config)
+    return _finalize_result(result, request_id)
@@ -0,0 +1,145 @@
+import os
+import shutil
+import logging
+import tempfile
+import subprocess
+import numpy as np
+from chroma_db_utils import get_env_var
+
+logger = logging.getLogger(__name__)
+
+# Whisper works on 16 kHz mono internally - anything more is wasted upload
+TARGET_SAMPLE_RATE = 16000
+
+def get_ffmpeg_binary():
+    """Locate ffmpeg: FFMPEG_BINARY, then PATH, then the imageio-ffmpeg bundled binary"""
+    binary = get_env_var('FFMPEG_BINARY') or shutil.which("ffmpeg")
+    if binary:
+        return binary
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except ImportError:
+        raise RuntimeError("ffmpeg not found - install it or set FFMPEG_BINARY")
+
+def decode_audio(input_path, sample_rate=TARGET_SAMPLE_RATE):
+    """Decode any audio file to a mono float32 array at sample_rate"""
+    command = [
+        get_ffmpeg_binary(), "-nostdin", "-v", "error",
+        "-i", input_path,
+        "-f", "f32le", "-ac", "1", "-ar", str(sample_rate),
+        "-"
+    ]
+    completed = subprocess.run(command, capture_output=True, check=True)
+    return np.frombuffer(completed.stdout, dtype=np.float32)
+
+def encode_audio(samples, output_path, sample_rate=TARGET_SAMPLE_RATE):
+    """Encode a mono float32 array - the codec follows the output extension"""
+    command = [
+        get_ffmpeg_binary(), "-nostdin", "-v", "error", "-y",
+        "-f", "f32le", "-ac", "1", "-ar", str(sample_rate),
+        "-i", "-",
+        output_path
+    ]
+    subprocess.run(command, input=samples.astype(np.float32).tobytes(), capture_output=True, check=True)
+
+def trim_silence(samples, sample_rate=TARGET_SAMPLE_RATE, frame_ms=30, threshold_db=-35.0,
+                 max_silence_seconds=1.0, keep_silence_seconds=0.3):
+    """Drop leading/trailing silence and shorten long internal silences
+
+    Frames quieter than threshold_db relative to the loudest frame count as
+    silence. Internal silent runs longer than max_silence_seconds are cut down
+    to keep_silence_seconds so word boundaries stay intact.
+    """
+    frame_length = int(sample_rate * frame_ms / 1000)
+    num_frames = len(samples) // frame_length
+    if num_frames == 0:
+        return samples
+
+    frames = samples[:num_frames * frame_length].reshape(num_frames, frame_length)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    energy_db = 20 * np.log10(np.maximum(rms, 1e-10))
+    voiced = energy_db > (energy_db.max() + threshold_db)
+
+    if not voiced.any():
+        return samples[:0]
+
+    # Run-length encode the voiced mask: run starts, lengths and whether each run is voiced
+    change_points = np.flatnonzero(np.diff(voiced.astype(np.int8))) + 1
+    run_starts = np.concatenate(([0], change_points))
+    run_lengths = np.diff(np.concatenate((run_starts, [num_frames])))
+    run_voiced = voiced[run_starts]
+
+    keep = voiced.copy()
+    max_silence_frames = int(max_silence_seconds * 1000 / frame_ms)
+    keep_silence_frames = int(keep_silence_seconds * 1000 / frame_ms)
+    first_voiced = np.flatnonzero(voiced)[0]
+    last_voiced = np.flatnonzero(voiced)[-1]
+
+    # Internal silences: keep short ones whole, keep only the edges of long ones
+    internal = (~run_voiced) & (run_starts > first_voiced) & (run_starts < last_voiced)
+    for start, length in zip(run_starts[internal], run_lengths[internal]):
+        if length <= max_silence_frames:
+            keep[start:start + length] = True
+        else:
+            half = keep_silence_frames // 2
+            keep[start:start + half] = True
+            keep[start + length - half:start + length] = True
+
+    sample_mask = np.repeat(keep, frame_length)
+    return samples[:num_frames * frame_length][sample_mask]
+
+def preprocess_audio(input_path, output_dir=None):
+    """Downmix, resample and trim an audio file for transcription
+
+    Returns (output_path, stats). When the processed file would not be smaller
+    than the original, the original path is returned unchanged.
+    """
+    output_format = get_env_var('AUDIO_PREPROCESS_FORMAT', 'flac')
+    threshold_db = float(get_env_var('AUDIO_SILENCE_THRESHOLD_DB', -35.0))
+    max_silence_seconds = float(get_env_var('AUDIO_MAX_SILENCE_SECONDS', 1.0))
+
+    samples = decode_audio(input_path)
+    trimmed = trim_silence(samples, threshold_db=threshold_db, max_silence_seconds=max_silence_seconds)
+
+    fd, output_path = tempfile.mkstemp(prefix="preprocessed_", suffix=f".{output_format}", dir=output_dir)
+    os.close(fd)
+    try:
+        encode_audio(trimmed, output_path)
+        original_bytes = os.path.getsize(input_path)
+        processed_bytes = os.path.getsize(output_path)
+    except BaseException:
+        # Never returned, so no caller could clean it up
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    stats = {
+        "original_bytes": original_bytes,
+        "processed_bytes": processed_bytes,
+        "original_seconds": round(len(samples) / TARGET_SAMPLE_RATE, 2),
+        "processed_seconds": round(len(trimmed) / TARGET_SAMPLE_RATE, 2),
+        "used_processed": processed_bytes < original_bytes and len(trimmed) > 0
+    }
+
+    if not stats["used_processed"]:
+        os.remove(output_path)
+        output_path = input_path
+        stats["processed_bytes"] = original_bytes
+        stats["processed_seconds"] = stats["original_seconds"]
+
+    stats["bytes_saved"] = stats["original_bytes"] - stats["processed_bytes"]
+    stats["seconds_saved"] = round(stats["original_seconds"] - stats["processed_seconds"], 2)
+    return output_path, stats
+
+if __name__ == "__main__":
+    # Try the preprocessing on the bundled sample calls
+    sample_dir = "sample_audio"
+    output_dir = tempfile.mkdtemp(prefix="preprocessed_audio_")
+    for sample_file in sorted(os.listdir(sample_dir)):
+        output_path, stats = preprocess_audio(os.path.join(sample_dir, sample_file), output_dir=output_dir)
+        print(
+            f"{sample_file}: {stats['original_bytes']} -> {stats['processed_bytes']} bytes "
+            f"({stats['bytes_saved']} saved), {stats['original_seconds']}s -> {stats['processed_seconds']}s "
+            f"({stats['seconds_saved']}s saved) -> {output_path}"
+        )
+    shutil.rmtree(output_dir)
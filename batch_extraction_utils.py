@@ -0,0 +1,156 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from chroma_db_utils import get_env_var
+from metrics_utils import increment
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_KEYS = ("topic_name", "description", "overall_sentiment")
+
+def build_batch_extraction_prompt(transcripts):
+    """Prompt asking for one extraction per transcript as a single JSON array"""
+    conversations = "\n".join(
+        f'<transcript index="{i}">\n{transcript}\n</transcript>'
+        for i, transcript in enumerate(transcripts)
+    )
+    return f"""Analyze each of these customer conversations from telecom domain and extract the following information for every conversation:
+
+{conversations}
+
+For each transcript return an object with these exact keys:
+- "index": the index of the transcript
+- "topic_name": main topic or issue
+- "description": brief description of the user query in 1 to 2 sentences
+- "overall_sentiment": positive/negative/neutral
+
+Return ONLY a valid JSON array with exactly {len(transcripts)} objects, no additional text or explanation.
+"""
+
+def is_valid_extraction(item):
+    """An extraction is usable when it carries all required keys"""
+    return isinstance(item, dict) and all(item.get(key) for key in REQUIRED_KEYS)
+
+class ExtractionBatcher:
+    """Collects pending transcripts and extracts them with one completion per batch
+
+    submit() returns a Future. A collector thread waits up to window_ms after
+    the first transcript for up to max_batch_size more, then one request asks
+    for a JSON array which is demultiplexed back to the callers by index.
+    Items missing from the reply or failing to parse fall back to a single
+    extraction request each.
+
+    Batches only form between concurrent callers of one process (replay, live
+    calls, threaded tools). Queue workers run one job per process, so they
+    switch batching off rather than wait out the window for nothing.
+    """
+
+    def __init__(self, max_batch_size=None, window_ms=None, workers=None):
+        self.max_batch_size = int(max_batch_size if max_batch_size is not None else get_env_var('EXTRACTION_BATCH_SIZE', 8))
+        self.window_seconds = float(window_ms if window_ms is not None else get_env_var('EXTRACTION_BATCH_WINDOW_MS', 50)) / 1000
+        self.pending = queue.Queue()
+        # Batches are sent from a small pool so one slow completion does not stall collection
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(workers if workers is not None else get_env_var('EXTRACTION_BATCH_WORKERS', 2)),
+            thread_name_prefix="extraction-batch"
+        )
+        self.collector = threading.Thread(target=self._collect, name="extraction-batcher", daemon=True)
+        self.collector.start()
+
+    def submit(self, transcript, deadline=None):
+        """Queue a transcript for extraction, the Future resolves to its extracted info dict"""
+        future = Future()
+        self.pending.put((transcript, deadline, future))
+        return future
+
+    def _collect(self):
+        while True:
+            batch = [self.pending.get()]
+            window_ends = time.monotonic() + self.window_seconds
+            while len(batch) < self.max_batch_size:
+                remaining = window_ends - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.executor.submit(self._process, batch)
+
+    def _process(self, batch):
+        from agentic_utils import extract_info
+
+        if len(batch) == 1:
+            transcript, deadline, future = batch[0]
+            self._resolve(future, extract_info, transcript, deadline)
+            return
+
+        results = {}
+        try:
+            results = self._extract_batch([transcript for transcript, _, _ in batch], batch)
+        except Exception as e:
+            logger.warning(f"Batch extraction of {len(batch)} transcripts failed ({e}) - falling back per item")
+
+        for i, (transcript, deadline, future) in enumerate(batch):
+            if is_valid_extraction(results.get(i)):
+                item = results[i]
+                future.set_result({key: item[key] for key in REQUIRED_KEYS})
+            else:
+                increment("extraction.batch.fallbacks")
+                self._resolve(future, extract_info, transcript, deadline)
+
+    def _extract_batch(self, transcripts, batch):
+        """One completion for the whole batch, returns {index: extraction}"""
+        from agentic_utils import get_groq_client, parse_json_response, EXTRACTION_MODEL
+
+        # The batch may only run as long as its most urgent request allows
+        deadlines = [deadline for _, deadline, _ in batch if deadline]
+        completion = get_groq_client().chat.completions.create(
+            model=EXTRACTION_MODEL,
+            messages=[{"role": "user", "content": build_batch_extraction_prompt(transcripts)}],
+            temperature=0,
+            deadline=min(deadlines) if deadlines else None
+        )
+
+        increment("extraction.calls")
+        increment("extraction.items", len(transcripts))
+        increment("extraction.batch.calls")
+        increment("extraction.batch.items", len(transcripts))
+        usage = getattr(completion, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            increment("extraction.tokens", usage.total_tokens)
+
+        items = parse_json_response(completion.choices[0].message.content.strip(), pattern=r'\[.*\]')
+        if not isinstance(items, list):
+            raise ValueError("Batch extraction did not return a JSON array")
+
+        results = {}
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get("index", position))
+            except (TypeError, ValueError):
+                index = position
+            results[index] = item
+        return results
+
+    @staticmethod
+    def _resolve(future, extract, transcript, deadline):
+        try:
+            future.set_result(extract(transcript, deadline=deadline))
+        except Exception as e:
+            future.set_exception(e)
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+def get_extraction_batcher():
+    """Get the process-wide extraction batcher, starting it on first use"""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = ExtractionBatcher()
+    return _batcher
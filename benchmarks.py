@@ -0,0 +1,589 @@
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from metrics_utils import get_counter, reset_metrics
+
+# Benchmark suite - each subcommand prints a small report.
+#   python benchmarks.py llm          tail latency and hedging rate of chat completions
+#   python benchmarks.py extraction   API calls and tokens per transcript with batched extraction
+#   python benchmarks.py memory       per-case memory of stored results (tracemalloc)
+#   python benchmarks.py embed        embedding throughput and query latency across engine settings
+#   python benchmarks.py chroma       KB throughput of N processes, embedded SQLite vs one shared server
+#   python benchmarks.py hnsw         recall vs. query latency of HNSW settings on the KB vectors
+#   python benchmarks.py queue        per-sentiment queue wait under backlog, FIFO vs priority scheduling
+
+def _latency_summary(latencies_ms):
+    """p50/p95/p99/max of a list of latencies"""
+    ordered = sorted(latencies_ms)
+    if not ordered:
+        return {}
+    pick = lambda pct: ordered[int(round(pct / 100 * (len(ordered) - 1)))]
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99), "max": ordered[-1]}
+
+def _print_row(label, summary, extra=""):
+    print(
+        f"{label:<28} p50 {summary['p50']:8.1f} ms  p95 {summary['p95']:8.1f} ms  "
+        f"p99 {summary['p99']:8.1f} ms  max {summary['max']:8.1f} ms  {extra}"
+    )
+
+def bench_llm(args):
+    """Chat completion tail latency with and without hedged requests"""
+    from groq import Groq
+    from llm_client_utils import ResilientGroqClient
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        from fake_groq_server import start_fake_server
+        server, base_url = start_fake_server(
+            latency_ms=args.latency_ms, slow_rate=args.slow_rate, slow_latency_ms=args.slow_latency_ms
+        )
+
+    messages = [{"role": "user", "content": "My data finished in just 2 weeks, what can I do?"}]
+    for hedge_percentile in (0, args.hedge_percentile):
+        reset_metrics()
+        client = ResilientGroqClient(
+            Groq(api_key=args.api_key, base_url=base_url, max_retries=0),
+            requests_per_minute=0, tokens_per_minute=0, hedge_percentile=hedge_percentile
+        )
+
+        def one_call(_):
+            started = time.perf_counter()
+            client.chat.completions.create(model=args.model, messages=messages, temperature=0)
+            return (time.perf_counter() - started) * 1000
+
+        # Warm-up calls build the latency history the hedge delay is derived from
+        for _ in range(client.hedge_min_samples):
+            one_call(None)
+        hedged_before = get_counter("llm.chat.hedged")
+        wins_before = get_counter("llm.chat.hedge_wins")
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            latencies = list(pool.map(one_call, range(args.requests)))
+
+        hedged = get_counter("llm.chat.hedged") - hedged_before
+        wins = get_counter("llm.chat.hedge_wins") - wins_before
+        label = f"hedge at p{hedge_percentile:g}" if hedge_percentile else "no hedging"
+        _print_row(
+            label, _latency_summary(latencies),
+            f"hedge rate {hedged / args.requests:6.1%}  hedge wins {int(wins)}"
+        )
+
+    if server:
+        server.shutdown()
+
+def bench_extraction(args):
+    """Items per API call and tokens per transcript for single vs batched extraction"""
+    import os
+    import agentic_utils
+    from batch_extraction_utils import ExtractionBatcher
+    from fake_groq_server import FAKE_TRANSCRIPT
+
+    server = None
+    if not args.base_url:
+        from fake_groq_server import start_fake_server
+        server, args.base_url = start_fake_server(latency_ms=args.latency_ms)
+    os.environ["GROQ_BASE_URL"] = args.base_url
+    os.environ.setdefault("GROQ_API_KEY", args.api_key)
+    os.environ.setdefault("GROQ_TPM", "0")
+    os.environ.setdefault("GROQ_RPM", "0")
+
+    # Build the client up front so its import cost does not land in the first latencies
+    agentic_utils.get_groq_client()
+    transcripts = [f"{FAKE_TRANSCRIPT} (call {i})" for i in range(args.transcripts)]
+    for batch_size in (1, args.batch_size):
+        reset_metrics()
+        batcher = ExtractionBatcher(max_batch_size=batch_size, window_ms=args.window_ms) if batch_size > 1 else None
+
+        def one_extraction(transcript):
+            started = time.perf_counter()
+            if batcher:
+                batcher.submit(transcript).result()
+            else:
+                agentic_utils.extract_info(transcript)
+            return (time.perf_counter() - started) * 1000
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            latencies = list(pool.map(one_extraction, transcripts))
+
+        calls = get_counter("extraction.calls")
+        items = get_counter("extraction.items")
+        tokens = get_counter("extraction.tokens")
+        _print_row(
+            f"batch size {batch_size}", _latency_summary(latencies),
+            f"items/call {items / max(calls, 1):5.2f}  tokens/transcript {tokens / max(items, 1):7.1f}  "
+            f"fallbacks {int(get_counter('extraction.batch.fallbacks'))}"
+        )
+        if batcher:
+            batcher.executor.shutdown(wait=False)
+
+    if server:
+        server.shutdown()
+
+def _sample_state(i, transcript_chars, response_chars):
+    """A finished AgentState of realistic size in the current (field-referencing) log format"""
+    from datetime import datetime
+    transcript = (f"Call {i}: my mobile data ran out after two weeks and I keep getting charged. " * 50)[:transcript_chars]
+    response = (f"Case {i}: I recommend our Data Boost package and usage alerts at 50%, 80% and 100%. " * 50)[:response_chars]
+    extracted_info = {
+        "topic_name": "data_usage",
+        "description": f"Customer {i} runs out of data early and is charged for extra usage.",
+        "overall_sentiment": "negative"
+    }
+    timestamp = datetime.now().isoformat()
+    return {
+        "request_id": f"{i:032x}",
+        "transcript": transcript,
+        "extracted_info": extracted_info,
+        "retrieved_context": [
+            {"content": f"Topic: data_usage. Query: q{k}. Solution: {response}", "metadata": {"solution": response}, "distance": 0.4}
+            for k in range(3)
+        ],
+        "generated_response": response,
+        "agent_logs": [
+            {"agent": "Transcription Agent", "status": "success", "timestamp": timestamp, "field": "transcript"},
+            {"agent": "Info Extractor Agent", "status": "success", "timestamp": timestamp, "field": "extracted_info"},
+            {"agent": "Context Retrieval Agent", "status": "success", "timestamp": timestamp, "field": "generated_response", "path": "generated"}
+        ],
+        "stage_timings": {"transcribe": 900.0, "extract": 300.0, "retrieve": 700.0}
+    }
+
+def _legacy_result(state):
+    """The pre-compaction stored shape - messages copy the fields and final_output repeats them"""
+    from case_result_utils import format_log_field
+    legacy = dict(state)
+    legacy["agent_logs"] = [
+        {"agent": log["agent"], "status": log["status"], "timestamp": log["timestamp"],
+         "message": format_log_field(log["field"], state[log["field"]])}
+        for log in state["agent_logs"]
+    ]
+    legacy["final_output"] = {
+        "transcript": state["transcript"],
+        "extracted_info": state["extracted_info"],
+        "retrieved_solutions": len(state["retrieved_context"]),
+        "generated_response": state["generated_response"],
+        "requires_human_approval": True
+    }
+    return legacy
+
+def _bytes_per_case(build, payloads):
+    """tracemalloc growth per case while holding build(payload) for every payload"""
+    import gc
+    import tracemalloc
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [build(payload) for payload in payloads]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return (after - before) / len(payloads)
+
+def bench_memory(args):
+    """Per-case memory of a loaded case result before and after the compact representation"""
+    import json
+    import uuid
+    from case_result_utils import CaseResult
+
+    states = [_sample_state(i, args.transcript_chars, args.response_chars) for i in range(args.cases)]
+    # Both shapes as they come back from the case store, i.e. decoded from JSON
+    legacy_json = [json.dumps(_legacy_result(state)) for state in states]
+    compact_json = [json.dumps(CaseResult.from_state(state).to_dict()) for state in states]
+
+    legacy = _bytes_per_case(json.loads, legacy_json)
+    compact = _bytes_per_case(lambda payload: CaseResult.from_dict(json.loads(payload)), compact_json)
+    session_ids = _bytes_per_case(lambda _: uuid.uuid4().hex, states)
+
+    print(f"{'stored JSON per case':<28} before {sum(map(len, legacy_json)) / args.cases:9.0f} B  after {sum(map(len, compact_json)) / args.cases:9.0f} B")
+    print(f"{'loaded result per case':<28} before {legacy:9.0f} B  after {compact:9.0f} B  ({1 - compact / legacy:.0%} less)")
+    print(f"{'session entry per case':<28} before {legacy:9.0f} B  after {session_ids:9.0f} B  (case ID only)")
+
+def bench_embed(args):
+    """Document throughput and query-embed latency for each backend/threads/batch size"""
+    import pandas as pd
+    from chroma_db_utils import build_document
+    from embedding_utils import EmbeddingEngine
+
+    df = pd.read_csv(args.csv)
+    documents = [
+        build_document(row['topic_name'], row['description'], row['solution'])
+        for _, row in df.iterrows()
+    ]
+    documents = (documents * (args.documents // max(len(documents), 1) + 1))[:args.documents]
+    queries = [f"{row['topic_name']} {row['description']}" for _, row in df.head(args.queries).iterrows()]
+
+    for backend in args.backends.split(","):
+        for threads in [int(value) for value in args.threads.split(",")]:
+            for batch_size in [int(value) for value in args.batch_sizes.split(",")]:
+                label = f"{backend} t={threads} b={batch_size}"
+                try:
+                    engine = EmbeddingEngine(backend=backend, threads=threads, batch_size=batch_size, cache_size=len(queries))
+                    engine(documents[:batch_size])  # load the model outside the timing
+
+                    started = time.perf_counter()
+                    engine(documents)
+                    docs_per_sec = len(documents) / (time.perf_counter() - started)
+
+                    def timed_query(text):
+                        query_started = time.perf_counter()
+                        engine.embed_query([text])
+                        return (time.perf_counter() - query_started) * 1000
+
+                    cold = [timed_query(text) for text in queries]
+                    cached = [timed_query(text) for text in queries]
+                except Exception as e:
+                    print(f"{label:<28} failed: {e}")
+                    continue
+
+                summary = _latency_summary(cold)
+                print(
+                    f"{label:<28} {docs_per_sec:8.1f} docs/s  query p50 {summary['p50']:6.2f} ms  "
+                    f"p95 {summary['p95']:6.2f} ms  cached p50 {_latency_summary(cached)['p50']:6.3f} ms"
+                )
+
+def _chroma_worker(env, collection_name, barrier, results, duration, write_ratio, seed):
+    """One app process: query the KB (and write to a scratch collection) for duration seconds"""
+    import os
+    import random
+    os.environ.update(env)
+    from chroma_db_utils import get_chroma_client
+
+    client = get_chroma_client()
+    # Stored vectors are used as queries, so the embedding model stays out of the measurement
+    collection = client.get_collection(collection_name)
+    vectors = list(collection.get(include=["embeddings"], limit=64)['embeddings'])
+    scratch = client.get_or_create_collection("bench_scratch")
+    rng = random.Random(seed)
+
+    reads, writes, errors = [], [], 0
+    barrier.wait()  # start together, once every process has connected
+    deadline = time.time() + duration
+    i = 0
+    while time.time() < deadline:
+        vector = vectors[rng.randrange(len(vectors))]
+        started = time.perf_counter()
+        try:
+            if rng.random() < write_ratio:
+                scratch.upsert(ids=[f"{seed}-{i}"], embeddings=[vector], documents=["benchmark"])
+                writes.append((time.perf_counter() - started) * 1000)
+            else:
+                collection.query(query_embeddings=[vector], n_results=3)
+                reads.append((time.perf_counter() - started) * 1000)
+        except Exception:
+            errors += 1
+        i += 1
+    results.put((reads, writes, errors))
+
+def _start_chroma_server(path, port):
+    """chroma run on path, returns the process once it answers heartbeats"""
+    import subprocess
+    import chromadb
+    process = subprocess.Popen(
+        ["chroma", "run", "--path", path, "--port", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            chromadb.HttpClient(host="localhost", port=port).heartbeat()
+            return process
+        except Exception:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Chroma server on port {port} did not start")
+
+def bench_chroma(args):
+    """Aggregate query/write throughput of N processes in persistent and http mode"""
+    import os
+    import shutil
+    import socket
+    import tempfile
+    from multiprocessing import get_context
+    from chroma_db_utils import get_env_var
+    from kb_index_utils import get_active_collection_name
+
+    workdir = tempfile.mkdtemp(prefix="chroma_bench_")
+    source = get_env_var('CHROMA_DB_PATH', './chroma_db')
+    collection_name = get_active_collection_name()
+    server = None
+    try:
+        modes = {}
+        if "persistent" in args.modes:
+            # Copies, so the scratch writes never touch the real knowledge base
+            path = shutil.copytree(source, os.path.join(workdir, "persistent"))
+            modes["persistent"] = {"CHROMA_MODE": "persistent", "CHROMA_DB_PATH": path}
+        if "http" in args.modes:
+            host, port = args.host, args.port
+            if not host:
+                path = shutil.copytree(source, os.path.join(workdir, "http"))
+                with socket.socket() as sock:
+                    sock.bind(("localhost", 0))
+                    port = sock.getsockname()[1]
+                server = _start_chroma_server(path, port)
+                host = "localhost"
+            modes["http"] = {
+                "CHROMA_MODE": "http", "CHROMA_HOST": host, "CHROMA_PORT": str(port),
+                "CHROMA_DB_PATH": os.path.join(workdir, "http")
+            }
+
+        context = get_context("spawn")
+        for mode, env in modes.items():
+            for processes in [int(value) for value in args.processes.split(",")]:
+                barrier = context.Barrier(processes)
+                queue = context.Queue()
+                workers = [
+                    context.Process(
+                        target=_chroma_worker,
+                        args=(env, collection_name, barrier, queue, args.duration, args.write_ratio, n)
+                    )
+                    for n in range(processes)
+                ]
+                for worker in workers:
+                    worker.start()
+                results = [queue.get() for _ in workers]
+                for worker in workers:
+                    worker.join()
+
+                reads = [value for result in results for value in result[0]]
+                writes = [value for result in results for value in result[1]]
+                errors = sum(result[2] for result in results)
+                label = f"{mode} x{processes}"
+                print(f"{label:<28} {(len(reads) + len(writes)) / args.duration:8.1f} ops/s  errors {errors}")
+                if reads:
+                    _print_row("  queries", _latency_summary(reads), f"{len(reads) / args.duration:.1f}/s")
+                if writes:
+                    _print_row("  writes", _latency_summary(writes), f"{len(writes) / args.duration:.1f}/s")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def _exact_neighbors(vectors, queries, k, space):
+    """Indices of the k true nearest vectors of every query"""
+    import numpy as np
+    if space == "ip":
+        scores = -(queries @ vectors.T)
+    else:
+        if space == "cosine":
+            vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+            queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        # |q - v|^2 without materializing every difference vector
+        scores = (queries ** 2).sum(1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(1)[None, :]
+    return np.argsort(scores, axis=1)[:, :k]
+
+def bench_hnsw(args):
+    """Recall@k against exact search and query latency for each M / ef_construction / ef_search"""
+    import numpy as np
+    import chromadb
+    from chroma_db_utils import get_chroma_client
+    from kb_index_utils import get_active_collection_name
+
+    # Stored vectors only - the embedding model is not needed
+    source = get_chroma_client().get_collection(get_active_collection_name())
+    base = np.asarray(source.get(include=["embeddings"])['embeddings'], dtype=np.float32)
+    rng = np.random.default_rng(args.seed)
+    # Jittered copies stand in for a knowledge base that has grown args.replicate times
+    vectors = np.concatenate(
+        [base] + [base + rng.normal(0, args.jitter, base.shape) for _ in range(args.replicate - 1)]
+    ).astype(np.float32)
+    # Queries land near stored cases, as real ones do, but never exactly on them
+    rows = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = (vectors[rows] + rng.normal(0, args.jitter, (len(rows), vectors.shape[1]))).astype(np.float32)
+    truth = _exact_neighbors(vectors, queries, args.k, args.space)
+    print(f"{len(vectors)} vectors ({len(base)} x {args.replicate}), {len(queries)} queries, recall@{args.k}, space {args.space}")
+
+    client = chromadb.EphemeralClient()
+    ids = [str(i) for i in range(len(vectors))]
+    batch_size = client.get_max_batch_size()
+    ef_searches = [int(value) for value in args.ef_search.split(",")]
+    for m in [int(value) for value in args.m.split(",")]:
+        for ef_construction in [int(value) for value in args.ef_construction.split(",")]:
+            for ef_search in ef_searches:
+                # Built per ef_search - a loaded index ignores modify() until it is reloaded
+                name = f"hnsw_sweep_m{m}_efc{ef_construction}_efs{ef_search}"
+                collection = client.create_collection(
+                    name,
+                    configuration={"hnsw": {
+                        "space": args.space, "max_neighbors": m,
+                        "ef_construction": ef_construction, "ef_search": ef_search
+                    }},
+                    embedding_function=None
+                )
+                started = time.perf_counter()
+                for start in range(0, len(vectors), batch_size):
+                    collection.add(ids=ids[start:start + batch_size], embeddings=vectors[start:start + batch_size])
+                build_seconds = time.perf_counter() - started
+
+                collection.query(query_embeddings=[queries[0]], n_results=args.k, include=[])
+                latencies, hits = [], 0
+                for query, expected in zip(queries, truth):
+                    query_started = time.perf_counter()
+                    result = collection.query(query_embeddings=[query], n_results=args.k, include=[])
+                    latencies.append((time.perf_counter() - query_started) * 1000)
+                    hits += len({int(id) for id in result['ids'][0]} & set(expected.tolist()))
+                summary = _latency_summary(latencies)
+                label = f"M={m} efC={ef_construction} efS={ef_search}"
+                print(
+                    f"{label:<28} recall {hits / (len(queries) * args.k):6.3f}  p50 {summary['p50']:6.2f} ms  "
+                    f"p95 {summary['p95']:6.2f} ms  build {build_seconds:6.2f} s"
+                )
+                client.delete_collection(name)
+
+def _queue_worker(stop, triaged, sentiments, extract_seconds, respond_seconds):
+    """Claim jobs like worker_loop: triage when process_job would, otherwise one full pass"""
+    from job_queue_utils import claim_next_job, requeue_job, finish_job, should_triage
+
+    while True:
+        job = claim_next_job()
+        if job is None:
+            if stop.is_set():
+                return
+            time.sleep(0.002)
+            continue
+        # triaged is shared by all workers - it stands in for the checkpoint process_job looks up
+        if job['job_id'] in triaged:
+            time.sleep(respond_seconds)
+            finish_job(job['job_id'], case_id=job['job_id'])
+        elif should_triage():
+            time.sleep(extract_seconds)
+            triaged.add(job['job_id'])
+            requeue_job(job['job_id'], sentiments[job['filename']])
+        else:
+            time.sleep(extract_seconds + respond_seconds)
+            finish_job(job['job_id'], case_id=job['job_id'], sentiment=sentiments[job['filename']])
+
+def bench_queue(args):
+    """Queue wait per sentiment when jobs arrive faster than the workers finish them"""
+    import os
+    import random
+    import shutil
+    import tempfile
+    import threading
+    from priority_utils import parse_weights, print_latency_summary
+
+    mix = parse_weights(args.mix)
+    rng = random.Random(args.seed)
+    arrivals = [rng.choices(list(mix), weights=list(mix.values()))[0] for _ in range(args.jobs)]
+    capacity = args.workers / ((args.extract_ms + args.respond_ms) / 1000)
+    print(
+        f"{args.jobs} jobs at {args.rate:g}/s, {args.workers} workers ({capacity:.0f} jobs/s capacity), "
+        f"mix {args.mix}, aging {args.aging_seconds:g}s"
+    )
+
+    for mode in ("fifo", "priority"):
+        workdir = tempfile.mkdtemp(prefix="queue_bench_")
+        os.environ.update({
+            "JOB_DB_PATH": os.path.join(workdir, "jobs.db"),
+            "JOB_AUDIO_DIR": os.path.join(workdir, "job_audio"),
+            "PRIORITY_SCHEDULING": "true" if mode == "priority" else "false",
+            "AGENT_WORKERS": str(args.workers),
+            "PRIORITY_AGING_SECONDS": str(args.aging_seconds),
+            "PRIORITY_SLA_SECONDS": args.sla
+        })
+        from job_queue_utils import submit_job, job_wait_report
+
+        stop = threading.Event()
+        triaged = set()
+        # Sentiment is only "found" by the triage pass - jobs are submitted without it
+        sentiments = {f"call_{i}": sentiment for i, sentiment in enumerate(arrivals)}
+        workers = [
+            threading.Thread(
+                target=_queue_worker,
+                args=(stop, triaged, sentiments, args.extract_ms / 1000, args.respond_ms / 1000)
+            )
+            for _ in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        started = time.perf_counter()
+        for i in range(args.jobs):
+            time.sleep(max(0.0, started + i / args.rate - time.perf_counter()))
+            audio_path = os.path.join(workdir, f"call_{i}.wav")
+            open(audio_path, "wb").close()
+            submit_job(audio_path, filename=f"call_{i}")
+        stop.set()
+        for worker in workers:
+            worker.join()
+        print_latency_summary(f"\n{mode} - drained in {time.perf_counter() - started:.1f}s", job_wait_report())
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite for the agent pipeline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    llm = subparsers.add_parser("llm", help="Chat completion tail latency and hedging rate")
+    llm.add_argument("--base-url", help="Groq-compatible endpoint (default: local fake server)")
+    llm.add_argument("--api-key", default="fake-key")
+    llm.add_argument("--model", default="llama-3.1-8b-instant")
+    llm.add_argument("--requests", type=int, default=200)
+    llm.add_argument("--concurrency", type=int, default=8)
+    llm.add_argument("--hedge-percentile", type=float, default=95)
+    llm.add_argument("--latency-ms", type=float, default=40, help="Fake server base latency")
+    llm.add_argument("--slow-rate", type=float, default=0.05, help="Fake server share of slow responses")
+    llm.add_argument("--slow-latency-ms", type=float, default=1000, help="Fake server slow response latency")
+    llm.set_defaults(func=bench_llm)
+
+    extraction = subparsers.add_parser("extraction", help="API calls and tokens per transcript with batched extraction")
+    extraction.add_argument("--base-url", help="Groq-compatible endpoint (default: local fake server)")
+    extraction.add_argument("--api-key", default="fake-key")
+    extraction.add_argument("--transcripts", type=int, default=64)
+    extraction.add_argument("--concurrency", type=int, default=16)
+    extraction.add_argument("--batch-size", type=int, default=8)
+    extraction.add_argument("--window-ms", type=float, default=50)
+    extraction.add_argument("--latency-ms", type=float, default=200, help="Fake server latency")
+    extraction.set_defaults(func=bench_extraction)
+
+    memory = subparsers.add_parser("memory", help="Per-case memory of stored results (tracemalloc)")
+    memory.add_argument("--cases", type=int, default=500)
+    memory.add_argument("--transcript-chars", type=int, default=2000)
+    memory.add_argument("--response-chars", type=int, default=600)
+    memory.set_defaults(func=bench_memory)
+
+    embed = subparsers.add_parser("embed", help="Embedding throughput and query latency across engine settings")
+    embed.add_argument("--csv", default="data/customer_service_data.csv")
+    embed.add_argument("--documents", type=int, default=512)
+    embed.add_argument("--queries", type=int, default=50)
+    embed.add_argument("--backends", default="onnx,onnx-int8", help="Comma-separated EMBEDDING_BACKEND values")
+    embed.add_argument("--threads", default="1,4", help="Comma-separated thread counts (0 = runtime default)")
+    embed.add_argument("--batch-sizes", default="8,32,64", help="Comma-separated batch sizes")
+    embed.set_defaults(func=bench_embed)
+
+    chroma = subparsers.add_parser("chroma", help="KB throughput of N processes, embedded SQLite vs one shared server")
+    chroma.add_argument("--modes", default="persistent,http", help="Comma-separated CHROMA_MODE values")
+    chroma.add_argument("--processes", default="1,2,4,8", help="Comma-separated process counts")
+    chroma.add_argument("--duration", type=float, default=5, help="Seconds per run")
+    chroma.add_argument("--write-ratio", type=float, default=0.1, help="Share of operations that are writes")
+    chroma.add_argument("--host", help="Existing Chroma server (default: start one on a copy of CHROMA_DB_PATH)")
+    chroma.add_argument("--port", type=int, default=8000)
+    chroma.set_defaults(func=bench_chroma)
+
+    hnsw = subparsers.add_parser("hnsw", help="Recall vs. query latency of HNSW settings on the KB vectors")
+    hnsw.add_argument("--m", default="8,16,32", help="Comma-separated KB_HNSW_M values")
+    hnsw.add_argument("--ef-construction", default="50,100,200", help="Comma-separated KB_HNSW_EF_CONSTRUCTION values")
+    hnsw.add_argument("--ef-search", default="10,20,50,100", help="Comma-separated KB_HNSW_EF_SEARCH values")
+    hnsw.add_argument("--space", default="l2", choices=["l2", "cosine", "ip"])
+    hnsw.add_argument("--k", type=int, default=3, help="Neighbors per query (CONTEXT_N_RESULTS)")
+    hnsw.add_argument("--queries", type=int, default=200)
+    hnsw.add_argument("--replicate", type=int, default=20, help="Jittered copies of the KB to simulate growth")
+    hnsw.add_argument("--jitter", type=float, default=0.02, help="Noise added to copies and queries")
+    hnsw.add_argument("--seed", type=int, default=0)
+    hnsw.set_defaults(func=bench_hnsw)
+
+    queue = subparsers.add_parser("queue", help="Per-sentiment queue wait under backlog, FIFO vs priority scheduling")
+    queue.add_argument("--jobs", type=int, default=300)
+    queue.add_argument("--rate", type=float, default=30, help="Arriving jobs per second")
+    queue.add_argument("--workers", type=int, default=2)
+    queue.add_argument("--extract-ms", type=float, default=20, help="Simulated transcription + extraction")
+    queue.add_argument("--respond-ms", type=float, default=60, help="Simulated retrieval + response")
+    queue.add_argument("--mix", default="negative=0.2,neutral=0.5,positive=0.3", help="Share of each sentiment")
+    queue.add_argument("--aging-seconds", type=float, default=1.0, help="PRIORITY_AGING_SECONDS, scaled to the run")
+    queue.add_argument("--sla", default="negative=1,neutral=5,positive=10", help="PRIORITY_SLA_SECONDS, scaled to the run")
+    queue.add_argument("--seed", type=int, default=0)
+    queue.set_defaults(func=bench_queue)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+# Compact representation of a finished agent run. Log entries of successful
+# steps point at the result field they produced instead of carrying a copy of
+# it, so a case holds each transcript and response exactly once.
+
+# Prefix used when a log entry's message is rendered from a result field
+FIELD_LABELS = {
+    "transcript": "Transcript: ",
+    "extracted_info": "Extracted Info: ",
+    "generated_response": ""
+}
+
+def format_log_field(field: str, value: Any) -> str:
+    """Render a result field the way it used to be written into the log message"""
+    if isinstance(value, ExtractedInfo):
+        value = value.to_dict()
+    if isinstance(value, dict):
+        value = json.dumps(value, indent=2)
+    return f"{FIELD_LABELS.get(field, '')}{value}"
+
+@dataclass
+class ExtractedInfo:
+    """Topic, description and sentiment of one conversation"""
+    __slots__ = ("topic_name", "description", "overall_sentiment")
+    topic_name: str
+    description: str
+    overall_sentiment: str
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "ExtractedInfo":
+        data = data or {}
+        return cls(
+            topic_name=data.get("topic_name", ""),
+            description=data.get("description", ""),
+            overall_sentiment=data.get("overall_sentiment", "")
+        )
+
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            "topic_name": self.topic_name,
+            "description": self.description,
+            "overall_sentiment": self.overall_sentiment
+        }
+
+@dataclass
+class AgentLogEntry:
+    """One agent step - either its own message or the name of the field it produced"""
+    __slots__ = ("agent", "status", "timestamp", "message", "field", "path")
+    agent: str
+    status: str
+    timestamp: str
+    message: Optional[str]
+    field: Optional[str]
+    path: Optional[str]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AgentLogEntry":
+        return cls(
+            agent=data["agent"],
+            status=data["status"],
+            timestamp=data.get("timestamp", ""),
+            message=data.get("message"),
+            field=data.get("field"),
+            path=data.get("path")
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        entry = {"agent": self.agent, "status": self.status, "timestamp": self.timestamp}
+        for key in ("message", "field", "path"):
+            value = getattr(self, key)
+            if value is not None:
+                entry[key] = value
+        return entry
+
+@dataclass
+class CaseResult:
+    """What a case keeps of an agent run - no retrieved documents, no duplicated text"""
+    __slots__ = (
+        "request_id", "transcript", "extracted_info", "generated_response",
+        "retrieved_solutions", "agent_logs", "stage_timings"
+    )
+    request_id: Optional[str]
+    transcript: str
+    extracted_info: ExtractedInfo
+    generated_response: str
+    retrieved_solutions: int
+    agent_logs: Tuple[AgentLogEntry, ...]
+    stage_timings: Dict[str, float]
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], request_id: str = None) -> "CaseResult":
+        """Build from a finished AgentState"""
+        return cls(
+            request_id=request_id or state.get("request_id"),
+            transcript=state.get("transcript", ""),
+            extracted_info=ExtractedInfo.from_dict(state.get("extracted_info")),
+            generated_response=state.get("generated_response", ""),
+            retrieved_solutions=len(state.get("retrieved_context") or []),
+            agent_logs=tuple(AgentLogEntry.from_dict(log) for log in state.get("agent_logs", [])),
+            stage_timings=dict(state.get("stage_timings") or {})
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CaseResult":
+        """Load a stored case result - also accepts the older full AgentState dicts"""
+        if "retrieved_solutions" not in data:
+            return cls.from_state(data)
+        return cls(
+            request_id=data.get("request_id"),
+            transcript=data.get("transcript", ""),
+            extracted_info=ExtractedInfo.from_dict(data.get("extracted_info")),
+            generated_response=data.get("generated_response", ""),
+            retrieved_solutions=data.get("retrieved_solutions", 0),
+            agent_logs=tuple(AgentLogEntry.from_dict(log) for log in data.get("agent_logs", [])),
+            stage_timings=data.get("stage_timings") or {}
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready dict for the case store"""
+        return {
+            "request_id": self.request_id,
+            "transcript": self.transcript,
+            "extracted_info": self.extracted_info.to_dict(),
+            "generated_response": self.generated_response,
+            "retrieved_solutions": self.retrieved_solutions,
+            "agent_logs": [log.to_dict() for log in self.agent_logs],
+            "stage_timings": self.stage_timings
+        }
+
+    def log_message(self, log: AgentLogEntry) -> str:
+        """Message of a log entry, rendered from the referenced field when it has one"""
+        if log.field:
+            return format_log_field(log.field, getattr(self, log.field, ""))
+        return log.message or ""
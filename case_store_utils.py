@@ -0,0 +1,207 @@
+import os
+import json
+import uuid
+import time
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from chroma_db_utils import get_env_var
+from priority_utils import priority_score, priority_key, priority_class, latency_summary
+
+# Case lifecycle: pending -> approved | rejected
+CASE_STATUSES = ("pending", "approved", "rejected")
+
+# Columns added after the first release - created on older databases at startup
+_PRIORITY_COLUMNS = {
+    "sentiment": "TEXT",
+    "topic": "TEXT",
+    "priority_key": "REAL"
+}
+
+# Databases whose schema has already been created by this process
+_initialized_paths = set()
+
+def get_case_db_path():
+    """Get the SQLite path of the shared case store"""
+    return get_env_var('CASE_DB_PATH', 'data/cases.db')
+
+def get_connection():
+    """Open a connection to the case store, creating the schema on first use"""
+    db_path = get_case_db_path()
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if db_path in _initialized_paths:
+        return conn
+
+    # WAL lets Streamlit sessions read while another process writes
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS cases (
+            case_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'pending',
+            filename TEXT,
+            result TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_cases_status_created ON cases (status, created_at);
+        CREATE INDEX IF NOT EXISTS idx_cases_created ON cases (created_at);
+    """)
+    existing = {row['name'] for row in conn.execute("PRAGMA table_info(cases)")}
+    for column, definition in _PRIORITY_COLUMNS.items():
+        if column not in existing:
+            try:
+                conn.execute(f"ALTER TABLE cases ADD COLUMN {column} {definition}")
+            except sqlite3.OperationalError as e:
+                # Another process or thread migrated the table first
+                if "duplicate column" not in str(e):
+                    raise
+    _backfill_priorities(conn)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cases_status_priority ON cases (status, priority_key)")
+    conn.commit()
+    _initialized_paths.add(db_path)
+    return conn
+
+def _case_priority(result, created_ts):
+    """(sentiment, topic, priority_key) of a stored result"""
+    extracted_info = result.get('extracted_info') or {}
+    sentiment = extracted_info.get('overall_sentiment')
+    topic = extracted_info.get('topic_name')
+    return sentiment, topic, priority_key(priority_score(sentiment, topic), created_ts)
+
+def _backfill_priorities(conn):
+    """Give cases stored before priorities their sentiment, topic and sort key"""
+    rows = conn.execute(
+        "SELECT case_id, result, CAST(strftime('%s', created_at, 'utc') AS REAL) AS created_ts "
+        "FROM cases WHERE priority_key IS NULL"
+    ).fetchall()
+    conn.executemany(
+        "UPDATE cases SET sentiment = ?, topic = ?, priority_key = ? WHERE case_id = ?",
+        [(*_case_priority(json.loads(row['result']), row['created_ts']), row['case_id']) for row in rows]
+    )
+
+@contextmanager
+def _connect():
+    """Connection scoped to one operation - commits on success and always closes"""
+    conn = get_connection()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def _row_to_case(row):
+    """Convert a cases row into the dict shape the UI works with"""
+    if row is None:
+        return None
+    return {
+        'case_id': row['case_id'],
+        'status': row['status'],
+        'filename': row['filename'],
+        'result': json.loads(row['result']),
+        'timestamp': row['created_at'],
+        'updated_at': row['updated_at']
+    }
+
+def create_case(result, filename=None, case_id=None):
+    """Store a processed agent result as a pending case and return its case ID"""
+    case_id = case_id or uuid.uuid4().hex
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    sentiment, topic, key = _case_priority(result, time.time())
+    with _connect() as conn:
+        conn.execute(
+            """INSERT INTO cases (case_id, status, filename, result, created_at, updated_at, sentiment, topic, priority_key)
+               VALUES (?, 'pending', ?, ?, ?, ?, ?, ?, ?)""",
+            (case_id, filename, json.dumps(result, default=str), now, now, sentiment, topic, key)
+        )
+    return case_id
+
+def get_case(case_id):
+    """Get a single case by ID, or None if it does not exist"""
+    if not case_id:
+        return None
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM cases WHERE case_id = ?", (case_id,)).fetchone()
+    return _row_to_case(row)
+
+def get_case_status(case_id):
+    """Get only the status of a case - avoids decoding the stored result"""
+    if not case_id:
+        return None
+    with _connect() as conn:
+        row = conn.execute("SELECT status FROM cases WHERE case_id = ?", (case_id,)).fetchone()
+    return row['status'] if row else None
+
+def list_cases(status=None, limit=None, by_priority=False):
+    """List cases oldest first (or in review order with by_priority), optionally filtered by status"""
+    query = "SELECT * FROM cases"
+    params = []
+    if status:
+        query += " WHERE status = ?"
+        params.append(status)
+    query += " ORDER BY priority_key, rowid" if by_priority else " ORDER BY created_at, rowid"
+    if limit:
+        query += " LIMIT ?"
+        params.append(int(limit))
+
+    with _connect() as conn:
+        rows = conn.execute(query, params).fetchall()
+    return [_row_to_case(row) for row in rows]
+
+def get_oldest_pending_case():
+    """Get the case that has been waiting longest for review"""
+    cases = list_cases(status="pending", limit=1)
+    return cases[0] if cases else None
+
+def get_next_pending_case():
+    """Get the next case for Support Engineer review - highest aged priority first"""
+    cases = list_cases(status="pending", limit=1, by_priority=True)
+    return cases[0] if cases else None
+
+def count_cases(status):
+    """Count cases in a given status using the status index"""
+    with _connect() as conn:
+        row = conn.execute("SELECT COUNT(*) AS n FROM cases WHERE status = ?", (status,)).fetchone()
+    return row['n']
+
+def update_case_status(case_id, status, expected_status="pending"):
+    """Move a case to a new status if it is still in expected_status
+
+    Returns True only for the caller that made the move - with several
+    engineers on the shared queue, a case another session already approved or
+    rejected is left alone. expected_status=None moves it from any status.
+    """
+    return bool(update_case_statuses([case_id], status, expected_status=expected_status))
+
+def update_case_statuses(case_ids, status, expected_status="pending"):
+    """Move many cases to a new status in one transaction, returns the IDs that were moved"""
+    if status not in CASE_STATUSES:
+        raise ValueError(f"Unknown case status: {status}")
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    query = "UPDATE cases SET status = ?, updated_at = ? WHERE case_id = ?"
+    if expected_status:
+        query += " AND status = ?"
+    moved = []
+    with _connect() as conn:
+        for case_id in case_ids:
+            params = (status, now, case_id) + ((expected_status,) if expected_status else ())
+            if conn.execute(query, params).rowcount:
+                moved.append(case_id)
+    return moved
+
+def review_wait_report():
+    """Time from stored to approved/rejected per priority class"""
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT sentiment, (julianday(updated_at) - julianday(created_at)) * 86400 AS waited "
+            "FROM cases WHERE status IN ('approved', 'rejected')"
+        ).fetchall()
+    waits = {}
+    for row in rows:
+        waits.setdefault(priority_class(row['sentiment']), []).append(row['waited'])
+    return latency_summary(waits)
@@ -1,25 +1,55 @@
-import pandas as pd
-import chromadb
 import os
+import time
 import shutil
+import uuid
+import sqlite3
+import threading
 from dotenv import load_dotenv
+from profiling_utils import profile_run
+
+# chromadb and pandas are imported inside the functions that need them so
+# that importing this module (e.g. for get_env_var) stays cheap
+
+# Streamlit secrets, or None without a secrets.toml - probed once per process,
+# a missing file would otherwise be looked for on every get_env_var call
+_streamlit_secrets = {"checked": False, "secrets": None}
+
+def _get_streamlit_secrets():
+    if not _streamlit_secrets["checked"]:
+        try:
+            import streamlit as st
+            _streamlit_secrets["secrets"] = st.secrets if st.secrets.load_if_toml_exists() else None
+        except ImportError:
+            _streamlit_secrets["secrets"] = None
+        _streamlit_secrets["checked"] = True
+    return _streamlit_secrets["secrets"]
 
 # Load environment variables - with Streamlit secrets fallback
 def get_env_var(key, default=None):
     """Get environment variable from Streamlit secrets or os.environ"""
-    try:
-        import streamlit as st
-        return st.secrets[key]
-    except:
-        return os.getenv(key, default)
+    secrets = _get_streamlit_secrets()
+    if secrets is not None and key in secrets:
+        return secrets[key]
+    return os.getenv(key, default)
+
+# Base name of the knowledge base - re-indexed versions are named <base>_v<N>
+KB_COLLECTION_NAME = "customer_service_kb"
+
+# How a case is turned into the text that gets embedded - changing it needs a
+# re-index (python kb_index_utils.py reindex) to take effect for existing cases
+DOCUMENT_TEMPLATE = "Topic: {topic_name}. Query: {description}. Solution: {solution}"
+
+def build_document(topic_name, description, solution):
+    """Text embedded for a case"""
+    return DOCUMENT_TEMPLATE.format(topic_name=topic_name, description=description, solution=solution)
 
 def get_next_id():
     """Get the next ID by finding the maximum existing ID and adding 1"""
     try:
         # Get existing collection to find max ID
         collection = get_or_create_collection()
-        # Get all documents to find max ID
-        results = collection.get()
+        # Only the IDs are needed - skip documents, metadata and embeddings
+        results = collection.get(include=[])
         if results['ids']:
             max_id = max(int(id) for id in results['ids'])
             return max_id + 1
@@ -29,29 +59,158 @@ def get_next_id():
         print(f"Error getting next ID: {e}")
         return 1
 
-def get_or_create_collection():
-    """Get existing collection or create a new one - single persistent collection"""
-    chroma_db_path = get_env_var('CHROMA_DB_PATH', './chroma_db')
-    client = chromadb.PersistentClient(path=chroma_db_path)
+# CHROMA_MODE=persistent (default) opens CHROMA_DB_PATH in-process. CHROMA_MODE=http
+# talks to a shared Chroma server (chroma run --path <dir>) so replicas share one
+# knowledge base and writes are serialized by the server instead of a SQLite lock:
+#   CHROMA_HOST / CHROMA_PORT / CHROMA_SSL           server for writes (and reads)
+#   CHROMA_READ_HOST / CHROMA_READ_PORT              optional read replica for queries
+#   CHROMA_HTTP_TIMEOUT_SECS                         per-request timeout (connect capped at 5s)
+#   CHROMA_HTTP_KEEPALIVE_SECS                       idle pooled connections are closed after this
+#   CHROMA_HTTP_MAX_CONNECTIONS / CHROMA_HTTP_MAX_KEEPALIVE_CONNECTIONS  pool size
+CHROMA_MODES = ("persistent", "http")
+
+_http_clients = {}
+_http_clients_lock = threading.Lock()
+
+def get_chroma_mode():
+    """persistent or http"""
+    mode = str(get_env_var('CHROMA_MODE', 'persistent')).lower()
+    if mode not in CHROMA_MODES:
+        raise ValueError(f"Unknown CHROMA_MODE {mode!r} - expected one of {', '.join(CHROMA_MODES)}")
+    return mode
+
+def get_chroma_client(role="write"):
+    """Persistent client on CHROMA_DB_PATH, or a pooled HTTP client in http mode
+
+    role="read" goes to CHROMA_READ_HOST when one is configured.
+    """
+    import chromadb
+    if get_chroma_mode() == "persistent":
+        chroma_db_path = get_env_var('CHROMA_DB_PATH', './chroma_db')
+        return chromadb.PersistentClient(path=chroma_db_path)
+
+    host = get_env_var('CHROMA_HOST', 'localhost')
+    port = int(get_env_var('CHROMA_PORT', 8000))
+    if role == "read" and get_env_var('CHROMA_READ_HOST'):
+        host = get_env_var('CHROMA_READ_HOST')
+        port = int(get_env_var('CHROMA_READ_PORT', port))
+
+    # One client per server and process, so its connection pool is reused across calls
+    key = (host, port)
+    with _http_clients_lock:
+        if key not in _http_clients:
+            _http_clients[key] = _create_http_client(host, port)
+        return _http_clients[key]
+
+def _create_http_client(host, port):
+    import httpx
+    import chromadb
+    from chromadb.config import Settings
+
+    def optional_number(key, cast):
+        value = get_env_var(key)
+        return cast(value) if value not in (None, "") else None
+
+    settings = Settings(
+        anonymized_telemetry=False,
+        chroma_http_keepalive_secs=optional_number('CHROMA_HTTP_KEEPALIVE_SECS', float) or 40.0,
+        chroma_http_max_connections=optional_number('CHROMA_HTTP_MAX_CONNECTIONS', int),
+        chroma_http_max_keepalive_connections=optional_number('CHROMA_HTTP_MAX_KEEPALIVE_CONNECTIONS', int)
+    )
+    ssl = str(get_env_var('CHROMA_SSL', 'false')).lower() in ('1', 'true', 'yes')
+    client = chromadb.HttpClient(host=host, port=port, ssl=ssl, settings=settings)
+
+    # Chroma builds its httpx session without a timeout - a stalled server would hang a query forever
+    timeout = float(get_env_var('CHROMA_HTTP_TIMEOUT_SECS', 30))
+    session = getattr(getattr(client, "_server", None), "_session", None)
+    if session is not None:
+        session.timeout = httpx.Timeout(timeout, connect=min(timeout, 5.0))
+    return client
+
+# HNSW index of the knowledge base. Space, M and ef_construction are fixed when a
+# collection is built - they take effect with the next re-index
+# (python kb_index_utils.py reindex). ef_search is also applied to the existing
+# collection when it is opened - before its first query, because an index already
+# loaded in a process keeps the value it was loaded with.
+#   KB_HNSW_SPACE            l2 (default) | cosine | ip - distance thresholds are tuned for l2
+#   KB_HNSW_M                neighbors per node (16)
+#   KB_HNSW_EF_CONSTRUCTION  candidate list while building (100)
+#   KB_HNSW_EF_SEARCH        candidate list per query (100) - higher is better recall, slower
+def get_hnsw_config():
+    """HNSW settings for knowledge base collections from configuration"""
+    return {
+        "space": str(get_env_var('KB_HNSW_SPACE', 'l2')),
+        "max_neighbors": int(get_env_var('KB_HNSW_M', 16)),
+        "ef_construction": int(get_env_var('KB_HNSW_EF_CONSTRUCTION', 100)),
+        "ef_search": int(get_env_var('KB_HNSW_EF_SEARCH', 100))
+    }
+
+def apply_ef_search(collection, ef_search=None):
+    """Set the search-time candidate list of an existing collection if it differs"""
+    if ef_search is None:
+        ef_search = get_hnsw_config()["ef_search"]
+    hnsw = (collection.configuration or {}).get("hnsw") or {}
+    if hnsw.get("ef_search") is not None and hnsw["ef_search"] != ef_search:
+        collection.modify(configuration={"hnsw": {"ef_search": ef_search}})
+        print(f"Set ef_search of {collection.name} to {ef_search}")
+
+def create_kb_collection(client, name):
+    """Create a knowledge base collection embedded with the shared engine"""
+    from embedding_utils import get_embedding_engine
+    embedding_function = get_embedding_engine()
+    return client.create_collection(
+        name=name,
+        configuration={"hnsw": get_hnsw_config()},
+        metadata={
+            "description": "Customer Service Knowledge Base",
+            # Recorded so a version can be told apart from the next re-index
+            "embedding_backend": embedding_function.backend,
+            "embedding_model": embedding_function.model_name,
+            "document_template": DOCUMENT_TEMPLATE
+        },
+        embedding_function=embedding_function
+    )
+
+def get_or_create_collection(name=None, role="write"):
+    """Get the active knowledge base collection or create it - single persistent collection
+
+    The active name comes from the pointer kb_index_utils switches on re-index.
+    role="read" serves queries from the read replica in http mode; writes read
+    the pointer uncached so they follow a switch right away.
+    """
+    from chromadb.errors import NotFoundError
+    from embedding_utils import get_embedding_engine, check_collection_compatible
+    from kb_index_utils import get_active_collection_name
+    client = get_chroma_client(role)
+    name = name or get_active_collection_name(fresh=(role == "write"))
     
     try:
-        collection = client.get_collection("customer_service_kb")
+        # Loader, writers and queries all embed through the shared, configurable engine
+        collection = client.get_collection(name, embedding_function=get_embedding_engine())
         print("Using existing ChromaDB collection...")
-        return collection
-    except Exception as e:
+    except NotFoundError:
         print("Creating new ChromaDB collection...")
-        collection = client.create_collection(
-            name="customer_service_kb",
-            metadata={"description": "Customer Service Knowledge Base"}
-        )
-        return collection
+        # Always created through the writer - a read replica may not accept writes
+        return create_kb_collection(get_chroma_client(), name)
+
+    # Mixed precisions or models would make distances meaningless
+    check_collection_compatible(collection, get_embedding_engine())
+
+    try:
+        apply_ef_search(collection)
+    except Exception as e:
+        # Queries still work with the stored setting
+        print(f"Could not update ef_search: {e}")
+    return collection
 
 def add_to_chroma_only(case_id, topic_name, description, sentiment, solution):
-    """Add a single case to ChromaDB only (not CSV)"""
+    """Add a single case to ChromaDB only (not CSV) - case_id=None reserves a fresh ID"""
     try:
         collection = get_or_create_collection()
+        if case_id is None:
+            case_id = reserve_free_case_ids(collection, 1)[0]
         
-        document_text = f"Topic: {topic_name}. Query: {description}. Solution: {solution}"
+        document_text = build_document(topic_name, description, solution)
         
         collection.add(
             documents=[document_text],
@@ -71,8 +230,140 @@ def add_to_chroma_only(case_id, topic_name, description, sentiment, solution):
         print(f"Error adding to ChromaDB: {e}")
         return False
 
+# Knowledge base IDs come from one sequence shared by every writer. In
+# persistent mode it is a SQLite file next to the data (KB_ID_DB_PATH). In http
+# mode replicas may run on different hosts, so each process claims blocks of
+# KB_ID_BLOCK_SIZE IDs on the Chroma server instead: a block is a record keyed
+# by its number in a small collection, and add() keeps the first writer's
+# record, so exactly one process owns each block. Unused IDs of a block are
+# skipped when the process exits.
+KB_ID_BLOCKS_COLLECTION = "kb_id_blocks"
+
+_id_block = {"ids": [], "floor": 0}
+_id_block_lock = threading.Lock()
+
+def get_kb_id_db_path():
+    """SQLite file holding the knowledge base ID sequence in persistent mode"""
+    return get_env_var('KB_ID_DB_PATH', 'data/kb_ids.db')
+
+def _claim_id_block(min_id, attempts=10):
+    """Claim the next free block of IDs on the Chroma server, returns its IDs"""
+    block_size = int(get_env_var('KB_ID_BLOCK_SIZE', 100))
+    blocks = get_chroma_client().get_or_create_collection(KB_ID_BLOCKS_COLLECTION, embedding_function=None)
+    owner = uuid.uuid4().hex
+    for _ in range(attempts):
+        claimed = [int(block_id) for block_id in blocks.get(include=[])['ids']]
+        if not claimed:
+            # First block ever - start past the IDs already in the knowledge base
+            min_id = max(min_id, get_next_id())
+        block = max(max(claimed, default=-1) + 1, -(-min_id // block_size))
+        blocks.add(ids=[str(block)], embeddings=[[0.0]], metadatas=[{"owner": owner, "claimed_at": time.time()}])
+        # Claimed by another process in between - add() kept its record
+        if blocks.get(ids=[str(block)], include=["metadatas"])['metadatas'][0]['owner'] == owner:
+            return [case_id for case_id in range(block * block_size, (block + 1) * block_size) if case_id >= min_id]
+    raise RuntimeError("Could not claim a block of knowledge base IDs")
+
+def _allocate_server_case_ids(count, floor=None):
+    with _id_block_lock:
+        if floor is not None:
+            _id_block["floor"] = max(_id_block["floor"], floor)
+        case_ids = []
+        while len(case_ids) < count:
+            _id_block["ids"] = [case_id for case_id in _id_block["ids"] if case_id >= _id_block["floor"]]
+            if not _id_block["ids"]:
+                _id_block["ids"] = _claim_id_block(_id_block["floor"])
+            taken = _id_block["ids"][:count - len(case_ids)]
+            del _id_block["ids"][:len(taken)]
+            case_ids.extend(taken)
+        return case_ids
+
+def allocate_case_ids(count, floor=None):
+    """Reserve count IDs from a sequence shared by every process
+
+    The sequence is seeded once from the largest ID in the collection. floor
+    moves it past IDs written without it (CSV loads). Two callers never get
+    the same IDs.
+    """
+    if get_chroma_mode() == "http":
+        return _allocate_server_case_ids(count, floor)
+    db_path = get_kb_id_db_path()
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS kb_id_sequence (name TEXT PRIMARY KEY, next_id INTEGER NOT NULL)")
+        # BEGIN IMMEDIATE takes the write lock up front so two callers never read the same next_id
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT next_id FROM kb_id_sequence WHERE name = ?", (KB_COLLECTION_NAME,)).fetchone()
+            next_id = row[0] if row else get_next_id()
+            if floor is not None:
+                next_id = max(next_id, floor)
+            conn.execute(
+                "INSERT OR REPLACE INTO kb_id_sequence (name, next_id) VALUES (?, ?)",
+                (KB_COLLECTION_NAME, next_id + count)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return list(range(next_id, next_id + count))
+
+def reserve_free_case_ids(collection, count, attempts=3):
+    """Allocate IDs and make sure none is taken yet - Chroma's add() silently skips existing IDs"""
+    for _ in range(attempts):
+        case_ids = allocate_case_ids(count)
+        taken = collection.get(ids=[str(case_id) for case_id in case_ids], include=[])['ids']
+        if not taken:
+            return case_ids
+        # Written without the sequence (e.g. a CSV load) - move it past the largest ID once
+        print(f"IDs {', '.join(taken)} already in the knowledge base - moving the ID sequence on")
+        allocate_case_ids(0, floor=get_next_id())
+    raise RuntimeError(f"Could not reserve {count} free knowledge base IDs")
+
+def add_cases_to_chroma(cases, source="human_approved"):
+    """Add many approved cases with one embedded batch, returns their IDs ([] on failure)
+
+    Each case is a dict with topic_name, description, sentiment and solution.
+    """
+    if not cases:
+        return []
+    try:
+        collection = get_or_create_collection()
+        case_ids = reserve_free_case_ids(collection, len(cases))
+        
+        documents = []
+        metadatas = []
+        for case_id, case in zip(case_ids, cases):
+            documents.append(build_document(case['topic_name'], case['description'], case['solution']))
+            metadatas.append({
+                "id": str(case_id),
+                "topic_name": case['topic_name'],
+                "description": case['description'],
+                "sentiment": case['sentiment'],
+                "solution": case['solution'],
+                "source": source
+            })
+        
+        collection.add(
+            documents=documents,
+            metadatas=metadatas,
+            ids=[str(case_id) for case_id in case_ids]
+        )
+        print(f"Successfully added {len(case_ids)} cases to ChromaDB")
+        return case_ids
+    except Exception as e:
+        print(f"Error adding cases to ChromaDB: {e}")
+        return []
+
+@profile_run("load_csv_to_chroma")
 def load_csv_to_chroma(csv_file_path, batch_size=100):
     """Load data from CSV file into ChromaDB using batch processing"""
+    import pandas as pd
+    
     try:
         # Check if CSV file exists
         if not os.path.exists(csv_file_path):
@@ -102,7 +393,7 @@ def load_csv_to_chroma(csv_file_path, batch_size=100):
             
             for _, row in batch.iterrows():
                 try:
-                    document_text = f"Topic: {row['topic_name']}. Query: {row['description']}. Solution: {row['solution']}"
+                    document_text = build_document(row['topic_name'], row['description'], row['solution'])
                     
                     documents.append(document_text)
                     metadatas.append({
@@ -188,6 +479,8 @@ def get_all_records():
         return None
 
 if __name__ == "__main__":
+    import pandas as pd
+    
     # Define your CSV file path
     CSV_FILE_PATH = get_env_var('CSV_DATA_PATH', 'data/customer_service_data.csv')
     
@@ -0,0 +1,153 @@
+import re
+import logging
+from chroma_db_utils import get_env_var, build_document
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio for English text with LLaMA-style tokenizers
+CHARS_PER_TOKEN = 4
+
+NO_CONTEXT_MESSAGE = "No specific solutions found in knowledge base"
+
+def estimate_tokens(text):
+    """Cheap token estimate used for budgeting - no tokenizer download needed"""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def truncate_to_tokens(text, max_tokens):
+    """Truncate text to roughly max_tokens, cutting at a sentence boundary when possible"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+
+    kept = ""
+    for sentence in sentences:
+        candidate = f"{kept} {sentence}".strip()
+        if len(candidate) > max_chars:
+            break
+        kept = candidate
+
+    # First sentence alone is over the limit - hard cut on a word boundary
+    if not kept:
+        kept = text[:max_chars].rsplit(' ', 1)[0]
+
+    return kept.rstrip() + " ..."
+
+def format_context_entry(content, metadata, max_solution_tokens):
+    """Format a single retrieved case, shortening its solution to max_solution_tokens"""
+    metadata = metadata or {}
+    solution = metadata.get('solution')
+
+    # Rebuild from metadata so only the solution gets shortened, not topic/query
+    if solution:
+        solution = truncate_to_tokens(solution, max_solution_tokens)
+        return build_document(metadata.get('topic_name', 'N/A'), metadata.get('description', 'N/A'), solution)
+
+    return truncate_to_tokens(content, max_solution_tokens)
+
+def build_context(retrieved_context, token_budget=None, max_distance=None, max_solution_tokens=None):
+    """Assemble the prompt context from retrieved cases within a token budget
+
+    Hits are ranked by distance (closest first), hits further than max_distance
+    are dropped and long solutions are truncated. Returns (context_str, stats).
+    """
+    if token_budget is None:
+        token_budget = int(get_env_var('CONTEXT_TOKEN_BUDGET', 600))
+    if max_distance is None:
+        max_distance = float(get_env_var('CONTEXT_MAX_DISTANCE', 1.5))
+    if max_solution_tokens is None:
+        max_solution_tokens = int(get_env_var('CONTEXT_MAX_SOLUTION_TOKENS', 120))
+
+    # What the prompt would have cost with the old "join everything" behaviour
+    baseline_tokens = estimate_tokens("\n".join([f"• {doc['content']}" for doc in retrieved_context]))
+
+    ranked = sorted(
+        retrieved_context,
+        key=lambda doc: doc['distance'] if doc.get('distance') is not None else float('inf')
+    )
+
+    entries = []
+    used_tokens = 0
+    dropped_by_distance = 0
+    dropped_by_budget = 0
+
+    for doc in ranked:
+        distance = doc.get('distance')
+        if distance is not None and distance > max_distance:
+            dropped_by_distance += 1
+            continue
+
+        entry = f"• {format_context_entry(doc['content'], doc.get('metadata'), max_solution_tokens)}"
+        entry_tokens = estimate_tokens(entry)
+        if used_tokens + entry_tokens > token_budget:
+            dropped_by_budget += 1
+            continue
+
+        entries.append(entry)
+        used_tokens += entry_tokens
+
+    context_str = "\n".join(entries) if entries else NO_CONTEXT_MESSAGE
+
+    stats = {
+        "hits": len(retrieved_context),
+        "used": len(entries),
+        "dropped_by_distance": dropped_by_distance,
+        "dropped_by_budget": dropped_by_budget,
+        "baseline_tokens": baseline_tokens,
+        "context_tokens": used_tokens,
+        "tokens_saved": max(baseline_tokens - used_tokens, 0)
+    }
+
+    logger.info(
+        f"Context built: {stats['used']}/{stats['hits']} hits, "
+        f"{stats['context_tokens']} tokens (budget {token_budget}), "
+        f"saved {stats['tokens_saved']} prompt tokens"
+    )
+
+    return context_str, stats
+
+def find_fast_path_hit(retrieved_context, sentiment, max_distance=None, sources=None):
+    """Closest hit when it is near enough, vetted and for the same sentiment - else None
+
+    Such a hit already holds an approved answer to this exact kind of query,
+    so the caller can return its solution instead of generating a new one.
+    """
+    if max_distance is None:
+        max_distance = float(get_env_var('FAQ_MAX_DISTANCE', 0.25))
+    if sources is None:
+        sources = [source.strip() for source in str(get_env_var('FAQ_SOURCES', 'human_approved')).split(',') if source.strip()]
+
+    ranked = [doc for doc in retrieved_context if doc.get('distance') is not None]
+    if not ranked:
+        return None
+    top = min(ranked, key=lambda doc: doc['distance'])
+
+    metadata = top.get('metadata') or {}
+    if top['distance'] > max_distance:
+        return None
+    if metadata.get('source') not in sources or not metadata.get('solution'):
+        return None
+    if str(metadata.get('sentiment', '')).lower() != str(sentiment or '').lower():
+        return None
+    return top
+
+def render_fast_path_answer(hit, template=None):
+    """Stored solution of a fast path hit, optionally wrapped in FAQ_TEMPLATE
+
+    The template may use {solution}, {topic_name} and {description}.
+    """
+    if template is None:
+        template = get_env_var('FAQ_TEMPLATE', '{solution}')
+    metadata = hit.get('metadata') or {}
+    try:
+        return template.format(
+            solution=metadata['solution'],
+            topic_name=metadata.get('topic_name', ''),
+            description=metadata.get('description', '')
+        ).strip()
+    except (KeyError, IndexError, ValueError) as e:
+        logger.warning(f"Invalid FAQ_TEMPLATE ({e}) - returning the stored solution as is")
+        return metadata['solution']
@@ -0,0 +1,249 @@
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+from functools import cached_property
+from typing import Any, Dict, List
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+from chroma_db_utils import get_env_var
+from metrics_utils import increment, observe
+
+# One embedding engine shared by the CSV loader, KB writes and queries, so the
+# model, precision, thread count and batch size are set in one place:
+#   EMBEDDING_BACKEND     onnx (default) | onnx-int8 | sentence-transformers
+#   EMBEDDING_MODEL       sentence-transformers model (default all-MiniLM-L6-v2)
+#   EMBEDDING_THREADS     intra-op threads, 0 = runtime default
+#   EMBEDDING_BATCH_SIZE  documents per forward pass
+#   EMBEDDING_QUERY_CACHE_SIZE  query embeddings kept in the LRU, 0 disables it
+#
+#   python embedding_utils.py   check that a batch of different-length texts embeds like single texts
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+BACKENDS = ("onnx", "onnx-int8", "sentence-transformers")
+
+def embedding_name(backend, model=DEFAULT_MODEL):
+    """Name of the vector space a backend and model embed into
+
+    int8 weights give slightly different vectors than fp32 ones, so they get
+    their own name and are never mixed into the same collection.
+    """
+    if model == DEFAULT_MODEL:
+        return "default_int8" if backend == "onnx-int8" else "default"
+    return f"local_{model.replace('/', '_')}"
+
+def check_collection_compatible(collection, engine):
+    """Refuse to read or write a collection embedded with a different model or precision
+
+    Chroma keeps no name for an unregistered embedding function, so the
+    backend and model recorded by create_kb_collection are compared instead.
+    Collections from before they were recorded used the default fp32 model.
+    """
+    metadata = collection.metadata or {}
+    stored = embedding_name(metadata.get("embedding_backend", "onnx"), metadata.get("embedding_model", DEFAULT_MODEL))
+    if stored != engine.name():
+        raise ValueError(
+            f"{collection.name} was embedded as {stored}, EMBEDDING_BACKEND/EMBEDDING_MODEL give {engine.name()} - "
+            f"re-index (python kb_index_utils.py reindex) to switch"
+        )
+
+class OnnxMiniLMEncoder(ONNXMiniLM_L6_V2):
+    """Chroma's bundled all-MiniLM-L6-v2 ONNX model with thread control and optional int8 weights
+
+    Batches are padded to their longest text instead of a fixed 256 tokens -
+    mean pooling ignores padding, so the vectors match Chroma's default.
+    """
+
+    def __init__(self, threads=0, quantized=False):
+        super().__init__(preferred_providers=["CPUExecutionProvider"])
+        self.threads = threads
+        self.quantized = quantized
+
+    @cached_property
+    def tokenizer(self) -> Any:
+        tokenizer = self.Tokenizer.from_file(
+            os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "tokenizer.json")
+        )
+        tokenizer.enable_truncation(max_length=256)
+        tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        return tokenizer
+
+    @cached_property
+    def model(self) -> Any:
+        so = self.ort.SessionOptions()
+        so.log_severity_level = 3
+        so.graph_optimization_level = self.ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            so.intra_op_num_threads = self.threads
+            so.inter_op_num_threads = 1
+        return self.ort.InferenceSession(self.model_path(), providers=self._preferred_providers, sess_options=so)
+
+    def model_path(self):
+        """Path of the fp32 model, quantizing it to int8 on first use when asked to"""
+        fp32_path = os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "model.onnx")
+        if not self.quantized:
+            return fp32_path
+
+        int8_path = os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "model_int8.onnx")
+        if not os.path.exists(int8_path):
+            try:
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+            except ImportError:
+                raise RuntimeError("EMBEDDING_BACKEND=onnx-int8 needs the onnx package - pip install onnx")
+            # Write next to the target and rename, so a concurrent loader never sees half a file
+            tmp_path = f"{int8_path}.{os.getpid()}.tmp"
+            quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, int8_path)
+        return int8_path
+
+    def _forward(self, documents: List[str], batch_size: int = 32) -> np.ndarray:
+        """Chroma's forward pass, but each batch is tokenized together and padded to its longest text
+
+        Chroma encodes documents one by one and stacks the ids, which only
+        works with a fixed padding length.
+        """
+        all_embeddings = []
+        for i in range(0, len(documents), batch_size):
+            encoded = self.tokenizer.encode_batch(documents[i:i + batch_size])
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            last_hidden_state = self.model.run(None, {
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "token_type_ids": np.zeros_like(input_ids)
+            })[0]
+
+            # Mean pooling over real tokens only
+            mask = np.expand_dims(attention_mask, -1).astype(last_hidden_state.dtype)
+            embeddings = (last_hidden_state * mask).sum(1) / np.clip(mask.sum(1), 1e-9, None)
+            all_embeddings.append(self._normalize(embeddings).astype(np.float32))
+        return np.concatenate(all_embeddings)
+
+    def encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        self._download_model_if_not_exists()
+        return self._forward(texts, batch_size=batch_size)
+
+class SentenceTransformerEncoder:
+    """Any sentence-transformers model on CPU - needs sentence-transformers (and torch) installed"""
+
+    def __init__(self, model_name=DEFAULT_MODEL, threads=0):
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise RuntimeError("EMBEDDING_BACKEND=sentence-transformers needs the sentence-transformers package")
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True)
+
+class EmbeddingEngine(EmbeddingFunction[Documents]):
+    """Chroma embedding function with batching, thread control and an LRU of query embeddings"""
+
+    def __init__(self, backend=None, model=None, threads=None, batch_size=None, cache_size=None):
+        self.backend = backend or get_env_var('EMBEDDING_BACKEND', 'onnx')
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown EMBEDDING_BACKEND {self.backend!r} - expected one of {', '.join(BACKENDS)}")
+        self.model_name = model or get_env_var('EMBEDDING_MODEL', DEFAULT_MODEL)
+        self.threads = int(threads if threads is not None else get_env_var('EMBEDDING_THREADS', 0))
+        self.batch_size = int(batch_size if batch_size is not None else get_env_var('EMBEDDING_BATCH_SIZE', 32))
+        self.cache_size = int(cache_size if cache_size is not None else get_env_var('EMBEDDING_QUERY_CACHE_SIZE', 1024))
+
+        if self.backend == "sentence-transformers":
+            self.encoder = SentenceTransformerEncoder(self.model_name, threads=self.threads)
+        else:
+            if self.model_name != DEFAULT_MODEL:
+                raise ValueError(f"The {self.backend} backend only ships {DEFAULT_MODEL}")
+            self.encoder = OnnxMiniLMEncoder(threads=self.threads, quantized=self.backend == "onnx-int8")
+
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def __call__(self, input: Documents) -> Embeddings:
+        """Embed documents in batch_size chunks"""
+        if not input:
+            return []
+        started = time.perf_counter()
+        embeddings = self.encoder.encode(list(input), self.batch_size)
+        observe("embedding.docs_ms_per_doc", (time.perf_counter() - started) * 1000 / len(input))
+        increment("embedding.docs", len(input))
+        return [np.asarray(embedding, dtype=np.float32) for embedding in embeddings]
+
+    def embed_query(self, input: Documents) -> Embeddings:
+        """Embed query texts, serving repeated queries from the LRU"""
+        if not self.cache_size:
+            return self.__call__(input)
+
+        results = {}
+        with self._cache_lock:
+            for text in input:
+                if text in self._cache:
+                    self._cache.move_to_end(text)
+                    results[text] = self._cache[text]
+        misses = [text for text in dict.fromkeys(input) if text not in results]
+        increment("embedding.query_cache_hits", len(input) - len(misses))
+        increment("embedding.query_cache_misses", len(misses))
+
+        if misses:
+            started = time.perf_counter()
+            embedded = self.__call__(misses)
+            observe("embedding.query_ms", (time.perf_counter() - started) * 1000)
+            with self._cache_lock:
+                for text, embedding in zip(misses, embedded):
+                    results[text] = embedding
+                    self._cache[text] = embedding
+                    self._cache.move_to_end(text)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return [results[text] for text in input]
+
+    def name(self) -> str:
+        # The bundled MiniLM vectors are what Chroma's default function produces,
+        # so existing collections keep working. Another model gets its own name and
+        # Chroma refuses to mix it into a collection embedded with the default.
+        # An instance method on purpose - registering the class under "default"
+        # would replace Chroma's own default function process-wide.
+        return embedding_name(self.backend, self.model_name)
+
+    def default_space(self):
+        # Distance thresholds (CONTEXT_MAX_DISTANCE, FAQ_MAX_DISTANCE) are tuned for l2
+        return "l2"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "model": self.model_name}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "EmbeddingEngine":
+        return EmbeddingEngine(backend=config.get("backend"), model=config.get("model"))
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_embedding_engine():
+    """Get the process-wide embedding engine, creating it on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = EmbeddingEngine()
+    return _engine
+
+def check_mixed_lengths(engine=None):
+    """Embed a short and a long text in one call and compare with embedding each alone"""
+    engine = engine or get_embedding_engine()
+    texts = ["No signal.", "My bill shows roaming charges for days I was at home, and the app will not let me dispute them. " * 4]
+    together = np.asarray(engine.encoder.encode(texts, batch_size=len(texts)))
+    alone = np.concatenate([np.asarray(engine.encoder.encode([text], batch_size=1)) for text in texts])
+    difference = float(np.abs(together - alone).max())
+    if together.shape != alone.shape or difference > 1e-4:
+        raise RuntimeError(f"Batched embeddings differ from single ones (max difference {difference:.2e})")
+    return difference
+
+if __name__ == "__main__":
+    print(f"Mixed-length batch OK (max difference {check_mixed_lengths():.2e})")
+    sys.exit(0)
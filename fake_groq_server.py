@@ -0,0 +1,129 @@
+import sys
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Minimal local stand-in for the Groq OpenAI-compatible API. Point the app at it
+# with GROQ_BASE_URL=http://127.0.0.1:<port> to exercise rate limiting, retries,
+# timeouts and the circuit breaker without a real key or network access.
+
+FAKE_TRANSCRIPT = "Hi, my mobile data ran out after two weeks and I keep getting charged for extra data. Can you help?"
+
+FAKE_EXTRACTION = {
+    "topic_name": "data_usage",
+    "description": "Customer's mobile data runs out early and they are being charged for extra data.",
+    "overall_sentiment": "negative"
+}
+
+FAKE_RESPONSE = (
+    "I'm sorry your data ran out early. I recommend our Data Boost package for 10GB of high-speed data, "
+    "and we can set up usage alerts at 50%, 80% and 100%. For a review of the extra charges, "
+    "please email your details to support@gmail.com."
+)
+
+class FakeGroqConfig:
+    """Behaviour knobs shared by all request handlers"""
+
+    def __init__(self, failure_rate=0.0, failure_status=429, latency_ms=50, slow_rate=0.0, slow_latency_ms=2000):
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.latency_ms = latency_ms
+        self.slow_rate = slow_rate
+        self.slow_latency_ms = slow_latency_ms
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+def _chat_content(request_body):
+    """Answer extraction prompts with JSON and everything else with a canned reply"""
+    prompt = " ".join(str(message.get("content", "")) for message in request_body.get("messages", []))
+    if "JSON array" in prompt:
+        count = prompt.count("<transcript index=")
+        return json.dumps([{"index": i, **FAKE_EXTRACTION} for i in range(count)])
+    if "Return ONLY the JSON object" in prompt:
+        return json.dumps(FAKE_EXTRACTION)
+    return FAKE_RESPONSE
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    config = FakeGroqConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        config = self.config
+        length = int(self.headers.get("Content-Length", 0))
+        raw_body = self.rfile.read(length)
+
+        with config.lock:
+            config.requests += 1
+            fail = random.random() < config.failure_rate
+            if fail:
+                config.failures += 1
+
+        latency_ms = config.slow_latency_ms if random.random() < config.slow_rate else config.latency_ms
+        time.sleep(latency_ms / 1000)
+
+        if fail:
+            self._send_json(
+                config.failure_status,
+                {"error": {"message": "Injected failure", "type": "fake_error"}},
+                headers={"retry-after": "0"} if config.failure_status == 429 else None
+            )
+            return
+
+        if self.path.endswith("/audio/transcriptions"):
+            self._send_json(200, {"text": FAKE_TRANSCRIPT, "language": "en", "duration": 6.5, "segments": []})
+        elif self.path.endswith("/chat/completions"):
+            request_body = json.loads(raw_body or b"{}")
+            content = _chat_content(request_body)
+            prompt_tokens = len(raw_body) // 4
+            completion_tokens = len(content) // 4
+            self._send_json(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request_body.get("model", "fake"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
+                }
+            })
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+def start_fake_server(port=0, **config):
+    """Start the fake server on a background thread, return (server, base_url)"""
+    handler = type("ConfiguredFakeGroqHandler", (FakeGroqHandler,), {"config": FakeGroqConfig(**config)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler, bind_and_activate=False)
+    # The default listen backlog of 5 drops connection bursts into 1 s SYN retries
+    server.request_queue_size = 128
+    server.server_bind()
+    server.server_activate()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    # python fake_groq_server.py [port] [failure_rate]
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    failure_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    server, base_url = start_fake_server(port=port, failure_rate=failure_rate)
+    print(f"Fake Groq API listening on {base_url} (failure rate {failure_rate})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,348 @@
+import os
+import time
+import uuid
+import shutil
+import logging
+import sqlite3
+import traceback
+import multiprocessing
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from chroma_db_utils import get_env_var
+from metrics_utils import observe, format_metrics, write_metrics_snapshot
+from priority_utils import priority_enabled, priority_score, priority_key, priority_class, latency_summary
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle: queued -> running -> done | failed
+# With JOB_TRIAGE (default true) a new job runs up to extraction, then goes back
+# to the queue with the priority of its sentiment and topic - retrieval and the
+# response are served in priority order (see priority_utils). Triage is skipped
+# when there is nothing to reorder: without PRIORITY_SCHEDULING, or while fewer
+# jobs are queued than JOB_TRIAGE_MIN_BACKLOG (default AGENT_WORKERS) - such a
+# job runs straight through instead of waiting in the queue twice.
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+# Columns added after the first release - created on older databases at startup
+_PRIORITY_COLUMNS = {
+    "sentiment": "TEXT",
+    "topic": "TEXT",
+    "priority": "REAL NOT NULL DEFAULT 0",
+    "priority_key": "REAL",
+    "submitted_ts": "REAL",
+    "queued_ts": "REAL",
+    "wait_seconds": "REAL NOT NULL DEFAULT 0"
+}
+
+# Databases whose schema has already been created by this process
+_initialized_paths = set()
+
+def get_job_db_path():
+    """Get the SQLite path of the audio job queue"""
+    return get_env_var('JOB_DB_PATH', 'data/jobs.db')
+
+def get_metrics_dir():
+    """Directory where each worker writes its metrics snapshot"""
+    return get_env_var('METRICS_DIR', 'data/metrics')
+
+def get_job_audio_dir():
+    """Directory where queued audio files wait for a worker"""
+    return get_env_var('JOB_AUDIO_DIR', 'data/job_audio')
+
+def get_connection():
+    """Open a connection to the job queue, creating the schema on first use"""
+    db_path = get_job_db_path()
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+
+    # isolation_level=None so claiming a job can use an explicit BEGIN IMMEDIATE
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if db_path in _initialized_paths:
+        return conn
+
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'queued',
+            audio_path TEXT NOT NULL,
+            filename TEXT,
+            case_id TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+    """)
+    existing = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+    for column, definition in _PRIORITY_COLUMNS.items():
+        if column not in existing:
+            try:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+            except sqlite3.OperationalError as e:
+                # Another process or thread migrated the table first
+                if "duplicate column" not in str(e):
+                    raise
+    # Jobs from before priorities keep their place: key = submission time
+    conn.execute("""
+        UPDATE jobs SET submitted_ts = CAST(strftime('%s', created_at, 'utc') AS REAL)
+        WHERE submitted_ts IS NULL
+    """)
+    conn.execute("""
+        UPDATE jobs SET queued_ts = submitted_ts, priority_key = submitted_ts
+        WHERE priority_key IS NULL
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_priority ON jobs (status, priority_key)")
+    _initialized_paths.add(db_path)
+    return conn
+
+@contextmanager
+def _connect():
+    """Connection scoped to one operation - always closes"""
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def submit_job(audio_path, filename=None, sentiment=None, topic=None):
+    """Queue an audio file for processing and return its job ID immediately
+
+    The queue takes ownership of audio_path: the file is moved next to the job
+    and deleted by the worker once the pipeline has run. sentiment and topic
+    are optional hints - usually they are only known after extraction.
+    """
+    job_id = uuid.uuid4().hex
+    audio_dir = get_job_audio_dir()
+    os.makedirs(audio_dir, exist_ok=True)
+
+    extension = os.path.splitext(audio_path)[1]
+    job_audio_path = os.path.join(audio_dir, f"{job_id}{extension}")
+    shutil.move(audio_path, job_audio_path)
+
+    submitted_ts = time.time()
+    priority = priority_score(sentiment, topic)
+    with _connect() as conn:
+        conn.execute(
+            """INSERT INTO jobs (job_id, status, audio_path, filename, created_at, sentiment, topic,
+                                 priority, priority_key, submitted_ts, queued_ts)
+               VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (job_id, job_audio_path, filename, _now(), sentiment, topic,
+             priority, priority_key(priority, submitted_ts), submitted_ts, submitted_ts)
+        )
+    logger.info(f"Queued job {job_id} for {filename}")
+    return job_id
+
+def get_job(job_id):
+    """Get a job by ID as a dict, or None if it does not exist"""
+    if not job_id:
+        return None
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def count_jobs(status):
+    """Count jobs in a given status"""
+    with _connect() as conn:
+        row = conn.execute("SELECT COUNT(*) AS n FROM jobs WHERE status = ?", (status,)).fetchone()
+    return row['n']
+
+def claim_next_job():
+    """Atomically move the queued job with the lowest priority key to running and return it"""
+    with _connect() as conn:
+        # BEGIN IMMEDIATE takes the write lock up front so two workers never claim the same job
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY priority_key, rowid LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            waited = max(0.0, time.time() - (row['queued_ts'] or time.time()))
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, wait_seconds = wait_seconds + ? WHERE job_id = ?",
+                (_now(), waited, row['job_id'])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    observe(f"jobs.wait_ms.{priority_class(row['sentiment'])}", waited * 1000)
+    job = dict(row)
+    job['wait_seconds'] += waited
+    return job
+
+def requeue_job(job_id, sentiment=None, topic=None):
+    """Put a running job back in the queue, prioritized by what extraction found
+
+    The key ages from the original submission, so time already spent waiting counts.
+    """
+    priority = priority_score(sentiment, topic)
+    with _connect() as conn:
+        row = conn.execute("SELECT submitted_ts FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return False
+        conn.execute(
+            """UPDATE jobs SET status = 'queued', started_at = NULL, sentiment = ?, topic = ?,
+                              priority = ?, priority_key = ?, queued_ts = ?
+               WHERE job_id = ?""",
+            (sentiment, topic, priority, priority_key(priority, row['submitted_ts']), time.time(), job_id)
+        )
+    return True
+
+def finish_job(job_id, case_id=None, error=None, sentiment=None, topic=None):
+    """Mark a job as done (with the case it produced) or failed
+
+    sentiment and topic, when given, classify an untriaged job in job_wait_report.
+    """
+    status = "failed" if error else "done"
+    with _connect() as conn:
+        conn.execute(
+            """UPDATE jobs SET status = ?, case_id = ?, error = ?, finished_at = ?,
+                              sentiment = COALESCE(?, sentiment), topic = COALESCE(?, topic)
+               WHERE job_id = ?""",
+            (status, case_id, error, _now(), sentiment, topic, job_id)
+        )
+
+def job_wait_report():
+    """Queue wait of finished jobs per priority class - both passes of a triaged job count"""
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT sentiment, wait_seconds FROM jobs WHERE status IN ('done', 'failed')"
+        ).fetchall()
+    waits = {}
+    for row in rows:
+        waits.setdefault(priority_class(row['sentiment']), []).append(row['wait_seconds'])
+    return latency_summary(waits)
+
+def requeue_stale_jobs(timeout_seconds=None):
+    """Put jobs back in the queue whose worker died while running them"""
+    if timeout_seconds is None:
+        timeout_seconds = int(get_env_var('JOB_TIMEOUT_SECONDS', 600))
+    cutoff = (datetime.now() - timedelta(seconds=timeout_seconds)).strftime("%Y-%m-%d %H:%M:%S")
+    with _connect() as conn:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL, queued_ts = ? WHERE status = 'running' AND started_at < ?",
+            (time.time(), cutoff)
+        )
+    return cursor.rowcount
+
+def should_triage():
+    """Whether a new job should stop after extraction and be requeued by priority"""
+    if not priority_enabled() or str(get_env_var('JOB_TRIAGE', 'true')).lower() != 'true':
+        return False
+    min_backlog = int(get_env_var('JOB_TRIAGE_MIN_BACKLOG', get_env_var('AGENT_WORKERS', 2)))
+    # The claimed job itself is running, not queued - these are the jobs it would compete with
+    return count_jobs("queued") >= min_backlog
+
+def process_job(job):
+    """Run the agent pipeline for one claimed job and store the result as a pending case"""
+    # Imported here so the queue API stays light for the Streamlit process
+    from agentic_utils import run_agent_flow, resume_agent_flow, has_checkpoint, delete_checkpoint
+    from case_store_utils import create_case
+
+    try:
+        # A triaged job, or one whose worker died mid-run, continues from its checkpoint
+        if has_checkpoint(job['job_id']):
+            result = resume_agent_flow(job['job_id'])
+        elif should_triage():
+            state = run_agent_flow(job['audio_path'], request_id=job['job_id'], stop_after="extract")
+            extracted_info = state.get("extracted_info") or {}
+            requeue_job(job['job_id'], extracted_info.get("overall_sentiment"), extracted_info.get("topic_name"))
+            logger.info(f"Job {job['job_id']} triaged as {extracted_info.get('overall_sentiment')} - back in the queue")
+            return
+        else:
+            result = run_agent_flow(job['audio_path'], request_id=job['job_id'])
+        case_id = create_case(result["final_output"].to_dict(), filename=job['filename'])
+        # The case is stored - the job is never resumed, even if an agent failed
+        delete_checkpoint(job['job_id'])
+        extracted_info = result.get("extracted_info") or {}
+        finish_job(
+            job['job_id'], case_id=case_id,
+            sentiment=extracted_info.get("overall_sentiment"), topic=extracted_info.get("topic_name")
+        )
+        logger.info(f"Job {job['job_id']} done - case {case_id}")
+    except Exception as e:
+        finish_job(job['job_id'], error=f"{e}\n{traceback.format_exc()}")
+        logger.error(f"Job {job['job_id']} failed: {e}")
+    finally:
+        if os.path.exists(job['audio_path']):
+            os.remove(job['audio_path'])
+
+def report_worker_metrics():
+    """Log this worker's LLM metrics (breaker, throttling, retries) and publish its snapshot"""
+    logger.info(f"Metrics: {format_metrics(prefix='llm.')}")
+    path = os.path.join(get_metrics_dir(), f"{multiprocessing.current_process().name}.json")
+    try:
+        write_metrics_snapshot(path)
+    except OSError as e:
+        logger.warning(f"Could not write metrics snapshot: {e}")
+
+def worker_loop(poll_interval=None):
+    """Drain the job queue forever - entry point of each worker process"""
+    if poll_interval is None:
+        poll_interval = float(get_env_var('JOB_POLL_INTERVAL', 0.5))
+    # METRICS_LOG_SECONDS=0 turns the periodic metrics report off
+    metrics_interval = float(get_env_var('METRICS_LOG_SECONDS', 60))
+
+    # Append - several workers share the session log file
+    from agentic_utils import setup_logging, warm_up_knowledge_base, disable_extraction_batching
+    setup_logging(file_mode='a')
+    # One job at a time - nothing to batch with, the collect window would only add latency
+    if int(get_env_var('EXTRACTION_BATCH_SIZE', 1)) > 1:
+        logger.info("EXTRACTION_BATCH_SIZE ignored in queue workers - one job per process")
+    disable_extraction_batching()
+    # Pay for loading the model and index now, not inside the first customer's request
+    warm_up_knowledge_base()
+
+    next_report = time.monotonic() + metrics_interval
+    while True:
+        if metrics_interval > 0 and time.monotonic() >= next_report:
+            report_worker_metrics()
+            next_report = time.monotonic() + metrics_interval
+
+        try:
+            job = claim_next_job()
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Could not claim job: {e}")
+            job = None
+
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        process_job(job)
+
+def start_worker_pool(num_workers=None):
+    """Start background worker processes that run queued jobs through the agent graph"""
+    if num_workers is None:
+        num_workers = int(get_env_var('AGENT_WORKERS', 2))
+
+    requeued = requeue_stale_jobs()
+    if requeued:
+        logger.info(f"Requeued {requeued} stale job(s)")
+
+    # spawn, not fork - the Streamlit server process is multi-threaded
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for i in range(num_workers):
+        worker = context.Process(target=worker_loop, name=f"agent-worker-{i + 1}", daemon=True)
+        worker.start()
+        workers.append(worker)
+
+    logger.info(f"Started {num_workers} agent worker process(es)")
+    return workers
+
+if __name__ == "__main__":
+    # Run a standalone worker pool, e.g. on a separate machine sharing JOB_DB_PATH
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    pool = start_worker_pool()
+    for worker in pool:
+        worker.join()
@@ -0,0 +1,326 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+from chroma_db_utils import get_env_var, get_chroma_mode, KB_COLLECTION_NAME, build_document
+
+# Blue/green re-index of the knowledge base. A new versioned collection
+# (customer_service_kb_v<N>) is built next to the live one, verified, and then
+# made active by atomically replacing a small pointer file that
+# get_or_create_collection resolves. Queries keep hitting the old version until
+# the swap, and the previous version is kept for rollback. In CHROMA_MODE=http
+# the pointer is kept on the server (metadata of a small collection) so every
+# replica follows the same switch within KB_POINTER_TTL_SECS. Writers resolve
+# the pointer uncached, and after the switch reindex keeps copying records that
+# still land in the old version for KB_SWITCH_GRACE_SECS (at least the TTL).
+#
+#   python kb_index_utils.py status | reindex | rollback | gc
+
+POINTER_FILENAME = "active_collection.json"
+POINTER_COLLECTION = "kb_active_pointer"
+VERSION_PATTERN = re.compile(rf'^{re.escape(KB_COLLECTION_NAME)}(?:_v(\d+))?$')
+
+_pointer_cache = {"key": None, "state": None}
+_pointer_lock = threading.Lock()
+
+def get_pointer_path():
+    """Pointer file next to the Chroma data it refers to"""
+    return os.path.join(get_env_var('CHROMA_DB_PATH', './chroma_db'), POINTER_FILENAME)
+
+def _default_pointer():
+    # Never re-indexed - marked so gc_versions does not take it as the full picture
+    return {"active": KB_COLLECTION_NAME, "previous": [], "default": True}
+
+def read_pointer(fresh=False):
+    """Active collection and previous versions (newest first) - the base collection if never re-indexed
+
+    fresh=True skips the server pointer cache - for writers, which must not
+    keep adding to a version that was switched away from.
+    """
+    if get_chroma_mode() == "http":
+        return _read_server_pointer(fresh=fresh)
+    path = get_pointer_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return _default_pointer()
+
+    # Re-read only when the file was replaced - this runs before every query
+    key = (path, stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    with _pointer_lock:
+        if _pointer_cache["key"] != key:
+            with open(path, encoding="utf-8") as f:
+                _pointer_cache["state"] = json.load(f)
+            _pointer_cache["key"] = key
+        return dict(_pointer_cache["state"])
+
+def get_pointer_ttl():
+    return float(get_env_var('KB_POINTER_TTL_SECS', 5))
+
+def _read_server_pointer(fresh=False):
+    # Cached for a few seconds - a round trip before every query would double its latency
+    ttl = get_pointer_ttl()
+    with _pointer_lock:
+        if not fresh and _pointer_cache["key"] == "server" and time.monotonic() - _pointer_cache["read_at"] < ttl:
+            return dict(_pointer_cache["state"])
+
+    from chromadb.errors import NotFoundError
+    from chroma_db_utils import get_chroma_client
+    try:
+        metadata = get_chroma_client().get_collection(POINTER_COLLECTION).metadata or {}
+    except NotFoundError:
+        metadata = {}
+    # Any other error (server unreachable, timeout) propagates - caching a guessed
+    # base collection would send every query and write to a stale version
+    if "active" in metadata:
+        state = {"active": metadata["active"], "previous": json.loads(metadata.get("previous", "[]"))}
+    else:
+        state = _default_pointer()
+
+    with _pointer_lock:
+        _pointer_cache.update(key="server", state=state, read_at=time.monotonic())
+    return dict(state)
+
+def _write_server_pointer(active, previous):
+    from chroma_db_utils import get_chroma_client
+    # Collection metadata is replaced in one server-side write - the same all-or-nothing switch as the file
+    pointer = get_chroma_client().get_or_create_collection(POINTER_COLLECTION)
+    pointer.modify(metadata={"active": active, "previous": json.dumps(previous), "updated_at": datetime.now().isoformat()})
+    with _pointer_lock:
+        _pointer_cache.update(key=None, state=None)
+
+def write_pointer(active, previous):
+    """Atomically switch the active collection - readers see the old or the new file, never half of one"""
+    if get_chroma_mode() == "http":
+        _write_server_pointer(active, previous)
+        return
+    path = get_pointer_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"active": active, "previous": previous, "updated_at": datetime.now().isoformat()}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def get_active_collection_name(fresh=False):
+    """Name of the collection queries and writes should use - fresh=True for writes"""
+    return read_pointer(fresh=fresh)["active"]
+
+def version_number(name):
+    """0 for the base collection, N for <base>_vN, None for unrelated collections"""
+    match = VERSION_PATTERN.match(name)
+    if not match:
+        return None
+    return int(match.group(1) or 0)
+
+def list_versions(client):
+    """Knowledge base collection names, oldest version first"""
+    names = [collection.name if hasattr(collection, "name") else collection for collection in client.list_collections()]
+    return sorted((name for name in names if version_number(name) is not None), key=version_number)
+
+def _all_ids(collection, page_size):
+    ids = set()
+    offset = 0
+    while True:
+        page = collection.get(include=[], limit=page_size, offset=offset)
+        ids.update(page['ids'])
+        if len(page['ids']) < page_size:
+            return ids
+        offset += page_size
+
+def _copy_records(source, target, batch_size, only_ids=None):
+    """Re-embed records of source into target with the current template, returns the copied IDs"""
+    copied = set()
+    offset = 0
+    only_ids = sorted(only_ids) if only_ids is not None else None
+    while True:
+        if only_ids is not None:
+            batch_ids = only_ids[offset:offset + batch_size]
+            if not batch_ids:
+                return copied
+            page = source.get(ids=batch_ids, include=["documents", "metadatas"])
+        else:
+            page = source.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            if not page['ids']:
+                return copied
+
+        documents = []
+        for document, metadata in zip(page['documents'], page['metadatas']):
+            metadata = metadata or {}
+            if all(metadata.get(key) is not None for key in ("topic_name", "description", "solution")):
+                documents.append(build_document(metadata['topic_name'], metadata['description'], metadata['solution']))
+            else:
+                # Nothing to rebuild from - keep the stored text
+                documents.append(document)
+
+        target.upsert(ids=page['ids'], documents=documents, metadatas=page['metadatas'])
+        copied.update(page['ids'])
+        print(f"Re-indexed {len(copied)} records into {target.name}")
+        offset += batch_size
+
+def reindex(batch_size=None, keep=None):
+    """Build the next collection version from the active one, verify it and switch to it
+
+    Writes that land in the active collection while the new one is built are
+    copied over in a catch-up pass before the counts are verified, and those
+    that still reach it after the switch in a final one.
+    """
+    from chroma_db_utils import get_chroma_client, create_kb_collection
+
+    if batch_size is None:
+        batch_size = int(get_env_var('KB_REINDEX_BATCH_SIZE', 256))
+    client = get_chroma_client()
+    pointer = read_pointer(fresh=True)
+    active_name = pointer["active"]
+
+    # Read-only use - no embedding function needed, so a model change cannot conflict
+    source = client.get_collection(active_name)
+    versions = list_versions(client)
+    target_name = f"{KB_COLLECTION_NAME}_v{max((version_number(name) for name in versions), default=0) + 1}"
+    print(f"Building {target_name} from {active_name} ({source.count()} records)...")
+    target = create_kb_collection(client, target_name)
+
+    try:
+        copied = _copy_records(source, target, batch_size)
+
+        source_ids = _all_ids(source, batch_size)
+        missing = source_ids - copied
+        if missing:
+            print(f"Catching up on {len(missing)} records written during the re-index...")
+            copied |= _copy_records(source, target, batch_size, only_ids=missing)
+
+        target_ids = _all_ids(target, batch_size)
+        if target_ids != source_ids or target.count() != source.count():
+            raise RuntimeError(
+                f"Verification failed: {active_name} has {source.count()} records, {target_name} has {target.count()}"
+            )
+    except Exception:
+        client.delete_collection(target_name)
+        raise
+
+    write_pointer(target_name, [active_name] + [name for name in pointer["previous"] if name != active_name])
+    print(f"Switched active collection: {active_name} -> {target_name}")
+    _catch_up_after_switch(source, target, copied, batch_size)
+    gc_versions(keep=keep, client=client)
+    return target_name
+
+def _catch_up_after_switch(source, target, copied, batch_size):
+    """Copy records that still reach the old version after the switch
+
+    A writer may have resolved the pointer just before it changed, and in http
+    mode other replicas follow the switch only when their cached pointer
+    expires. Keeps copying until the grace period has passed and two passes
+    in a row found nothing new - a writer that never follows the pointer is
+    given up on after three grace periods.
+    """
+    grace = float(get_env_var('KB_SWITCH_GRACE_SECS', 1))
+    if get_chroma_mode() == "http":
+        # Replicas may act on the old pointer until their cached copy expires
+        grace = max(grace, get_pointer_ttl())
+    started = time.monotonic()
+    stable_passes = 0
+    while True:
+        missing = _all_ids(source, batch_size) - copied
+        if missing:
+            print(f"Copying {len(missing)} records written to {source.name} around the switch...")
+            copied |= _copy_records(source, target, batch_size, only_ids=missing)
+            stable_passes = 0
+        else:
+            stable_passes += 1
+        elapsed = time.monotonic() - started
+        if stable_passes >= 2 and elapsed >= grace:
+            return copied
+        if elapsed >= 3 * grace:
+            print(f"Warning: {source.name} is still being written to {elapsed:.0f}s after the switch - stopped copying")
+            return copied
+        time.sleep(min(0.5, grace / 4) if grace > 0 else 0)
+
+def rollback():
+    """Make the previous version active again"""
+    from chroma_db_utils import get_chroma_client
+
+    client = get_chroma_client()
+    pointer = read_pointer()
+    existing = set(list_versions(client))
+    previous = [name for name in pointer["previous"] if name in existing]
+    if not previous:
+        raise RuntimeError("No previous collection version to roll back to")
+
+    write_pointer(previous[0], previous[1:])
+    print(f"Rolled back active collection: {pointer['active']} -> {previous[0]}")
+    return previous[0]
+
+def gc_versions(keep=None, client=None):
+    """Delete versions that are neither active nor among the last keep previous ones"""
+    from chroma_db_utils import get_chroma_client
+
+    if keep is None:
+        keep = int(get_env_var('KB_KEEP_VERSIONS', 1))
+    client = client or get_chroma_client()
+    pointer = read_pointer()
+    if pointer.get("default"):
+        # No pointer was ever written - the versions on disk cannot be judged against it
+        print("No active collection pointer - skipping gc")
+        return []
+    previous = pointer["previous"][:keep]
+    retained = {pointer["active"], *previous}
+
+    deleted = []
+    for name in list_versions(client):
+        if name not in retained:
+            client.delete_collection(name)
+            deleted.append(name)
+            print(f"Deleted old collection version {name}")
+
+    if previous != pointer["previous"]:
+        write_pointer(pointer["active"], previous)
+    return deleted
+
+def status():
+    """Active collection and all versions with their record counts"""
+    from chroma_db_utils import get_chroma_client
+
+    client = get_chroma_client()
+    pointer = read_pointer()
+    print(f"Active: {pointer['active']}")
+    for name in list_versions(client):
+        collection = client.get_collection(name)
+        metadata = collection.metadata or {}
+        hnsw = (collection.configuration or {}).get("hnsw") or {}
+        role = "active" if name == pointer["active"] else ("rollback" if name in pointer["previous"] else "")
+        print(
+            f"  {name:<28} {collection.count():7d} records  "
+            f"{metadata.get('embedding_backend', 'default')}/{metadata.get('embedding_model', 'all-MiniLM-L6-v2')}  "
+            f"{hnsw.get('space', '?')} M={hnsw.get('max_neighbors', '?')} "
+            f"ef_construction={hnsw.get('ef_construction', '?')} ef_search={hnsw.get('ef_search', '?')}  {role}"
+        )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Blue/green re-index of the knowledge base collection")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="Show the active collection and all versions")
+    reindex_parser = subparsers.add_parser("reindex", help="Build a new version and switch to it")
+    reindex_parser.add_argument("--batch-size", type=int)
+    reindex_parser.add_argument("--keep", type=int, help="Previous versions to keep for rollback (KB_KEEP_VERSIONS)")
+    subparsers.add_parser("rollback", help="Switch back to the previous version")
+    gc_parser = subparsers.add_parser("gc", help="Delete versions no longer needed for rollback")
+    gc_parser.add_argument("--keep", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        status()
+    elif args.command == "reindex":
+        reindex(batch_size=args.batch_size, keep=args.keep)
+    elif args.command == "rollback":
+        rollback()
+    else:
+        gc_versions(keep=args.keep)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
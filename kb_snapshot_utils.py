@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from chroma_db_utils import get_env_var
+
+# Knowledge base snapshots: ids, documents, metadata and the stored embeddings
+# of the active collection in one columnar file. Importing a snapshot
+# bulk-loads the vectors as they are - the embedding model is never called -
+# so a new replica comes up with every human_approved case in seconds.
+#
+#   .parquet           compressed, for shipping between hosts
+#   .arrow / .feather  uncompressed Arrow IPC, memory-mapped on import (zero copy)
+#
+#   python kb_snapshot_utils.py export [path]
+#   python kb_snapshot_utils.py import <path> [--no-activate] [--force]
+
+SNAPSHOT_FORMAT_VERSION = "1"
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+
+def default_snapshot_path():
+    """data/snapshots/kb_<timestamp>.parquet (SNAPSHOT_DIR overrides the directory)"""
+    snapshot_dir = get_env_var('SNAPSHOT_DIR', 'data/snapshots')
+    return os.path.join(snapshot_dir, f"kb_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet")
+
+def _is_arrow_path(path):
+    return path.lower().endswith(ARROW_EXTENSIONS)
+
+def export_snapshot(path=None, page_size=1000):
+    """Write the active collection with its embeddings to path, returns (path, record count)"""
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from chroma_db_utils import get_chroma_client, DOCUMENT_TEMPLATE
+    from kb_index_utils import get_active_collection_name
+
+    path = path or default_snapshot_path()
+    collection_name = get_active_collection_name()
+    collection = get_chroma_client().get_collection(collection_name)
+
+    ids, documents, metadatas, embeddings = [], [], [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        ids.extend(page['ids'])
+        documents.extend(page['documents'])
+        # Metadata keys differ between CSV imports and approved cases - keep them as JSON
+        metadatas.extend(json.dumps(metadata or {}) for metadata in page['metadatas'])
+        embeddings.append(np.asarray(page['embeddings'], dtype=np.float32))
+        offset += page_size
+
+    dimension = embeddings[0].shape[1] if embeddings else 0
+    flat = np.concatenate(embeddings).reshape(-1) if embeddings else np.zeros(0, dtype=np.float32)
+    collection_metadata = collection.metadata or {}
+    table = pa.table(
+        {
+            "id": pa.array(ids, type=pa.string()),
+            "document": pa.array(documents, type=pa.string()),
+            "metadata": pa.array(metadatas, type=pa.string()),
+            "embedding": pa.FixedSizeListArray.from_arrays(pa.array(flat, type=pa.float32()), dimension)
+        },
+        metadata={
+            "snapshot_format": SNAPSHOT_FORMAT_VERSION,
+            "source_collection": collection_name,
+            "embedding_backend": str(collection_metadata.get("embedding_backend", "onnx")),
+            "embedding_model": str(collection_metadata.get("embedding_model", "all-MiniLM-L6-v2")),
+            "document_template": str(collection_metadata.get("document_template", DOCUMENT_TEMPLATE)),
+            "dimension": str(dimension),
+            "exported_at": datetime.now().isoformat()
+        }
+    )
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if _is_arrow_path(path):
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+    print(f"Exported {len(ids)} records from {collection_name} to {path}")
+    return path, len(ids)
+
+def read_snapshot(path):
+    """Load a snapshot table - Arrow IPC files are memory-mapped rather than read"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if _is_arrow_path(path):
+        return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return pq.read_table(path)
+
+def snapshot_embeddings(table):
+    """Embeddings of a snapshot as an (n, dimension) float32 array - a view when the data is contiguous"""
+    import numpy as np
+
+    column = table.column("embedding").combine_chunks()
+    dimension = column.type.list_size
+    values = column.flatten().to_numpy(zero_copy_only=False)
+    return np.asarray(values, dtype=np.float32).reshape(-1, dimension)
+
+def import_snapshot(path, activate=True, force=False, batch_size=None):
+    """Bulk-load a snapshot into a new collection version, switching to it when activate is set
+
+    The stored vectors are inserted as they are. Unless force is set, a snapshot
+    made with a different embedding model than the one configured is refused -
+    queries would be embedded with the wrong model.
+    """
+    from chroma_db_utils import get_chroma_client, create_kb_collection, KB_COLLECTION_NAME
+    from embedding_utils import get_embedding_engine
+    from kb_index_utils import list_versions, version_number, read_pointer, write_pointer, gc_versions
+
+    started = time.perf_counter()
+    table = read_snapshot(path)
+    schema_metadata = {key.decode(): value.decode() for key, value in (table.schema.metadata or {}).items()}
+
+    engine = get_embedding_engine()
+    snapshot_model = schema_metadata.get("embedding_model", "all-MiniLM-L6-v2")
+    if snapshot_model != engine.model_name and not force:
+        raise RuntimeError(
+            f"Snapshot was embedded with {snapshot_model} but EMBEDDING_MODEL is {engine.model_name} - "
+            "re-run with force to import anyway"
+        )
+
+    client = get_chroma_client()
+    if batch_size is None:
+        batch_size = int(get_env_var('SNAPSHOT_IMPORT_BATCH_SIZE', 1000))
+    batch_size = min(batch_size, client.get_max_batch_size())
+
+    versions = list_versions(client)
+    target_name = f"{KB_COLLECTION_NAME}_v{max((version_number(name) for name in versions), default=0) + 1}"
+    target = create_kb_collection(client, target_name)
+
+    ids = table.column("id").to_pylist()
+    documents = table.column("document").to_pylist()
+    metadatas = [json.loads(metadata) for metadata in table.column("metadata").to_pylist()]
+    embeddings = snapshot_embeddings(table)
+
+    try:
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            # Embeddings are given, so Chroma does not call the embedding function
+            target.add(
+                ids=ids[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+                embeddings=embeddings[start:end]
+            )
+        if target.count() != len(ids):
+            raise RuntimeError(f"Verification failed: snapshot has {len(ids)} records, {target_name} has {target.count()}")
+    except Exception:
+        client.delete_collection(target_name)
+        raise
+
+    print(f"Imported {len(ids)} records into {target_name} in {time.perf_counter() - started:.2f}s")
+    if activate:
+        pointer = read_pointer()
+        write_pointer(target_name, [pointer["active"]] + [name for name in pointer["previous"] if name != pointer["active"]])
+        print(f"Switched active collection: {pointer['active']} -> {target_name}")
+        gc_versions(client=client)
+    return target_name
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export and import knowledge base snapshots with embeddings")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Write the active collection to a snapshot")
+    export_parser.add_argument("path", nargs="?", help="Target .parquet or .arrow file (default: data/snapshots/kb_<timestamp>.parquet)")
+    import_parser = subparsers.add_parser("import", help="Load a snapshot into a new collection version")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--no-activate", action="store_true", help="Load without switching the active collection")
+    import_parser.add_argument("--force", action="store_true", help="Import even if the embedding model differs")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export_snapshot(args.path)
+    else:
+        import_snapshot(args.path, activate=not args.no_activate, force=args.force)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+import os
+import sys
+import time
+import uuid
+import logging
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from chroma_db_utils import get_env_var
+from metrics_utils import increment, observe
+
+logger = logging.getLogger(__name__)
+
+# Live call mode: audio arrives in chunks while the call is still going. Each
+# chunk is transcribed as it lands, and every LIVE_REFRESH_SECONDS the growing
+# transcript is re-extracted and the knowledge base re-queried, so the
+# suggestions are current when the call ends and only the response is left:
+#   LIVE_REFRESH_SECONDS   minimum time between rolling refreshes
+#   LIVE_MIN_NEW_CHARS     transcript growth needed before a refresh
+#   LIVE_PROMPT_CHARS      transcript tail passed to Whisper for continuity
+#
+#   python live_call_utils.py sample_audio/audio1.mp3 --script transcript.txt --speed 10
+
+SAMPLE_RATE = 16000
+
+class WhisperChunkTranscriber:
+    """Transcribe one chunk of 16 kHz mono samples with the shared Groq client"""
+
+    def __init__(self, prompt_chars=None):
+        self.prompt_chars = int(prompt_chars if prompt_chars is not None else get_env_var('LIVE_PROMPT_CHARS', 200))
+
+    def __call__(self, samples, previous_text="", deadline=None):
+        from audio_utils import encode_audio
+        from agentic_utils import get_groq_client
+
+        fd, chunk_path = tempfile.mkstemp(prefix="live_chunk_", suffix=".flac")
+        os.close(fd)
+        try:
+            encode_audio(samples, chunk_path, sample_rate=SAMPLE_RATE)
+            with open(chunk_path, "rb") as file:
+                kwargs = {}
+                # The end of the transcript so far keeps names and spelling consistent across chunks
+                if previous_text and self.prompt_chars:
+                    kwargs["prompt"] = previous_text[-self.prompt_chars:]
+                transcription = get_groq_client().audio.transcriptions.create(
+                    file=(chunk_path, file.read()),
+                    deadline=deadline,
+                    model="whisper-large-v3",
+                    response_format="verbose_json",
+                    **kwargs
+                )
+            return transcription.text.strip()
+        finally:
+            os.remove(chunk_path)
+
+class ScriptedTranscriber:
+    """Stub transcriber that reveals a known transcript in step with the audio fed so far"""
+
+    def __init__(self, text, total_seconds):
+        self.words = text.split()
+        self.total_seconds = max(total_seconds, 1e-6)
+        self.seconds_seen = 0.0
+        self.words_emitted = 0
+
+    def __call__(self, samples, previous_text="", deadline=None):
+        self.seconds_seen += len(samples) / SAMPLE_RATE
+        target = min(len(self.words), round(len(self.words) * self.seconds_seen / self.total_seconds))
+        chunk_words = self.words[self.words_emitted:target]
+        self.words_emitted = target
+        return " ".join(chunk_words)
+
+class LiveCallSession:
+    """Incremental pipeline for one call - add_chunk() while it runs, end_call() when it ends
+
+    Chunks are transcribed in arrival order on one worker; rolling refreshes run
+    on another, so feeding audio never waits for the LLM. A refresh requested
+    while one is running is coalesced into a single follow-up.
+    """
+
+    def __init__(self, request_id=None, transcriber=None, refresh_seconds=None, min_new_chars=None,
+                 deadline_seconds=None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.transcriber = transcriber or WhisperChunkTranscriber()
+        self.refresh_seconds = float(refresh_seconds if refresh_seconds is not None else get_env_var('LIVE_REFRESH_SECONDS', 10))
+        self.min_new_chars = int(min_new_chars if min_new_chars is not None else get_env_var('LIVE_MIN_NEW_CHARS', 80))
+        if deadline_seconds is None:
+            deadline_seconds = float(get_env_var('REQUEST_DEADLINE_SECONDS', 120))
+        self.deadline_seconds = deadline_seconds
+
+        self.started_at = time.time()
+        self.audio_seconds = 0.0
+        self.transcribe_ms = 0.0
+        self.refreshes = 0
+
+        self._lock = threading.Lock()
+        self._parts = []
+        self._extracted = None  # (transcript, extracted_info, retrieved_context) of the latest refresh
+        self._last_refresh_at = 0.0
+        self._last_refresh_chars = 0
+        self._refresh_future = None
+        self._refresh_again = False
+        self._transcribe_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="live-transcribe")
+        self._refresh_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="live-refresh")
+        self._ended = False
+        # The call's first refresh should not pay for loading the model and index
+        from agentic_utils import warm_up_knowledge_base
+        self._refresh_pool.submit(warm_up_knowledge_base)
+
+    @property
+    def transcript(self):
+        with self._lock:
+            return " ".join(part for part in self._parts if part)
+
+    def suggestions(self):
+        """Extracted info and closest knowledge base cases from the latest refresh"""
+        with self._lock:
+            if self._extracted is None:
+                return None
+            _, extracted_info, retrieved_context = self._extracted
+            return {"extracted_info": extracted_info, "retrieved_context": retrieved_context}
+
+    def add_chunk(self, samples):
+        """Queue a chunk of 16 kHz mono float32 samples for transcription"""
+        if self._ended:
+            raise RuntimeError("Call already ended")
+        self.audio_seconds += len(samples) / SAMPLE_RATE
+        return self._transcribe_pool.submit(self._transcribe_chunk, samples)
+
+    def _transcribe_chunk(self, samples):
+        started = time.perf_counter()
+        try:
+            text = self.transcriber(samples, previous_text=self.transcript, deadline=self._deadline())
+        except Exception as e:
+            # One lost chunk should not end the call - the rest is still transcribed
+            logger.warning(f"Live call {self.request_id}: chunk transcription failed: {e}")
+            increment("live.chunk_errors")
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.transcribe_ms += elapsed_ms
+        observe("live.chunk_transcribe_ms", elapsed_ms)
+        increment("live.chunks")
+
+        with self._lock:
+            self._parts.append(text)
+        self._maybe_refresh()
+
+    def _deadline(self):
+        return time.time() + self.deadline_seconds
+
+    def _maybe_refresh(self):
+        transcript = self.transcript
+        with self._lock:
+            due = time.monotonic() - self._last_refresh_at >= self.refresh_seconds
+            grown = len(transcript) - self._last_refresh_chars >= self.min_new_chars
+            if not (due and grown):
+                return
+            if self._refresh_future is not None and not self._refresh_future.done():
+                self._refresh_again = True
+                return
+            self._last_refresh_at = time.monotonic()
+            self._refresh_future = self._refresh_pool.submit(self._refresh)
+
+    def _refresh(self):
+        """Re-extract the transcript so far and re-query the knowledge base"""
+        from agentic_utils import info_extractor_agent, query_knowledge_base
+
+        transcript = self.transcript
+        started = time.perf_counter()
+        state = {"transcript": transcript, "deadline": self._deadline(), "agent_logs": []}
+        state = info_extractor_agent(state)
+        if state["agent_logs"][-1]["status"] != "success":
+            # Fallback data would only replace a better earlier extraction
+            return
+        try:
+            retrieved_context = query_knowledge_base(state["extracted_info"])
+        except Exception as e:
+            logger.warning(f"Live call {self.request_id}: knowledge base query failed: {e}")
+            retrieved_context = []
+
+        with self._lock:
+            self._extracted = (transcript, state["extracted_info"], retrieved_context)
+            self._last_refresh_chars = len(transcript)
+            self.refreshes += 1
+            again, self._refresh_again = self._refresh_again, False
+        observe("live.refresh_ms", (time.perf_counter() - started) * 1000)
+        increment("live.refreshes")
+        logger.info(f"Live call {self.request_id}: refresh {self.refreshes} at {len(transcript)} chars")
+
+        if again:
+            with self._lock:
+                self._last_refresh_at = time.monotonic()
+                self._refresh_future = self._refresh_pool.submit(self._refresh)
+
+    def end_call(self):
+        """Finish transcription and return the finalized result, as run_agent_flow does
+
+        The extraction is reused when the last refresh saw all but less than
+        LIVE_MIN_NEW_CHARS of the transcript, and the cases that refresh fetched
+        are reused whenever the final extraction asks the same query - then only
+        the response is left.
+        """
+        from agentic_utils import (
+            AgentState, log_agent_step, info_extractor_agent, context_retrieval_agent, _finalize_result,
+            knowledge_base_query_text
+        )
+
+        self._ended = True
+        ended_at = time.perf_counter()
+        self._transcribe_pool.shutdown(wait=True)
+        # Let a running refresh finish, but start no new one
+        with self._lock:
+            self._refresh_again = False
+            pending = self._refresh_future
+        if pending is not None:
+            pending.result()
+        self._refresh_pool.shutdown(wait=True)
+
+        transcript = self.transcript
+        state = AgentState(
+            audio_file="",
+            processed_audio_file="",
+            transcript=transcript,
+            extracted_info={},
+            retrieved_context=[],
+            generated_response="",
+            final_output={},
+            agent_logs=[],
+            deadline=self._deadline(),
+            stage_timings={"transcribe": round(self.transcribe_ms, 1)}
+        )
+        log_agent_step("Transcription Agent", "success", None, state, field="transcript")
+
+        started = time.perf_counter()
+        # A tail shorter than a refresh step rarely changes topic or sentiment
+        seen = self._extracted[0] if self._extracted is not None else None
+        if seen is not None and transcript.startswith(seen) and len(transcript) - len(seen) < self.min_new_chars:
+            increment("live.final_extraction_reused")
+            state["extracted_info"] = self._extracted[1]
+            log_agent_step("Info Extractor Agent", "success", None, state, field="extracted_info")
+        else:
+            state = info_extractor_agent(state)
+        state["stage_timings"]["extract"] = round((time.perf_counter() - started) * 1000, 1)
+
+        started = time.perf_counter()
+        # Same query as the last refresh - its cases are already here, only the response is left
+        prefetched = None
+        if (self._extracted is not None and self._extracted[2]
+                and knowledge_base_query_text(state["extracted_info"]) == knowledge_base_query_text(self._extracted[1])):
+            increment("live.final_retrieval_reused")
+            prefetched = self._extracted[2]
+        state = context_retrieval_agent(state, retrieved_context=prefetched)
+        state["stage_timings"]["retrieve"] = round((time.perf_counter() - started) * 1000, 1)
+
+        after_call_ms = (time.perf_counter() - ended_at) * 1000
+        state["stage_timings"]["after_call"] = round(after_call_ms, 1)
+        observe("live.after_call_ms", after_call_ms)
+        return _finalize_result(state, self.request_id)
+
+def feed_file(session, path, chunk_seconds=5.0, speed=1.0):
+    """Feed an audio file to a session in chunk_seconds pieces, paced like a live call
+
+    speed > 1 plays faster than real time, 0 feeds without pausing.
+    """
+    from audio_utils import decode_audio
+
+    samples = decode_audio(path, sample_rate=SAMPLE_RATE)
+    chunk_length = int(chunk_seconds * SAMPLE_RATE)
+    started = time.monotonic()
+    for offset in range(0, len(samples), chunk_length):
+        chunk = samples[offset:offset + chunk_length]
+        if speed:
+            # A chunk is available only once its audio has been spoken
+            ready_at = started + (offset + len(chunk)) / SAMPLE_RATE / speed
+            time.sleep(max(0.0, ready_at - time.monotonic()))
+        session.add_chunk(chunk)
+    return len(samples) / SAMPLE_RATE
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run an audio file through live call mode in timed chunks")
+    parser.add_argument("audio_file")
+    parser.add_argument("--chunk-seconds", type=float, default=5.0)
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed, 0 = no pacing")
+    parser.add_argument("--refresh-seconds", type=float)
+    parser.add_argument("--script", help="Transcript file for a stub transcriber instead of Whisper")
+    args = parser.parse_args(argv)
+
+    from agentic_utils import setup_logging
+    setup_logging()
+
+    transcriber = None
+    if args.script:
+        from audio_utils import decode_audio
+        with open(args.script, encoding="utf-8") as f:
+            text = f.read()
+        transcriber = ScriptedTranscriber(text, len(decode_audio(args.audio_file, sample_rate=SAMPLE_RATE)) / SAMPLE_RATE)
+
+    session = LiveCallSession(transcriber=transcriber, refresh_seconds=args.refresh_seconds)
+    audio_seconds = feed_file(session, args.audio_file, chunk_seconds=args.chunk_seconds, speed=args.speed)
+    result = session.end_call()
+
+    case = result["final_output"]
+    print(f"Audio: {audio_seconds:.1f}s in {args.chunk_seconds:g}s chunks, {session.refreshes} rolling refreshes")
+    print(f"Ready {result['stage_timings']['after_call']:.0f} ms after the call ended ({result['stage_timings']})")
+    print(f"Topic: {case.extracted_info.topic_name} - {case.extracted_info.description}")
+    print(f"Response: {case.generated_response}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
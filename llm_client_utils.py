@@ -0,0 +1,360 @@
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from chroma_db_utils import get_env_var
+from metrics_utils import increment, set_gauge, observe, percentile, count_observations
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying - everything else (bad request, auth, ...) fails fast
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+
+# Completion tokens assumed when a request does not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 256
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker is open and calls are short-circuited"""
+
+class DeadlineExceededError(Exception):
+    """Raised when a request's end-to-end deadline leaves no time for another call"""
+
+# Threads that run hedged attempts - created on the first hedged call
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+
+def get_hedge_pool():
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(
+                max_workers=int(get_env_var('GROQ_HEDGE_THREADS', 16)),
+                thread_name_prefix="groq-hedge"
+            )
+    return _hedge_pool
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute
+
+    A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def acquire(self, amount=1, max_wait=None):
+        """Block until amount tokens are available, return the seconds waited
+
+        Returns None without taking anything when that would mean waiting
+        longer than max_wait seconds.
+        """
+        if self.rate_per_second <= 0:
+            return 0.0
+
+        # Never ask for more than the bucket can ever hold
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                wait_seconds = (amount - self.tokens) / self.rate_per_second
+            if max_wait is not None and waited + wait_seconds > max_wait:
+                return None
+            time.sleep(wait_seconds)
+            waited += wait_seconds
+
+    def available(self):
+        """Tokens currently in the bucket"""
+        with self.lock:
+            self._refill()
+            return self.tokens
+
+class CircuitBreaker:
+    """Classic closed -> open -> half_open breaker
+
+    After failure_threshold consecutive failures the breaker opens and rejects
+    calls for reset_seconds, then lets a single trial call through.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_seconds=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+        self._publish()
+
+    def _publish(self):
+        set_gauge(f"llm.breaker.{self.name}.state", {"closed": 0, "half_open": 1, "open": 2}[self.state])
+        set_gauge(f"llm.breaker.{self.name}.failures", self.failures)
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go through right now"""
+        with self.lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    increment(f"llm.breaker.{self.name}.rejected")
+                    raise CircuitOpenError(f"Circuit '{self.name}' is open - Groq calls are paused")
+                self.state = "half_open"
+                self._publish()
+            elif self.state == "half_open":
+                # Only one trial call at a time while half open
+                increment(f"llm.breaker.{self.name}.rejected")
+                raise CircuitOpenError(f"Circuit '{self.name}' is half open - trial call in progress")
+
+    def release(self):
+        """Give back a half-open trial that ended without an outcome (e.g. a deadline while throttled)"""
+        with self.lock:
+            if self.state == "half_open":
+                # Still past the cooldown - the next call may try again right away
+                self.state = "open"
+                self._publish()
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+            self._publish()
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning(f"Circuit '{self.name}' opened after {self.failures} failure(s)")
+                    increment(f"llm.breaker.{self.name}.opened")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self._publish()
+
+def is_retryable(error):
+    """Timeouts, connection errors, 429s and 5xx responses are worth retrying"""
+    import groq
+
+    if isinstance(error, (groq.APITimeoutError, groq.APIConnectionError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+def retry_after_seconds(error):
+    """Server-provided Retry-After delay, if the error carries one"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def estimate_request_tokens(kwargs):
+    """Rough token cost of a chat request for the tokens-per-minute bucket"""
+    prompt_chars = sum(len(str(message.get("content", ""))) for message in kwargs.get("messages", []))
+    return prompt_chars // 4 + kwargs.get("max_tokens", DEFAULT_COMPLETION_TOKENS)
+
+class ResilientGroqClient:
+    """Groq client wrapper with rate limiting, jittered retries, timeouts and a circuit breaker
+
+    Exposes the same chat.completions.create / audio.transcriptions.create
+    surface as groq.Groq so agents can use it as a drop-in replacement. Both
+    accept an extra deadline= (epoch seconds) that bounds throttling, retries
+    and the per-call timeout. Chat calls can be hedged: when an attempt runs
+    past the hedge_percentile of recent latencies a duplicate is sent and the
+    first answer wins.
+    """
+
+    def __init__(self, client, requests_per_minute=None, tokens_per_minute=None, max_retries=None,
+                 backoff_base=None, backoff_max=None, timeout=None, breaker_threshold=None,
+                 breaker_reset_seconds=None, hedge_percentile=None, hedge_min_samples=None):
+        self.client = client
+        self.requests_per_minute = int(requests_per_minute if requests_per_minute is not None else get_env_var('GROQ_RPM', 30))
+        self.tokens_per_minute = int(tokens_per_minute if tokens_per_minute is not None else get_env_var('GROQ_TPM', 6000))
+        self.max_retries = int(max_retries if max_retries is not None else get_env_var('GROQ_MAX_RETRIES', 3))
+        self.backoff_base = float(backoff_base if backoff_base is not None else get_env_var('GROQ_BACKOFF_BASE', 0.5))
+        self.backoff_max = float(backoff_max if backoff_max is not None else get_env_var('GROQ_BACKOFF_MAX', 8.0))
+        self.timeout = float(timeout if timeout is not None else get_env_var('GROQ_TIMEOUT_SECONDS', 30))
+        # 0 disables hedging
+        self.hedge_percentile = float(hedge_percentile if hedge_percentile is not None else get_env_var('GROQ_HEDGE_PERCENTILE', 0))
+        self.hedge_min_samples = int(hedge_min_samples if hedge_min_samples is not None else get_env_var('GROQ_HEDGE_MIN_SAMPLES', 20))
+        self.breaker = CircuitBreaker(
+            "groq",
+            failure_threshold=int(breaker_threshold if breaker_threshold is not None else get_env_var('GROQ_BREAKER_THRESHOLD', 5)),
+            reset_seconds=float(breaker_reset_seconds if breaker_reset_seconds is not None else get_env_var('GROQ_BREAKER_RESET_SECONDS', 30))
+        )
+
+        # Groq limits are per model, so each model gets its own buckets
+        self.buckets = {}
+        self.buckets_lock = threading.Lock()
+
+        self.chat = _Namespace(completions=_Endpoint(self, "chat", client.chat.completions.create))
+        self.audio = _Namespace(transcriptions=_Endpoint(self, "transcription", client.audio.transcriptions.create))
+
+    def _buckets_for(self, model):
+        with self.buckets_lock:
+            if model not in self.buckets:
+                self.buckets[model] = (
+                    TokenBucket(self.requests_per_minute),
+                    TokenBucket(self.tokens_per_minute)
+                )
+            return self.buckets[model]
+
+    def _backoff(self, attempt, error):
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        server_delay = retry_after_seconds(error)
+        if server_delay is not None:
+            delay = max(delay, min(server_delay, self.backoff_max))
+        return delay
+
+    def _hedge_delay(self, kind):
+        """Seconds to wait before hedging, None when hedging is off or there is no latency history yet"""
+        if kind != "chat" or self.hedge_percentile <= 0:
+            return None
+        if count_observations(f"llm.{kind}.latency_ms") < self.hedge_min_samples:
+            return None
+        return percentile(f"llm.{kind}.latency_ms", self.hedge_percentile) / 1000
+
+    def _timed_create(self, kind, create, kwargs):
+        """One raw API call, recording its latency when it succeeds"""
+        increment(f"llm.{kind}.requests")
+        started = time.perf_counter()
+        response = create(**kwargs)
+        observe(f"llm.{kind}.latency_ms", (time.perf_counter() - started) * 1000)
+        return response
+
+    def _attempt(self, kind, create, kwargs, request_bucket):
+        """Run one attempt, hedged with a duplicate request if it is slower than usual"""
+        hedge_delay = self._hedge_delay(kind)
+        if hedge_delay is None:
+            return self._timed_create(kind, create, kwargs)
+
+        pool = get_hedge_pool()
+        primary = pool.submit(self._timed_create, kind, create, kwargs)
+        done, _ = wait([primary], timeout=hedge_delay)
+        # The duplicate must fit in the rate limit without waiting
+        if done or request_bucket.acquire(max_wait=0) is None:
+            return primary.result()
+
+        increment(f"llm.{kind}.hedged")
+        hedge = pool.submit(self._timed_create, kind, create, kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        increment(f"llm.{kind}.hedge_wins")
+                    # The slower request keeps running in its thread and is discarded
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, kind, create, **kwargs):
+        """Run one API call through the limiter, breaker, hedging and retry policy"""
+        model = kwargs.get("model", "default")
+        deadline = kwargs.pop("deadline", None)
+        request_bucket, token_bucket = self._buckets_for(model)
+        started = time.perf_counter()
+
+        attempt = 0
+        while True:
+            remaining = deadline - time.time() if deadline else None
+            if remaining is not None and remaining <= 0:
+                increment(f"llm.{kind}.deadline_exceeded")
+                raise DeadlineExceededError(f"Deadline exceeded before Groq {kind} call")
+            kwargs["timeout"] = min(self.timeout, remaining) if remaining is not None else self.timeout
+
+            self.breaker.allow()
+            # Set once the attempt's outcome is recorded - a half-open trial that ends
+            # any other way (deadline while throttled, ...) is released, not left stuck
+            recorded = False
+            try:
+                waited = request_bucket.acquire(max_wait=remaining)
+                if waited is not None and kind == "chat":
+                    token_wait = token_bucket.acquire(estimate_request_tokens(kwargs), max_wait=remaining)
+                    waited = waited + token_wait if token_wait is not None else None
+                if waited is None:
+                    increment(f"llm.{kind}.deadline_exceeded")
+                    raise DeadlineExceededError(f"Rate limit wait for Groq {kind} call would pass the deadline")
+                if waited:
+                    observe("llm.throttle_wait_ms", waited * 1000)
+                    increment("llm.throttled")
+
+                try:
+                    response = self._attempt(kind, create, kwargs, request_bucket)
+                except Exception as e:
+                    increment(f"llm.{kind}.errors")
+                    if not is_retryable(e):
+                        # Client errors (bad request, auth) mean Groq itself answered fine
+                        self.breaker.record_success()
+                        recorded = True
+                        raise
+
+                    self.breaker.record_failure()
+                    recorded = True
+                    delay = self._backoff(attempt, e)
+                    if attempt >= self.max_retries or (deadline and time.time() + delay >= deadline):
+                        raise
+
+                    attempt += 1
+                    increment(f"llm.{kind}.retries")
+                    logger.warning(f"Groq {kind} call failed ({e}) - retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                    time.sleep(delay)
+                    continue
+
+                self.breaker.record_success()
+                recorded = True
+            finally:
+                if not recorded:
+                    self.breaker.release()
+
+            # End-to-end latency including throttling, retries and hedging
+            observe(f"llm.{kind}.call_latency_ms", (time.perf_counter() - started) * 1000)
+
+            usage = getattr(response, "usage", None)
+            if usage is not None and getattr(usage, "total_tokens", None):
+                increment(f"llm.{kind}.tokens", usage.total_tokens)
+            set_gauge(f"llm.bucket.{model}.requests_available", request_bucket.available())
+            return response
+
+class _Namespace:
+    """Attribute holder mirroring the groq client's nested namespaces"""
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+class _Endpoint:
+    """A single create() endpoint routed through the resilient client"""
+
+    def __init__(self, owner, kind, create):
+        self.owner = owner
+        self.kind = kind
+        self._create = create
+
+    def create(self, **kwargs):
+        return self.owner.call(self.kind, self._create, **kwargs)
+
+def create_groq_client(api_key):
+    """Build the shared resilient Groq client from configuration
+
+    GROQ_BASE_URL points the client at another endpoint, e.g. fake_groq_server.py.
+    The SDK's own retries are disabled so only one retry policy applies.
+    """
+    from groq import Groq
+
+    client = Groq(api_key=api_key, base_url=get_env_var('GROQ_BASE_URL') or None, max_retries=0)
+    return ResilientGroqClient(client)
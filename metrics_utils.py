@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import threading
+from collections import defaultdict, deque
+
+# In-process metrics registry shared by the agents and the LLM client wrapper.
+# Counters only go up, gauges hold the latest value and observations keep a
+# bounded window of recent samples for percentiles. Queue workers log a summary
+# and write a JSON snapshot periodically (see job_queue_utils.worker_loop) that
+# the Support Engineer page reads - the registry itself is per process.
+
+OBSERVATION_WINDOW = 1000
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_gauges = {}
+_observations = defaultdict(lambda: deque(maxlen=OBSERVATION_WINDOW))
+
+def increment(name, value=1):
+    """Add value to a counter"""
+    with _lock:
+        _counters[name] += value
+
+def set_gauge(name, value):
+    """Set a gauge to its latest value"""
+    with _lock:
+        _gauges[name] = value
+
+def observe(name, value):
+    """Record one sample (e.g. a latency in ms) for percentile reporting"""
+    with _lock:
+        _observations[name].append(value)
+
+def _percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    index = int(round(pct / 100 * (len(sorted_samples) - 1)))
+    return sorted_samples[index]
+
+def percentile(name, pct):
+    """Percentile of the recent samples of an observation, None if there are none"""
+    with _lock:
+        samples = sorted(_observations[name]) if name in _observations else []
+    if not samples:
+        return None
+    return _percentile(samples, pct)
+
+def count_observations(name):
+    """Number of recent samples held for an observation"""
+    with _lock:
+        return len(_observations[name]) if name in _observations else 0
+
+def get_counter(name):
+    """Current value of a counter"""
+    with _lock:
+        return _counters.get(name, 0)
+
+def get_metrics():
+    """Snapshot of all counters, gauges and observation summaries"""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        observations = {name: sorted(samples) for name, samples in _observations.items()}
+
+    summaries = {}
+    for name, samples in observations.items():
+        if not samples:
+            continue
+        summaries[name] = {
+            "count": len(samples),
+            "p50": _percentile(samples, 50),
+            "p95": _percentile(samples, 95),
+            "p99": _percentile(samples, 99),
+            "max": samples[-1]
+        }
+    return {"counters": counters, "gauges": gauges, "observations": summaries}
+
+def format_metrics(metrics=None, prefix=""):
+    """One log line with the metrics whose name starts with prefix"""
+    metrics = metrics or get_metrics()
+    values = {**metrics["counters"], **metrics["gauges"]}
+    parts = [f"{name}={value:g}" for name, value in sorted(values.items()) if name.startswith(prefix)]
+    parts += [
+        f"{name} p50={summary['p50']:.0f} p95={summary['p95']:.0f} n={summary['count']}"
+        for name, summary in sorted(metrics["observations"].items()) if name.startswith(prefix)
+    ]
+    return ", ".join(parts) or "no metrics recorded"
+
+def write_metrics_snapshot(path):
+    """Write get_metrics() as JSON for other processes - replaced atomically"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    snapshot = {"pid": os.getpid(), "written_at": time.time(), **get_metrics()}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+def read_metrics_snapshots(directory):
+    """{process name: snapshot} of the snapshots written to directory"""
+    snapshots = {}
+    if not os.path.isdir(directory):
+        return snapshots
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, filename), encoding="utf-8") as f:
+                snapshots[filename[:-len(".json")]] = json.load(f)
+        except (OSError, ValueError):
+            # Being replaced right now - shown on the next read
+            continue
+    return snapshots
+
+def reset_metrics():
+    """Clear every metric - used between benchmark runs"""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _observations.clear()
@@ -0,0 +1,113 @@
+import sys
+import time
+from chroma_db_utils import get_env_var
+
+# Priority scheduling for pipeline jobs and the review queue. An entry's
+# priority is the weight of its sentiment plus the weight of the first topic
+# keyword found in its topic_name. A job not yet triaged (sentiment unknown)
+# weighs as much as an angry one - any new call might be - so calls are
+# triaged promptly and the backlog builds up where sentiment is known.
+# Waiting ages an entry - every PRIORITY_AGING_SECONDS in the queue is worth
+# one point - so both queues are served lowest first by
+#     priority_key = queued_at - priority * PRIORITY_AGING_SECONDS
+# which is fixed per entry and can be indexed. Nothing starves: an entry is
+# passed by at most priority * PRIORITY_AGING_SECONDS of newer work.
+#   PRIORITY_SCHEDULING         true (default) | false = first come, first served
+#   PRIORITY_SENTIMENT_WEIGHTS  negative=3,unknown=3,neutral=1,positive=0
+#   PRIORITY_TOPIC_WEIGHTS      outage=1,network=1 - keyword in topic_name = weight
+#   PRIORITY_AGING_SECONDS      120
+#   PRIORITY_SLA_SECONDS        negative=60,neutral=300,positive=600 - targets for reports
+#
+#   python priority_utils.py    queue wait of finished jobs and reviewed cases per sentiment
+
+UNKNOWN_CLASS = "unknown"
+
+def parse_weights(value):
+    """'negative=3,neutral=1' -> {'negative': 3.0, 'neutral': 1.0}"""
+    weights = {}
+    for item in str(value or "").split(","):
+        if "=" not in item:
+            continue
+        key, weight = item.split("=", 1)
+        weights[key.strip().lower()] = float(weight)
+    return weights
+
+def priority_enabled():
+    return str(get_env_var('PRIORITY_SCHEDULING', 'true')).lower() == 'true'
+
+def get_sentiment_weights():
+    return parse_weights(get_env_var('PRIORITY_SENTIMENT_WEIGHTS', 'negative=3,unknown=3,neutral=1,positive=0'))
+
+def get_topic_weights():
+    return parse_weights(get_env_var('PRIORITY_TOPIC_WEIGHTS', 'outage=1,network=1'))
+
+def get_aging_seconds():
+    return float(get_env_var('PRIORITY_AGING_SECONDS', 120))
+
+def get_sla_seconds():
+    return parse_weights(get_env_var('PRIORITY_SLA_SECONDS', 'negative=60,neutral=300,positive=600'))
+
+def priority_class(sentiment):
+    """Sentiment bucket used for priorities and latency reports"""
+    sentiment = (sentiment or "").strip().lower()
+    return sentiment if sentiment in get_sentiment_weights() else UNKNOWN_CLASS
+
+def priority_score(sentiment=None, topic=None):
+    """Static priority of an entry - 0 for everything when scheduling is disabled"""
+    if not priority_enabled():
+        return 0.0
+    score = get_sentiment_weights().get(priority_class(sentiment), 0.0)
+
+    topic = (topic or "").lower()
+    for keyword, weight in get_topic_weights().items():
+        if keyword in topic:
+            score += weight
+            break
+    return score
+
+def priority_key(priority, queued_at=None):
+    """Sort key of an entry, lowest is served first"""
+    if queued_at is None:
+        queued_at = time.time()
+    return queued_at - priority * get_aging_seconds()
+
+def latency_summary(waits_by_class):
+    """Per-class count, p50/p95/max and share within its SLA from {class: [seconds]}"""
+    sla_seconds = get_sla_seconds()
+    summary = {}
+    for name, waits in sorted(waits_by_class.items()):
+        waits = sorted(waits)
+        if not waits:
+            continue
+        sla = sla_seconds.get(name)
+        summary[name] = {
+            "count": len(waits),
+            "p50": waits[int(0.50 * (len(waits) - 1))],
+            "p95": waits[int(0.95 * (len(waits) - 1))],
+            "max": waits[-1],
+            "sla": sla,
+            "within_sla": sum(wait <= sla for wait in waits) / len(waits) if sla is not None else None
+        }
+    return summary
+
+def print_latency_summary(title, summary):
+    print(title)
+    print(f"  {'class':<10} {'count':>6} {'p50 s':>8} {'p95 s':>8} {'max s':>8} {'SLA s':>7} {'in SLA':>7}")
+    for name, row in summary.items():
+        sla = f"{row['sla']:7.0f}" if row['sla'] is not None else f"{'-':>7}"
+        within = f"{row['within_sla']:7.0%}" if row['within_sla'] is not None else f"{'-':>7}"
+        print(
+            f"  {name:<10} {row['count']:6d} {row['p50']:8.2f} {row['p95']:8.2f} {row['max']:8.2f} {sla} {within}"
+        )
+
+def main():
+    # Imported here - both stores import this module
+    from job_queue_utils import job_wait_report
+    from case_store_utils import review_wait_report
+
+    print_latency_summary("Pipeline jobs - time queued before a worker picked them up", job_wait_report())
+    print_latency_summary("Review queue - time from stored to approved/rejected", review_wait_report())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import os
+import sys
+import time
+import pstats
+import cProfile
+import functools
+import threading
+import contextvars
+from datetime import datetime
+
+# Opt-in profiling of pipeline runs. With PROFILING=true every decorated run
+# gets a directory under $LOG_DIR/profiles holding one cProfile dump per agent
+# node (or one for the whole call) and, with PROFILE_MEMORY=true, a tracemalloc
+# snapshot. When PROFILING is off the decorators hand back the function itself,
+# so there is no wrapper and no overhead at all.
+#
+#   python profiling_utils.py [run_dir]   hot functions per agent of a run (default: latest)
+
+# Plain os.environ on purpose: checked at import time, where pulling in
+# Streamlit for its secrets would cost more than the profiler saves
+def profiling_enabled():
+    """Whether PROFILING is switched on"""
+    return os.getenv('PROFILING', 'false').lower() == 'true'
+
+def memory_profiling_enabled():
+    """Whether PROFILE_MEMORY is switched on (tracemalloc slows every allocation)"""
+    return os.getenv('PROFILE_MEMORY', 'false').lower() == 'true'
+
+def get_profile_dir():
+    """Root directory of the per-run profile directories"""
+    return os.path.join(os.getenv('LOG_DIR', 'logs'), 'profiles')
+
+# Directory of the run being profiled - copied into the threads LangGraph runs nodes on
+_current_run_dir = contextvars.ContextVar('profile_run_dir', default=None)
+
+# tracemalloc is process wide - concurrent runs share one trace
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+
+def _new_run_dir(name):
+    run_dir = os.path.join(
+        get_profile_dir(),
+        f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{name}_{os.getpid()}_{threading.get_ident()}"
+    )
+    os.makedirs(run_dir, exist_ok=True)
+    return run_dir
+
+def _start_tracemalloc():
+    global _tracemalloc_users
+    import tracemalloc
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(int(os.getenv('PROFILE_MEMORY_FRAMES', 10)))
+        _tracemalloc_users += 1
+
+def _stop_tracemalloc(run_dir):
+    global _tracemalloc_users
+    import tracemalloc
+    with _tracemalloc_lock:
+        tracemalloc.take_snapshot().dump(os.path.join(run_dir, "memory.snapshot"))
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+
+def _dump_profile(profiler, path):
+    # Several calls of the same node in one run (e.g. a resume) are merged
+    if os.path.exists(path):
+        stats = pstats.Stats(path)
+        stats.add(profiler)
+        stats.dump_stats(path)
+    else:
+        profiler.dump_stats(path)
+
+def profile_run(name, per_node=False):
+    """Decorator giving every call of a pipeline entry point its own profile directory
+
+    per_node=True leaves the CPU profile to profile_node() wrappers inside the
+    call - cProfile only sees the thread it runs on and cannot be nested.
+    """
+    def decorator(func):
+        if not profiling_enabled():
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run_dir = _new_run_dir(name)
+            token = _current_run_dir.set(run_dir)
+            if memory_profiling_enabled():
+                _start_tracemalloc()
+            profiler = None if per_node else cProfile.Profile()
+            started = time.perf_counter()
+            try:
+                if profiler:
+                    return profiler.runcall(func, *args, **kwargs)
+                return func(*args, **kwargs)
+            finally:
+                with open(os.path.join(run_dir, "wall_time.txt"), "w") as f:
+                    f.write(f"{(time.perf_counter() - started) * 1000:.1f}\n")
+                if profiler:
+                    _dump_profile(profiler, os.path.join(run_dir, f"{name}.prof"))
+                if memory_profiling_enabled():
+                    _stop_tracemalloc(run_dir)
+                _current_run_dir.reset(token)
+        return wrapper
+    return decorator
+
+def profile_node(node_name, func):
+    """Profile one graph node into the current run directory, func unchanged when off"""
+    if not profiling_enabled():
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        run_dir = _current_run_dir.get() or _new_run_dir(node_name)
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            _dump_profile(profiler, os.path.join(run_dir, f"{node_name}.prof"))
+    return wrapper
+
+def summarize_run(run_dir, top=10):
+    """Text report of the hottest functions per profile (agent) and the top allocations"""
+    lines = [f"Profile run: {run_dir}"]
+    wall_time_path = os.path.join(run_dir, "wall_time.txt")
+    if os.path.exists(wall_time_path):
+        with open(wall_time_path) as f:
+            lines.append(f"Wall time: {f.read().strip()} ms")
+
+    for filename in sorted(os.listdir(run_dir)):
+        if not filename.endswith(".prof"):
+            continue
+        stats = pstats.Stats(os.path.join(run_dir, filename))
+        lines.append("")
+        lines.append(f"== {filename[:-len('.prof')]} ({stats.total_tt * 1000:.1f} ms profiled)")
+        lines.append(f"  {'self ms':>9} {'cum ms':>9} {'calls':>7}  function")
+        # Sort by own time - the functions that actually burn the CPU
+        hot = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+        for (path, line, function), (_, calls, self_time, cum_time, _) in hot:
+            location = f"{os.path.basename(path)}:{line}" if line else path
+            lines.append(f"  {self_time * 1000:9.1f} {cum_time * 1000:9.1f} {calls:7d}  {function} ({location})")
+
+    snapshot_path = os.path.join(run_dir, "memory.snapshot")
+    if os.path.exists(snapshot_path):
+        import tracemalloc
+        snapshot = tracemalloc.Snapshot.load(snapshot_path)
+        lines.append("")
+        lines.append("== memory (largest live allocations at the end of the run)")
+        for stat in snapshot.statistics("lineno")[:top]:
+            lines.append(f"  {stat.size / 1024:9.1f} KiB {stat.count:7d} blocks  {stat.traceback[0]}")
+
+    return "\n".join(lines)
+
+def latest_run_dir():
+    """Most recent profile run directory, or None"""
+    profile_dir = get_profile_dir()
+    if not os.path.isdir(profile_dir):
+        return None
+    runs = sorted(entry for entry in os.listdir(profile_dir) if os.path.isdir(os.path.join(profile_dir, entry)))
+    return os.path.join(profile_dir, runs[-1]) if runs else None
+
+if __name__ == "__main__":
+    run_dir = sys.argv[1] if len(sys.argv) > 1 else latest_run_dir()
+    if not run_dir:
+        print(f"No profile runs found in {get_profile_dir()} - run with PROFILING=true first")
+        sys.exit(1)
+    print(summarize_run(run_dir, top=int(os.getenv('PROFILE_TOP', 10))))
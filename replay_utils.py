@@ -0,0 +1,160 @@
+import re
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Replays stored transcripts through the extract -> retrieve part of the graph,
+# so prompt changes can be compared offline without paying for Whisper again.
+
+# One record of the agent_flow.log format: "<asctime> - <LEVEL> - <message>"
+LOG_RECORD_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3} - [A-Z]+ - ', re.MULTILINE)
+AGENT_HEADER_PATTERN = re.compile(r'^===== (.+?) =====\n', re.DOTALL)
+
+def load_transcripts_from_jsonl(path):
+    """Read {"transcript": ..., "id"/"request_id": ..., optional baseline outputs} lines"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if not item.get("transcript"):
+                continue
+            record_id = item.get("request_id", item.get("id"))
+            records.append({
+                "id": str(record_id if record_id is not None else line_number),
+                "transcript": item["transcript"],
+                "baseline_extracted_info": item.get("extracted_info"),
+                "baseline_response": item.get("generated_response")
+            })
+    return records
+
+def load_transcripts_from_log(path):
+    """Rebuild runs from an agent_flow.log - every successful transcription starts a new run"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+
+    records = []
+    current = None
+    for message in LOG_RECORD_PATTERN.split(text):
+        header = AGENT_HEADER_PATTERN.match(message)
+        if not header:
+            continue
+        agent_name = header.group(1)
+        body = message[header.end():].strip()
+
+        if agent_name == "Transcription Agent" and body.startswith("Transcript:"):
+            current = {
+                "id": str(len(records) + 1),
+                "transcript": body[len("Transcript:"):].strip(),
+                "baseline_extracted_info": None,
+                "baseline_response": None
+            }
+            records.append(current)
+        elif current and agent_name == "Info Extractor Agent" and body.startswith("Extracted Info:"):
+            try:
+                current["baseline_extracted_info"] = json.loads(body[len("Extracted Info:"):])
+            except json.JSONDecodeError:
+                pass
+        elif current and agent_name == "Context Retrieval Agent" and not body.startswith("Error:"):
+            current["baseline_response"] = body
+    return records
+
+def load_transcripts(path):
+    """Load replay records from a JSONL file or an agent_flow.log"""
+    if path.endswith(".jsonl"):
+        return load_transcripts_from_jsonl(path)
+    return load_transcripts_from_log(path)
+
+def replay_record(workflow, record, deadline_seconds):
+    """Run one stored transcript from the extract node and return side-by-side output"""
+    state = {
+        "audio_file": "",
+        "processed_audio_file": "",
+        "transcript": record["transcript"],
+        "extracted_info": {},
+        "retrieved_context": [],
+        "generated_response": "",
+        "final_output": {},
+        "agent_logs": [],
+        "deadline": time.time() + deadline_seconds,
+        "stage_timings": {}
+    }
+    started = time.perf_counter()
+    result = workflow.invoke(state)
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    return {
+        "id": record["id"],
+        "transcript": record["transcript"],
+        "baseline_extracted_info": record["baseline_extracted_info"],
+        "replay_extracted_info": result["extracted_info"],
+        "baseline_response": record["baseline_response"],
+        "replay_response": result["generated_response"],
+        "errors": [log.get("message") for log in result["agent_logs"] if log["status"] != "success"],
+        "stage_timings": result.get("stage_timings", {}),
+        "total_ms": total_ms
+    }
+
+def replay_transcripts(records, concurrency=4, deadline_seconds=120):
+    """Replay many transcripts concurrently, results come back in input order"""
+    from agentic_utils import create_workflow, setup_logging
+
+    setup_logging(file_mode='a')
+    workflow = create_workflow(entry_point="extract")
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda record: replay_record(workflow, record, deadline_seconds), records))
+
+def summarize_latency(outputs):
+    """p50/p95 per stage and end to end"""
+    stages = {}
+    for output in outputs:
+        for stage, ms in output["stage_timings"].items():
+            stages.setdefault(stage, []).append(ms)
+        stages.setdefault("total", []).append(output["total_ms"])
+
+    summary = {}
+    for stage, values in stages.items():
+        values.sort()
+        summary[stage] = {
+            "p50": values[int(0.50 * (len(values) - 1))],
+            "p95": values[int(0.95 * (len(values) - 1))]
+        }
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay stored transcripts through extraction and generation")
+    parser.add_argument("--input", default="logs/agent_flow.log", help="JSONL file of transcripts or an agent_flow.log")
+    parser.add_argument("--output", default="logs/replay_output.jsonl", help="Where to write side-by-side results")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--limit", type=int, help="Only replay the first N transcripts")
+    parser.add_argument("--deadline-seconds", type=float, default=120)
+    args = parser.parse_args(argv)
+
+    records = load_transcripts(args.input)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print(f"No transcripts found in {args.input}")
+        return 1
+
+    print(f"Replaying {len(records)} transcript(s) with concurrency {args.concurrency}...")
+    started = time.perf_counter()
+    outputs = replay_transcripts(records, concurrency=args.concurrency, deadline_seconds=args.deadline_seconds)
+    elapsed = time.perf_counter() - started
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        for output in outputs:
+            f.write(json.dumps(output, ensure_ascii=False) + "\n")
+
+    errors = sum(1 for output in outputs if output["errors"])
+    print(f"Wrote {len(outputs)} result(s) to {args.output} in {elapsed:.1f}s ({errors} with agent errors)")
+    for stage, stats in summarize_latency(outputs).items():
+        print(f"  {stage:<10} p50 {stats['p50']:8.1f} ms  p95 {stats['p95']:8.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import sys
+import subprocess
+
+# Modules the app must be able to import without loading the agent pipeline
+LIGHT_MODULES = [
+    "chroma_db_utils",
+    "context_utils",
+    "case_store_utils",
+    "job_queue_utils",
+    "upload_utils",
+    "agentic_utils",
+]
+
+# Packages that should only load once the pipeline or KB page is actually used
+HEAVY_PACKAGES = ["chromadb", "groq", "langgraph", "pandas", "numpy"]
+
+def profile_import(module_name):
+    """Import a module in a fresh interpreter with -X importtime
+
+    Returns a list of (cumulative_us, self_us, package) tuples, one per
+    imported package, as reported by the interpreter.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module_name} failed:\n{completed.stderr}")
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, package = line[len("import time:"):].split("|")
+        entries.append((int(cumulative_us), int(self_us), package.strip()))
+    return entries
+
+def summarize_import(module_name, top=10):
+    """Total import time of a module, its slowest imports and any heavy packages it pulled in"""
+    entries = profile_import(module_name)
+    loaded = {package for _, _, package in entries}
+    total_us = next((cumulative for cumulative, _, package in entries if package == module_name), 0)
+    return {
+        "module": module_name,
+        "total_ms": total_us / 1000,
+        "slowest": sorted(entries, reverse=True)[:top],
+        "heavy_loaded": [package for package in HEAVY_PACKAGES if package in loaded]
+    }
+
+def check_startup(max_import_ms=None, top=5):
+    """Profile every light module and return the list of regressions found"""
+    failures = []
+    for module_name in LIGHT_MODULES:
+        summary = summarize_import(module_name, top=top)
+        print(f"{module_name}: {summary['total_ms']:.1f} ms")
+        for cumulative_us, self_us, package in summary['slowest']:
+            print(f"    {cumulative_us / 1000:8.1f} ms cumulative  {self_us / 1000:8.1f} ms self  {package}")
+
+        if summary['heavy_loaded']:
+            failures.append(f"{module_name} eagerly imports {', '.join(summary['heavy_loaded'])}")
+        if max_import_ms is not None and summary['total_ms'] > max_import_ms:
+            failures.append(f"{module_name} took {summary['total_ms']:.1f} ms to import (limit {max_import_ms} ms)")
+    return failures
+
+if __name__ == "__main__":
+    # Regression check for cold start: python startup_profile.py [max_import_ms]
+    limit = float(sys.argv[1]) if len(sys.argv) > 1 else None
+    problems = check_startup(max_import_ms=limit)
+    if problems:
+        print("\nStartup regressions:")
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print("\nNo startup regressions found")
@@ -1,11 +1,15 @@
 import streamlit as st
-import pandas as pd
 import json
 import os
 import time
+from metrics_utils import observe, read_metrics_snapshots
 from datetime import datetime
-from agentic_utils import run_agent_flow
-from chroma_db_utils import get_next_id, add_to_chroma_only, get_or_create_collection
+from chroma_db_utils import get_env_var, get_next_id, add_to_chroma_only, add_cases_to_chroma, get_or_create_collection
+from kb_index_utils import get_active_collection_name
+from case_store_utils import get_case, get_case_status, get_next_pending_case, count_cases, list_cases, update_case_status, update_case_statuses
+from case_result_utils import CaseResult
+from job_queue_utils import submit_job, get_job, start_worker_pool, get_metrics_dir
+from upload_utils import staged_upload, cleanup_stale_uploads
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -108,8 +112,6 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 def init_session_state():
-    if 'agent_results' not in st.session_state:
-        st.session_state.agent_results = None
     if 'current_page' not in st.session_state:
         st.session_state.current_page = "About"
     if 'form_reset' not in st.session_state:
@@ -118,16 +120,21 @@ def init_session_state():
         st.session_state.last_page = "About"
     if 'user_role' not in st.session_state:
         st.session_state.user_role = "Customer"
-    if 'pending_approvals' not in st.session_state:
-        st.session_state.pending_approvals = []
-    if 'approved_cases' not in st.session_state:
-        st.session_state.approved_cases = []
+    # Only the case ID lives in the session - the result is loaded from the case store
+    if 'current_case_id' not in st.session_state:
+        st.session_state.current_case_id = None
+    if 'current_job_id' not in st.session_state:
+        st.session_state.current_job_id = None
+    if 'job_error' not in st.session_state:
+        st.session_state.job_error = None
     if 'customer_upload_status' not in st.session_state:
         st.session_state.customer_upload_status = "idle"  # idle, uploaded, processing, approved
     if 'approval_completed' not in st.session_state:
         st.session_state.approval_completed = False
     if 'go_to_dashboard' not in st.session_state:
         st.session_state.go_to_dashboard = False
+    if 'bulk_review_message' not in st.session_state:
+        st.session_state.bulk_review_message = None
 
 def show_user_selection():
     st.sidebar.markdown("### 👤 Select User Role")
@@ -135,6 +142,57 @@ def show_user_selection():
     st.session_state.user_role = user_role
     return user_role
 
+@st.cache_data(show_spinner=False)
+def load_file_bytes(path):
+    """Contents of a static asset, read once per server process (None if missing)"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as file:
+        return file.read()
+
+@st.cache_data(show_spinner=False)
+def load_sample_audio(sample_dir):
+    """(name, bytes) of the first two sample calls - None if the directory is missing"""
+    if not os.path.exists(sample_dir):
+        return None
+    sample_files = [f for f in sorted(os.listdir(sample_dir)) if f.endswith(('.m4a', '.mp3', '.wav', '.ogg'))]
+    return [(sample_file, load_file_bytes(os.path.join(sample_dir, sample_file))) for sample_file in sample_files[:2]]
+
+@st.cache_resource(show_spinner=False)
+def get_kb_collection(collection_name):
+    """Collection handle shared by all sessions - keyed by name so a re-index switch is picked up"""
+    return get_or_create_collection(collection_name)
+
+# Writes from other processes (replicas, kb_index_utils) show up after this at the latest
+@st.cache_data(ttl=float(get_env_var('KB_CACHE_TTL_SECONDS', 60)), show_spinner=False)
+def load_kb_overview(collection_name):
+    """Record count, next free ID and table rows from one metadata-only scan, cached until a KB write"""
+    import pandas as pd
+    
+    results = get_kb_collection(collection_name).get(include=["metadatas"])
+    try:
+        next_id = max(int(id) for id in results['ids']) + 1 if results['ids'] else 1
+    except ValueError:
+        next_id = 1
+    records = pd.DataFrame([
+        {
+            'ID': metadata.get('id', 'N/A'),
+            'Topic': metadata.get('topic_name', 'N/A'),
+            'Sentiment': metadata.get('sentiment', 'N/A'),
+            'Source': metadata.get('source', 'N/A')
+        }
+        for metadata in results['metadatas']
+    ])
+    return {"count": len(results['ids']), "next_id": next_id, "records": records}
+
+def get_kb_overview():
+    """Cached overview of the active knowledge base collection"""
+    return load_kb_overview(get_active_collection_name())
+
+def invalidate_kb_cache():
+    """Drop the cached overview after this app wrote to the knowledge base"""
+    load_kb_overview.clear()
+
 def show_about():
     st.markdown('<div class="main-header">Customer Support - AI Agentic Framework</div>', unsafe_allow_html=True)
     st.markdown("---")
@@ -176,8 +234,9 @@ def show_architecture():
     st.markdown("---")
     
     # Load and display the architecture image
-    if os.path.exists("system_architecture.png"):
-        st.image("system_architecture.png", use_container_width=True)
+    architecture_image = load_file_bytes("system_architecture.png")
+    if architecture_image is not None:
+        st.image(architecture_image, use_container_width=True)
         st.markdown("---")
     else:
         st.info("Architecture diagram image not found. Please add 'system_architecture.png' to view the system architecture.")
@@ -209,19 +268,25 @@ def show_customer_support_flow():
     # Check if we need to go to dashboard (show empty state)
     if st.session_state.go_to_dashboard:
         st.session_state.go_to_dashboard = False
-        st.session_state.agent_results = None
+        st.session_state.current_case_id = None
         st.session_state.approval_completed = False
     
     # Clear results when navigating to this page
     if st.session_state.last_page != "Customer Support":
-        st.session_state.agent_results = None
+        st.session_state.current_case_id = None
         st.session_state.approval_completed = False
     st.session_state.last_page = "Customer Support"
     
+    # Support Engineer picks up the next pending case - angry and long-waiting customers first
+    pending_count = count_cases("pending")
+    if (st.session_state.user_role == "Support Engineer" and 
+        get_case_status(st.session_state.current_case_id) != "pending"):
+        next_case = get_next_pending_case() if pending_count else None
+        st.session_state.current_case_id = next_case['case_id'] if next_case else None
+    
     # Show empty state if no pending cases for Support Engineer
     if (st.session_state.user_role == "Support Engineer" and 
-        not st.session_state.agent_results and 
-        not st.session_state.pending_approvals):
+        not st.session_state.current_case_id):
         
         st.markdown('<div class="main-header">Support Engineer Dashboard</div>', unsafe_allow_html=True)
         st.markdown("---")
@@ -232,8 +297,9 @@ def show_customer_support_flow():
         
         st.markdown("### 👨‍💼 Support Engineer View - Review pending cases and manage knowledge base")
         
-        if st.session_state.approved_cases:
-            st.success(f"✅ You have {len(st.session_state.approved_cases)} approved cases in the knowledge base")
+        approved_count = count_cases("approved")
+        if approved_count:
+            st.success(f"✅ You have {approved_count} approved cases in the knowledge base")
         
         st.info("📋 **No pending cases to review at the moment.**")
         st.markdown("When customers submit new cases, they will appear here for your review and approval.")
@@ -254,20 +320,16 @@ def show_customer_support_flow():
     # Sample audio files section for Customer
     if st.session_state.user_role == "Customer":
         st.markdown("### 🎵 Sample Audio Files")
-        sample_dir = "sample_audio"
-        if os.path.exists(sample_dir):
-            sample_files = [f for f in os.listdir(sample_dir) if f.endswith(('.m4a', '.mp3', '.wav', '.ogg'))]
-            if sample_files:
-                for sample_file in sample_files[:2]:  # Show only first 2 samples
-                    sample_path = os.path.join(sample_dir, sample_file)
-                    with open(sample_path, "rb") as file:
-                        st.download_button(
-                            label=f"📥 Download {sample_file}",
-                            data=file,
-                            file_name=sample_file,
-                            mime="audio/mpeg",
-                            key=f"sample_{sample_file}"
-                        )
+        sample_files = load_sample_audio("sample_audio")
+        if sample_files is not None:
+            for sample_file, data in sample_files:
+                st.download_button(
+                    label=f"📥 Download {sample_file}",
+                    data=data,
+                    file_name=sample_file,
+                    mime="audio/mpeg",
+                    key=f"sample_{sample_file}"
+                )
         else:
             st.info("No sample audio files found in 'sample_audio' directory")
         
@@ -293,57 +355,178 @@ def show_customer_support_flow():
             
             st.json(file_details)
             
-            # Save uploaded file
-            audio_path = f"temp_audio.{uploaded_file.name.split('.')[-1]}"
-            with open(audio_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            
             if st.button("🚀 Start AI Agent Flow", type="primary", use_container_width=True):
-                with st.spinner("🤖 Processing audio through AI agents..."):
-                    try:
-                        result = run_agent_flow(audio_path)
-                        st.session_state.agent_results = result
-                        
-                        # Store for support engineer approval
-                        st.session_state.pending_approvals.append({
-                            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            'filename': uploaded_file.name,
-                            'result': result,
-                            'case_id': len(st.session_state.pending_approvals) + 1,
-                            'status': 'pending'
-                        })
-                        
-                        # Set customer status
-                        st.session_state.customer_upload_status = "uploaded"
-                            
-                    except Exception as e:
-                        st.error(f"Error running agent flow: {str(e)}")
-                
-                # Clean up
-                if os.path.exists(audio_path):
-                    os.remove(audio_path)
+                try:
+                    get_worker_pool()
+                    # Stream to a unique staged file - removed on exit unless the queue took it over
+                    with staged_upload(uploaded_file) as audio_path:
+                        st.session_state.current_job_id = submit_job(audio_path, filename=uploaded_file.name)
+                    st.session_state.current_case_id = None
+                    st.session_state.job_error = None
+                    st.session_state.customer_upload_status = "processing"
+                except Exception as e:
+                    st.error(f"Error running agent flow: {str(e)}")
+        
+        # Poll the queued job until the workers are done with it
+        if st.session_state.current_job_id:
+            show_job_status()
+        
+        if st.session_state.job_error:
+            st.error(f"Error running agent flow: {st.session_state.job_error}")
     else:
         # For Support Engineer, show message when there are pending cases
-        if st.session_state.pending_approvals:
-            st.info(f"👨‍💼 **Support Engineer View** - You have {len(st.session_state.pending_approvals)} pending case(s) to review")
+        if pending_count:
+            st.info(f"👨‍💼 **Support Engineer View** - You have {pending_count} pending case(s) to review")
+        if st.session_state.bulk_review_message:
+            st.success(st.session_state.bulk_review_message)
+            st.session_state.bulk_review_message = None
+        if pending_count > 1:
+            show_bulk_review(pending_count)
+        show_worker_metrics()
     
     # Show results if available
-    if st.session_state.agent_results:
+    case = get_case(st.session_state.current_case_id)
+    if case:
+        result = CaseResult.from_dict(case['result'])
         if st.session_state.user_role == "Customer":
-            display_customer_results(st.session_state.agent_results)
+            display_customer_results(result)
         else:
-            display_support_engineer_results(st.session_state.agent_results)
+            display_support_engineer_results(result)
     
     # Footer
     st.markdown('<div class="footer">Built by: Siddharth Kulkarni</div>', unsafe_allow_html=True)
 
+def show_bulk_review(pending_count):
+    """Approve or reject many pending cases at once with their AI generated responses"""
+    with st.expander(f"📦 Bulk Review - {pending_count} pending case(s)"):
+        pending_cases = list_cases(
+            status="pending", limit=int(get_env_var('BULK_REVIEW_LIMIT', 200)), by_priority=True
+        )
+        results = {case['case_id']: CaseResult.from_dict(case['result']) for case in pending_cases}
+        
+        selected = st.multiselect(
+            "Select cases to approve or reject:",
+            options=list(results),
+            format_func=lambda case_id: (
+                f"{results[case_id].extracted_info.topic_name} ({results[case_id].extracted_info.overall_sentiment}) - "
+                f"{results[case_id].extracted_info.description[:80]}"
+            ),
+            key="bulk_review_selection"
+        )
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            approve = st.button(f"✅ Approve {len(selected)} & Add to Knowledge Base", type="primary",
+                                use_container_width=True, disabled=not selected)
+        with col2:
+            reject = st.button(f"❌ Reject {len(selected)}", use_container_width=True, disabled=not selected)
+        
+        if approve:
+            started = time.perf_counter()
+            # Claim first - only cases still pending are ours to add, another engineer may have handled the rest
+            claimed = update_case_statuses(selected, "approved")
+            if claimed:
+                with st.spinner(f"🔍 Indexing {len(claimed)} cases in knowledge base..."):
+                    # One embedded batch for all claimed cases instead of a round-trip per case
+                    case_ids = add_cases_to_chroma([
+                        {
+                            "topic_name": results[case_id].extracted_info.topic_name,
+                            "description": results[case_id].extracted_info.description,
+                            "sentiment": results[case_id].extracted_info.overall_sentiment,
+                            "solution": results[case_id].generated_response
+                        }
+                        for case_id in claimed
+                    ])
+                if not case_ids:
+                    # Back to the queue so they can be approved again
+                    update_case_statuses(claimed, "pending", expected_status="approved")
+                    st.error("❌ Failed to add cases to knowledge base")
+                    return
+                invalidate_kb_cache()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if claimed:
+                observe("kb.bulk_write_ms_per_case", elapsed_ms / len(claimed))
+            st.session_state.bulk_review_message = (
+                f"✅ Approved {len(claimed)} cases in {elapsed_ms:.0f} ms "
+                f"({elapsed_ms / max(len(claimed), 1):.1f} ms per case)"
+            )
+            if len(claimed) < len(selected):
+                st.session_state.bulk_review_message += (
+                    f" - {len(selected) - len(claimed)} already handled by another engineer"
+                )
+        elif reject:
+            rejected = update_case_statuses(selected, "rejected")
+            st.session_state.bulk_review_message = f"Rejected {len(rejected)} cases - not added to knowledge base"
+            if len(rejected) < len(selected):
+                st.session_state.bulk_review_message += (
+                    f" - {len(selected) - len(rejected)} already handled by another engineer"
+                )
+        else:
+            return
+        
+        # One rerun for the whole batch
+        del st.session_state.bulk_review_selection
+        st.rerun()
+
+@st.fragment(run_every=2)
+def show_job_status():
+    """Poll the customer's queued job and load its case once a worker has finished"""
+    job = get_job(st.session_state.current_job_id)
+    if job is None:
+        st.session_state.current_job_id = None
+        return
+    
+    if job['status'] in ("queued", "running"):
+        st.info(f"🤖 Processing audio through AI agents... (job {job['status']})")
+        return
+    
+    st.session_state.current_job_id = None
+    if job['status'] == "done":
+        st.session_state.current_case_id = job['case_id']
+        # Set customer status
+        st.session_state.customer_upload_status = "uploaded"
+    else:
+        st.session_state.job_error = job['error'].splitlines()[0] if job['error'] else "Unknown error"
+        st.session_state.customer_upload_status = "idle"
+    
+    # Full rerun so the results render outside this fragment
+    st.rerun()
+
+def show_worker_metrics():
+    """Circuit breaker, rate limiter and retry metrics published by the agent workers"""
+    with st.expander("📈 Agent Worker Metrics"):
+        snapshots = read_metrics_snapshots(get_metrics_dir())
+        if not snapshots:
+            st.info("No worker has reported metrics yet (every METRICS_LOG_SECONDS)")
+            return
+        
+        breaker_states = {0: "closed", 1: "half open", 2: "open"}
+        rows = []
+        for worker, snapshot in snapshots.items():
+            counters, gauges, observations = snapshot["counters"], snapshot["gauges"], snapshot["observations"]
+            throttle_wait = observations.get("llm.throttle_wait_ms", {})
+            rows.append({
+                "worker": worker,
+                "updated": f"{time.time() - snapshot['written_at']:.0f}s ago",
+                "breakers": ", ".join(
+                    f"{name.split('.')[2]} {breaker_states.get(value, value)}"
+                    for name, value in sorted(gauges.items())
+                    if name.startswith("llm.breaker.") and name.endswith(".state")
+                ),
+                "requests": sum(value for name, value in counters.items() if name.endswith(".requests")),
+                "retries": sum(value for name, value in counters.items() if name.endswith(".retries")),
+                "errors": sum(value for name, value in counters.items() if name.endswith(".errors")),
+                "deadline exceeded": sum(value for name, value in counters.items() if name.endswith(".deadline_exceeded")),
+                "rejected by breaker": sum(value for name, value in counters.items() if name.endswith(".rejected")),
+                "throttled": counters.get("llm.throttled", 0),
+                "throttle wait p95 ms": round(throttle_wait.get("p95", 0))
+            })
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+
 def display_customer_results(result):
     """Display results for Customer role"""
     # Check if this case has been approved
-    current_case_approved = any(
-        case['result']['final_output']['extracted_info'] == result['final_output']['extracted_info']
-        for case in st.session_state.approved_cases
-    )
+    current_case_approved = get_case_status(st.session_state.current_case_id) == "approved"
     
     # Update customer status
     if current_case_approved:
@@ -352,8 +535,8 @@ def display_customer_results(result):
     # Summary metrics
     col1, col2, col3 = st.columns(3)
     
-    total_agents = len(result.get('agent_logs', []))
-    successful_agents = len([log for log in result.get('agent_logs', []) if log['status'] == "success"])
+    total_agents = len(result.agent_logs)
+    successful_agents = len([log for log in result.agent_logs if log.status == "success"])
     
     with col1:
         st.metric("Total Agents", total_agents)
@@ -372,10 +555,10 @@ def display_customer_results(result):
     # Display agent logs
     st.markdown("### 🔍 Detailed Agent Execution")
     
-    for i, log in enumerate(result.get('agent_logs', [])):
-        agent_name = log['agent']
-        status = log['status']
-        message = log['message']
+    for i, log in enumerate(result.agent_logs):
+        agent_name = log.agent
+        status = log.status
+        message = result.log_message(log)
         
         if status == "success":
             st.markdown(f"""
@@ -407,7 +590,7 @@ def display_customer_results(result):
         st.markdown("---")
     
     # Final response section
-    response_data = result['final_output']['generated_response']
+    response_data = result.generated_response
     
     if isinstance(response_data, str):
         # Create downloadable text file
@@ -444,7 +627,7 @@ def display_customer_results(result):
     
     # Only show process another call button
     if st.button("🔄 Process Another Call", use_container_width=True):
-        st.session_state.agent_results = None
+        st.session_state.current_case_id = None
         st.session_state.customer_upload_status = "idle"
         st.rerun()
 
@@ -453,8 +636,8 @@ def display_support_engineer_results(result):
     # Summary metrics
     col1, col2, col3 = st.columns(3)
     
-    total_agents = len(result.get('agent_logs', []))
-    successful_agents = len([log for log in result.get('agent_logs', []) if log['status'] == "success"])
+    total_agents = len(result.agent_logs)
+    successful_agents = len([log for log in result.agent_logs if log.status == "success"])
     
     with col1:
         st.metric("Total Agents", total_agents)
@@ -468,10 +651,10 @@ def display_support_engineer_results(result):
     # Display agent logs
     st.markdown("### 🔍 AI Agent Execution Details")
     
-    for i, log in enumerate(result.get('agent_logs', [])):
-        agent_name = log['agent']
-        status = log['status']
-        message = log['message']
+    for i, log in enumerate(result.agent_logs):
+        agent_name = log.agent
+        status = log.status
+        message = result.log_message(log)
         
         if status == "success":
             st.markdown(f"""
@@ -507,8 +690,8 @@ def display_support_engineer_results(result):
     st.markdown("### ✅ Review & Add to Knowledge Base")
     st.markdown("---")
     
-    extracted_info = result['final_output']['extracted_info']
-    initial_response = result['final_output']['generated_response']
+    extracted_info = result.extracted_info
+    initial_response = result.generated_response
     
     # Editable response
     st.markdown("#### 📝 AI Generated Response (Editable)")
@@ -526,27 +709,22 @@ def display_support_engineer_results(result):
             # Use edited response if changes were made
             final_response = edited_response if edited_response != initial_response else initial_response
             
-            new_id = get_next_id()
+            # Claim the case before writing - if another engineer got there first, nothing is added twice
+            if not update_case_status(st.session_state.current_case_id, "approved"):
+                st.warning("This case was already handled by another engineer")
+                st.session_state.current_case_id = None
+                st.rerun()
+            
             success = add_to_chroma_only(
-                case_id=new_id,
-                topic_name=extracted_info['topic_name'],
-                description=extracted_info['description'],
-                sentiment=extracted_info['overall_sentiment'],
+                case_id=None,
+                topic_name=extracted_info.topic_name,
+                description=extracted_info.description,
+                sentiment=extracted_info.overall_sentiment,
                 solution=final_response
             )
             
             if success:
-                # Add to approved cases
-                st.session_state.approved_cases.append({
-                    'result': result,
-                    'approved_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                })
-                # Remove from pending approvals
-                if st.session_state.pending_approvals:
-                    st.session_state.pending_approvals = [
-                        case for case in st.session_state.pending_approvals 
-                        if case['result'] != result
-                    ]
+                invalidate_kb_cache()
                 # Update customer status
                 st.session_state.customer_upload_status = "approved"
                 # Set approval completed flag
@@ -557,17 +735,17 @@ def display_support_engineer_results(result):
                 st.success("✅ Case approved and added to knowledge base successfully!")
                 st.rerun()
             else:
+                # Back to the queue so it can be approved again
+                update_case_status(st.session_state.current_case_id, "pending", expected_status="approved")
                 st.error("❌ Failed to add to knowledge base")
     
     with col2:
         if st.button("❌ Reject Response", use_container_width=True):
-            st.warning("Response rejected and will not be added to knowledge base")
-            # Remove from pending approvals
-            if st.session_state.pending_approvals:
-                st.session_state.pending_approvals = [
-                    case for case in st.session_state.pending_approvals 
-                    if case['result'] != result
-                ]
+            # Remove from pending approvals - unless another engineer already handled it
+            if update_case_status(st.session_state.current_case_id, "rejected"):
+                st.warning("Response rejected and will not be added to knowledge base")
+            else:
+                st.warning("This case was already handled by another engineer")
             # Set approval completed flag
             st.session_state.approval_completed = True
             # Set flag to go to dashboard
@@ -581,109 +759,110 @@ def show_knowledge_base():
     # Side-by-side layout for Issue 1
     col1, col2 = st.columns([1, 1])
     
+    # Fragments - typing in the form reruns only the form, not the Chroma-backed stats
     with col1:
-        st.markdown("### 📊 Knowledge Base Stats")
+        show_kb_stats()
+    
+    with col2:
+        show_add_case_form()
+    
+    # Footer
+    st.markdown('<div class="footer">Built by: Siddharth Kulkarni</div>', unsafe_allow_html=True)
+
+@st.fragment
+def show_kb_stats():
+    """Knowledge base counts and records table from the cached overview"""
+    st.markdown("### 📊 Knowledge Base Stats")
+    st.markdown("---")
+    
+    # Get collection info
+    try:
+        overview = get_kb_overview()
+        
+        # Display stats in a compact format - REMOVED the pink box background
+        col1a, col2a, col3a = st.columns(3)
+        with col1a:
+            st.metric("Total Cases", overview["count"], label_visibility="visible")
+        with col2a:
+            st.metric("Pending", count_cases("pending"), label_visibility="visible")
+        with col3a:
+            st.metric("Approved", count_cases("approved"), label_visibility="visible")
+        
+        # Show ChromaDB records in a table
+        st.markdown("---")
+        st.markdown("### 📋 ChromaDB Records")
         st.markdown("---")
+        st.markdown('<div class="small-text">Live view of cases in vector database</div>', unsafe_allow_html=True)
         
-        # Get collection info
-        try:
-            collection = get_or_create_collection()
-            count = collection.count()
-            
-            # Display stats in a compact format - REMOVED the pink box background
-            col1a, col2a, col3a = st.columns(3)
-            with col1a:
-                st.metric("Total Cases", count, label_visibility="visible")
-            with col2a:
-                st.metric("Pending", len(st.session_state.pending_approvals), label_visibility="visible")
-            with col3a:
-                st.metric("Approved", len(st.session_state.approved_cases), label_visibility="visible")
-            
-            # Show ChromaDB records in a table
-            st.markdown("---")
-            st.markdown("### 📋 ChromaDB Records")
-            st.markdown("---")
-            st.markdown('<div class="small-text">Live view of cases in vector database</div>', unsafe_allow_html=True)
+        df_records = overview["records"]
+        if len(df_records):
+            st.dataframe(df_records, use_container_width=True, height=200)
             
-            try:
-                # Get all records from ChromaDB
-                results = collection.get()
-                if results['ids']:
-                    # Create a DataFrame from the metadata
-                    records_data = []
-                    for i, metadata in enumerate(results['metadatas']):
-                        records_data.append({
-                            'ID': metadata.get('id', 'N/A'),
-                            'Topic': metadata.get('topic_name', 'N/A'),
-                            'Sentiment': metadata.get('sentiment', 'N/A'),
-                            'Source': metadata.get('source', 'N/A')
-                        })
-                    
-                    df_records = pd.DataFrame(records_data)
-                    st.dataframe(df_records, use_container_width=True, height=200)
-                    
-                    # Show record count
-                    st.markdown(f'<div class="small-text">Showing {len(df_records)} records from ChromaDB</div>', unsafe_allow_html=True)
-                else:
-                    st.info("No records found in ChromaDB")
-                    
-            except Exception as e:
-                st.error(f"Error fetching ChromaDB records: {e}")
-            
-        except Exception as e:
-            st.error(f"Error accessing knowledge base: {e}")
+            # Show record count
+            st.markdown(f'<div class="small-text">Showing {len(df_records)} records from ChromaDB</div>', unsafe_allow_html=True)
+        else:
+            st.info("No records found in ChromaDB")
         
-        #st.markdown("---")
+    except Exception as e:
+        st.error(f"Error accessing knowledge base: {e}")
+
+@st.fragment
+def show_add_case_form():
+    """Manual case entry - its widgets rerun only this fragment"""
+    st.markdown("### ➕ Add New Case to Knowledge Base")
+    st.markdown("---")
     
-    with col2:
-        st.markdown("### ➕ Add New Case to Knowledge Base")
-        st.markdown("---")
-        
-        # Get next ID automatically
+    # Next ID for display - the ID actually written is reserved from the shared sequence on save
+    try:
+        next_id = get_kb_overview()["next_id"]
+    except Exception:
         next_id = get_next_id()
-        st.text_input("Case ID", value=str(next_id), disabled=True, help="Automatically generated ID")
+    st.text_input("Case ID", value=str(next_id), disabled=True, help="Automatically generated ID")
+    
+    # Use session state to manage form fields for reset
+    if 'form_reset' not in st.session_state:
+        st.session_state.form_reset = False
         
-        # Use session state to manage form fields for reset
-        if 'form_reset' not in st.session_state:
-            st.session_state.form_reset = False
+    if st.session_state.form_reset:
+        topic = st.text_input("Topic Name *", placeholder="e.g., Billing Issue, Network Problem", key="reset_topic")
+        description = st.text_area("Description *", placeholder="Detailed description of the customer issue...", height=100, key="reset_description")
+        sentiment = st.selectbox("Customer Sentiment *", ["positive", "negative", "neutral"], key="reset_sentiment")
+        solution = st.text_area("Solution *", placeholder="Proven solution for this issue...", height=150, key="reset_solution")
+    else:
+        topic = st.text_input("Topic Name *", placeholder="e.g., Billing Issue, Network Problem", key="topic")
+        description = st.text_area("Description *", placeholder="Detailed description of the customer issue...", height=100, key="description")
+        sentiment = st.selectbox("Customer Sentiment *", ["positive", "negative", "neutral"], key="sentiment")
+        solution = st.text_area("Solution *", placeholder="Proven solution for this issue...", height=150, key="solution")
+    
+    if st.button("💾 Add New Case to Knowledge Base", type="primary", use_container_width=True):
+        if topic and description and solution:
+            # Show indexing progress
+            with st.spinner("🔍 Indexing in knowledge base..."):
+                success = add_to_chroma_only(
+                    case_id=None,
+                    topic_name=topic,
+                    description=description,
+                    sentiment=sentiment,
+                    solution=solution
+                )
             
-        if st.session_state.form_reset:
-            topic = st.text_input("Topic Name *", placeholder="e.g., Billing Issue, Network Problem", key="reset_topic")
-            description = st.text_area("Description *", placeholder="Detailed description of the customer issue...", height=100, key="reset_description")
-            sentiment = st.selectbox("Customer Sentiment *", ["positive", "negative", "neutral"], key="reset_sentiment")
-            solution = st.text_area("Solution *", placeholder="Proven solution for this issue...", height=150, key="reset_solution")
-        else:
-            topic = st.text_input("Topic Name *", placeholder="e.g., Billing Issue, Network Problem", key="topic")
-            description = st.text_area("Description *", placeholder="Detailed description of the customer issue...", height=100, key="description")
-            sentiment = st.selectbox("Customer Sentiment *", ["positive", "negative", "neutral"], key="sentiment")
-            solution = st.text_area("Solution *", placeholder="Proven solution for this issue...", height=150, key="solution")
-        
-        if st.button("💾 Add New Case to Knowledge Base", type="primary", use_container_width=True):
-            if topic and description and solution:
-                # Show indexing progress
-                with st.spinner("🔍 Indexing in knowledge base..."):
-                    success = add_to_chroma_only(
-                        case_id=next_id,
-                        topic_name=topic,
-                        description=description,
-                        sentiment=sentiment,
-                        solution=solution
-                    )
-                    
-                    time.sleep(1)  # Simulate indexing time
-                
-                if success:
-                    st.success("✅ Case successfully indexed in knowledge base!")
-                    # Reset form by toggling the reset state
-                    st.session_state.form_reset = not st.session_state.form_reset
-                    st.rerun()
-                else:
-                    st.error("❌ Failed to add case to knowledge base")
+            if success:
+                invalidate_kb_cache()
+                st.success("✅ Case successfully indexed in knowledge base!")
+                # Reset form by toggling the reset state
+                st.session_state.form_reset = not st.session_state.form_reset
+                # Full rerun so the stats fragment shows the new case
+                st.rerun()
             else:
-                st.error("❌ Please fill all required fields (marked with *)")
-    
-    # Footer
-    st.markdown('<div class="footer">Built by: Siddharth Kulkarni</div>', unsafe_allow_html=True)
+                st.error("❌ Failed to add case to knowledge base")
+        else:
+            st.error("❌ Please fill all required fields (marked with *)")
+
+@st.cache_resource
+def get_worker_pool():
+    """Start the agent worker processes once per server process (AGENT_WORKERS=0 to use external workers)"""
+    cleanup_stale_uploads()
+    return start_worker_pool()
 
 def main():
     init_session_state()
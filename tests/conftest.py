@@ -0,0 +1,73 @@
+import os
+import hashlib
+import numpy as np
+import pytest
+
+# Every test gets its own stores under tmp_path - the committed data/ and logs/
+# are never touched - and Groq is the local fake server, so the suite runs
+# offline:
+#   python -m pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_AUDIO = os.path.join(REPO_DIR, "sample_audio", "audio1.mp3")
+
+STORE_PATHS = {
+    "CHROMA_DB_PATH": "chroma_db",
+    "CASE_DB_PATH": "cases.db",
+    "JOB_DB_PATH": "jobs.db",
+    "JOB_AUDIO_DIR": "job_audio",
+    "KB_ID_DB_PATH": "kb_ids.db",
+    "CHECKPOINT_DB_PATH": "checkpoints.db",
+    "METRICS_DIR": "metrics",
+    "LOG_DIR": "logs",
+}
+
+@pytest.fixture(autouse=True)
+def isolated_stores(tmp_path, monkeypatch):
+    """Point every store at tmp_path and drop the clients cached by earlier tests"""
+    import agentic_utils
+    import chroma_db_utils
+    import kb_index_utils
+
+    for key, name in STORE_PATHS.items():
+        monkeypatch.setenv(key, str(tmp_path / name))
+    monkeypatch.setenv("CHROMA_MODE", "persistent")
+
+    monkeypatch.setattr(agentic_utils, "_groq_client", None)
+    monkeypatch.setattr(agentic_utils, "_collection", None)
+    monkeypatch.setattr(agentic_utils, "_collection_name", None)
+    monkeypatch.setattr(agentic_utils, "_checkpointer", None)
+    # Leave pytest's log capture alone
+    monkeypatch.setattr(agentic_utils, "_logging_configured", True)
+    monkeypatch.setattr(kb_index_utils, "_pointer_cache", {"key": None, "state": None})
+    monkeypatch.setattr(chroma_db_utils, "_id_block", {"ids": [], "floor": 0})
+    return tmp_path
+
+@pytest.fixture
+def stub_embeddings(monkeypatch):
+    """Deterministic hashed vectors instead of the embedding model"""
+    import embedding_utils
+
+    def encode(self, texts, batch_size):
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(384).astype(np.float32)
+            vectors.append(vector / np.linalg.norm(vector))
+        return np.stack(vectors)
+
+    monkeypatch.setattr(embedding_utils.OnnxMiniLMEncoder, "encode", encode)
+
+@pytest.fixture
+def fake_groq(monkeypatch):
+    """Base URL of a local fake Groq API, with the client configured to use it"""
+    from fake_groq_server import start_fake_server
+
+    server, base_url = start_fake_server(latency_ms=1)
+    monkeypatch.setenv("GROQ_API_KEY", "fake-key")
+    monkeypatch.setenv("GROQ_BASE_URL", base_url)
+    monkeypatch.setenv("GROQ_RPM", "0")
+    monkeypatch.setenv("GROQ_TPM", "0")
+    yield base_url
+    server.shutdown()
+    server.server_close()
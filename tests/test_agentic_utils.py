@@ -0,0 +1,56 @@
+from collections import Counter
+from types import SimpleNamespace
+import audio_utils
+import agentic_utils
+from agentic_utils import run_agent_flow, resume_agent_flow, has_checkpoint
+from fake_groq_server import FAKE_RESPONSE
+from llm_client_utils import create_groq_client
+from conftest import SAMPLE_AUDIO
+
+class CountingGroq:
+    """Groq client against the fake server that counts calls and fails the first generations"""
+
+    def __init__(self, client, failing_generations):
+        self.client = client
+        self.failing_generations = failing_generations
+        self.calls = Counter()
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self._transcribe))
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+
+    def _transcribe(self, **kwargs):
+        self.calls["transcribe"] += 1
+        return self.client.audio.transcriptions.create(**kwargs)
+
+    def _chat(self, **kwargs):
+        if "Generate the response" in kwargs["messages"][0]["content"]:
+            self.calls["generate"] += 1
+            if self.calls["generate"] <= self.failing_generations:
+                raise RuntimeError("Generation unavailable")
+        else:
+            self.calls["extract"] += 1
+        return self.client.chat.completions.create(**kwargs)
+
+def test_resume_starts_at_the_first_missing_output(fake_groq, stub_embeddings, monkeypatch):
+    def broken_preprocessing(*args, **kwargs):
+        raise RuntimeError("ffmpeg unavailable")
+
+    # A non-fatal error before transcription must not send the resume back to the start
+    monkeypatch.setenv("AUDIO_PREPROCESSING", "true")
+    monkeypatch.setattr(audio_utils, "preprocess_audio", broken_preprocessing)
+    groq = CountingGroq(create_groq_client("fake-key"), failing_generations=2)
+    monkeypatch.setattr(agentic_utils, "get_groq_client", lambda: groq)
+
+    result = run_agent_flow(SAMPLE_AUDIO, request_id="request-1")
+    assert not result["generated_response"]
+    assert has_checkpoint("request-1")
+
+    result = resume_agent_flow("request-1")
+    assert not result["generated_response"]
+
+    result = resume_agent_flow("request-1")
+    assert result["generated_response"] == FAKE_RESPONSE
+    assert groq.calls == {"transcribe": 1, "extract": 1, "generate": 3}
+    assert [log["agent"] for log in result["agent_logs"]][0] == "Audio Preprocessing Agent"
+
+    # Complete - nothing left to resume
+    assert not has_checkpoint("request-1")
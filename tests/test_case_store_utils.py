@@ -0,0 +1,38 @@
+import threading
+from case_store_utils import create_case, get_case_status, update_case_status, update_case_statuses
+
+RESULT = {"extracted_info": {"overall_sentiment": "negative", "topic_name": "network_outage"}}
+
+def test_a_case_is_claimed_only_once():
+    case_id = create_case(RESULT)
+
+    assert update_case_status(case_id, "approved")
+    # A second engineer acting on the same case is refused
+    assert not update_case_status(case_id, "rejected")
+    assert get_case_status(case_id) == "approved"
+
+def test_concurrent_bulk_claims_move_each_case_once():
+    case_ids = [create_case(RESULT) for _ in range(20)]
+    claimed = []
+    claimed_lock = threading.Lock()
+
+    def claim():
+        moved = update_case_statuses(case_ids, "approved")
+        with claimed_lock:
+            claimed.extend(moved)
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(case_ids)
+
+def test_a_failed_knowledge_base_write_gives_the_case_back():
+    case_id = create_case(RESULT)
+    assert update_case_status(case_id, "approved")
+
+    assert update_case_status(case_id, "pending", expected_status="approved")
+    assert get_case_status(case_id) == "pending"
+    assert update_case_status(case_id, "approved")
@@ -0,0 +1,76 @@
+import random
+import threading
+import chromadb
+import chroma_db_utils
+from chroma_db_utils import (
+    allocate_case_ids, reserve_free_case_ids, add_cases_to_chroma, add_to_chroma_only, get_or_create_collection
+)
+
+CASE = {
+    "topic_name": "data_usage",
+    "description": "Mobile data runs out early",
+    "sentiment": "negative",
+    "solution": "Offer the Data Boost package"
+}
+
+def _run_threads(target, count):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def test_concurrent_allocations_never_share_an_id():
+    allocated = []
+    lock = threading.Lock()
+
+    def allocate(seed):
+        rng = random.Random(seed)
+        for _ in range(25):
+            case_ids = allocate_case_ids(rng.randint(1, 4))
+            with lock:
+                allocated.extend(case_ids)
+
+    _run_threads(allocate, 8)
+
+    assert len(allocated) == len(set(allocated))
+
+def test_reserved_ids_skip_ones_written_without_the_sequence(stub_embeddings):
+    collection = get_or_create_collection()
+    assert allocate_case_ids(1) == [1]
+    # Written behind the sequence's back, e.g. by a CSV load
+    collection.add(ids=["2", "3"], documents=["loaded from csv", "also loaded from csv"])
+
+    assert reserve_free_case_ids(collection, 2) == [4, 5]
+
+def test_added_cases_never_overwrite_each_other(stub_embeddings):
+    first_ids = add_cases_to_chroma([CASE, {**CASE, "topic_name": "roaming"}])
+    assert add_to_chroma_only(None, "billing", "Charged twice", "negative", "Refund the second charge")
+
+    collection = get_or_create_collection()
+    assert collection.count() == 3
+    topics = {metadata["topic_name"] for metadata in collection.get(include=["metadatas"])["metadatas"]}
+    assert topics == {"data_usage", "roaming", "billing"}
+    assert len(set(first_ids)) == 2
+
+def test_server_id_blocks_are_claimed_by_one_process_only(tmp_path, monkeypatch, stub_embeddings):
+    # http mode against an in-process store - add() keeps the first record the same way
+    client = chromadb.PersistentClient(path=str(tmp_path / "server"))
+    monkeypatch.setattr(chroma_db_utils, "get_chroma_client", lambda role="write": client)
+    monkeypatch.setenv("CHROMA_MODE", "http")
+    monkeypatch.setenv("KB_ID_BLOCK_SIZE", "5")
+    get_or_create_collection()
+
+    claimed = []
+    lock = threading.Lock()
+
+    def claim(_):
+        for _ in range(5):
+            case_ids = chroma_db_utils._claim_id_block(0)
+            with lock:
+                claimed.extend(case_ids)
+
+    _run_threads(claim, 6)
+
+    assert len(claimed) == 6 * 5 * 5
+    assert len(claimed) == len(set(claimed))
@@ -0,0 +1,55 @@
+import json
+import chromadb
+import pytest
+from chromadb.errors import NotFoundError
+import chroma_db_utils
+from chroma_db_utils import KB_COLLECTION_NAME
+from kb_index_utils import POINTER_COLLECTION, read_pointer, gc_versions, list_versions
+
+class PointerServer:
+    """Chroma client stand-in whose pointer collection lookup fails or returns metadata"""
+
+    def __init__(self, error=None, metadata=None):
+        self.error = error
+        self.metadata = metadata
+
+    def get_collection(self, name):
+        assert name == POINTER_COLLECTION
+        if self.error:
+            raise self.error
+        return type("Pointer", (), {"metadata": self.metadata})()
+
+@pytest.fixture
+def http_mode(monkeypatch):
+    """Switch to http mode and return a setter for the pointer server"""
+    monkeypatch.setenv("CHROMA_MODE", "http")
+
+    def use(server):
+        monkeypatch.setattr(chroma_db_utils, "get_chroma_client", lambda role="write": server)
+    return use
+
+def test_a_missing_pointer_collection_means_the_base_collection(http_mode):
+    http_mode(PointerServer(error=NotFoundError("Collection kb_active_pointer does not exist")))
+
+    pointer = read_pointer()
+
+    assert pointer["active"] == KB_COLLECTION_NAME
+    assert pointer["default"]
+
+def test_an_unreachable_server_is_not_taken_for_a_missing_pointer(http_mode):
+    http_mode(PointerServer(error=ConnectionError("Connection refused")))
+    with pytest.raises(ConnectionError):
+        read_pointer()
+
+    # Nothing was cached - the next read sees the real pointer
+    previous = [KB_COLLECTION_NAME]
+    http_mode(PointerServer(metadata={"active": f"{KB_COLLECTION_NAME}_v1", "previous": json.dumps(previous)}))
+    assert read_pointer() == {"active": f"{KB_COLLECTION_NAME}_v1", "previous": previous}
+
+def test_gc_keeps_every_version_without_a_pointer(isolated_stores):
+    client = chromadb.PersistentClient(path=str(isolated_stores / "chroma_db"))
+    for name in (KB_COLLECTION_NAME, f"{KB_COLLECTION_NAME}_v1", f"{KB_COLLECTION_NAME}_v2"):
+        client.create_collection(name, embedding_function=None)
+
+    assert gc_versions(keep=0, client=client) == []
+    assert len(list_versions(client)) == 3
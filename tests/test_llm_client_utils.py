@@ -0,0 +1,39 @@
+import time
+import pytest
+from groq import Groq
+from llm_client_utils import CircuitBreaker, CircuitOpenError, DeadlineExceededError, ResilientGroqClient
+
+MESSAGES = [{"role": "user", "content": "My data ran out early"}]
+
+def test_a_released_trial_lets_the_next_call_try_again():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    breaker.allow()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    breaker.release()
+    assert breaker.state == "open"
+    breaker.allow()
+    assert breaker.state == "half_open"
+
+def test_a_throttle_deadline_does_not_leave_the_breaker_half_open(fake_groq):
+    client = ResilientGroqClient(
+        Groq(api_key="fake-key", base_url=fake_groq, max_retries=0),
+        requests_per_minute=1, tokens_per_minute=0, max_retries=0,
+        breaker_threshold=1, breaker_reset_seconds=0.05
+    )
+    # Uses the only request the bucket holds for the next minute
+    client.chat.completions.create(model="llama-3.1-8b-instant", messages=MESSAGES)
+    client.breaker.record_failure()
+    time.sleep(0.1)
+
+    with pytest.raises(DeadlineExceededError):
+        client.chat.completions.create(model="llama-3.1-8b-instant", messages=MESSAGES, deadline=time.time() + 0.5)
+
+    assert client.breaker.state == "open"
+    # Past the cooldown - the next call gets its trial instead of a CircuitOpenError
+    client.breaker.allow()
@@ -0,0 +1,265 @@
+import os
+import sys
+import io
+import gc
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+from contextlib import redirect_stdout, redirect_stderr
+from collections import Counter, defaultdict
+
+# Headless load test of the Streamlit UI. Every widget interaction reruns the
+# whole script, so each scripted step below is one (or, with st.rerun, a few)
+# full reruns. Many sessions are driven through AppTest against a stubbed Groq
+# API and throwaway case/job/Chroma stores, and the report shows per step:
+# rerun latency, Chroma calls, file opens - and memory growth across sessions.
+#
+#   python ui_load_test.py --sessions 20
+#   python ui_load_test.py --stub-embeddings   # no embedding model needed (offline)
+
+APP_FILE = "streamlit_app.py"
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Calls that reach Chroma - client lookups included, they are not free either
+COLLECTION_METHODS = ("count", "get", "query", "peek", "add", "upsert", "update", "delete")
+CLIENT_METHODS = ("get_collection", "create_collection", "get_or_create_collection", "list_collections")
+
+class CallCounter:
+    """Counts Chroma calls and file opens for the rerun being measured"""
+
+    def __init__(self):
+        self.chroma = Counter()
+        self.opens = Counter()
+        self.active = False
+
+    def reset(self):
+        self.chroma.clear()
+        self.opens.clear()
+
+def instrument_chroma(counter):
+    """Wrap Chroma client and collection methods so every call is counted"""
+    from chromadb.api.client import Client
+    from chromadb.api.models.Collection import Collection
+
+    def wrap(cls, method_name, label):
+        original = getattr(cls, method_name)
+        def counted(*args, **kwargs):
+            if counter.active:
+                counter.chroma[label] += 1
+            return original(*args, **kwargs)
+        setattr(cls, method_name, counted)
+
+    for method_name in COLLECTION_METHODS:
+        wrap(Collection, method_name, f"collection.{method_name}")
+    for method_name in CLIENT_METHODS:
+        wrap(Client, method_name, f"client.{method_name}")
+
+def instrument_opens(counter):
+    """Count files opened from the repository during a rerun (sample audio, images, ...)"""
+    def hook(event, args):
+        if event != "open" or not counter.active or not isinstance(args[0], str):
+            return
+        path = os.path.abspath(args[0])
+        if path.startswith(REPO_DIR) and not path.endswith((".py", ".pyc")):
+            counter.opens[os.path.relpath(path, REPO_DIR)] += 1
+    # Audit hooks cannot be removed - the counter's active flag switches it off
+    sys.addaudithook(hook)
+
+def stub_embeddings():
+    """Deterministic hashed vectors instead of the embedding model"""
+    import numpy as np
+    import embedding_utils
+
+    def encode(self, texts, batch_size):
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(384).astype(np.float32)
+            vectors.append(vector / np.linalg.norm(vector))
+        return np.stack(vectors)
+
+    embedding_utils.OnnxMiniLMEncoder.encode = encode
+
+def prepare_environment(workdir, chroma_source):
+    """Point every store at workdir and Groq at the fake server - nothing real is touched"""
+    from fake_groq_server import start_fake_server
+
+    server, base_url = start_fake_server(latency_ms=20)
+    chroma_path = os.path.join(workdir, "chroma_db")
+    if os.path.exists(chroma_source):
+        shutil.copytree(chroma_source, chroma_path)
+    os.environ.update({
+        "GROQ_API_KEY": "fake-key",
+        "GROQ_BASE_URL": base_url,
+        "GROQ_RPM": "0",
+        "GROQ_TPM": "0",
+        "CHROMA_MODE": "persistent",
+        "CHROMA_DB_PATH": chroma_path,
+        "CASE_DB_PATH": os.path.join(workdir, "cases.db"),
+        "JOB_DB_PATH": os.path.join(workdir, "jobs.db"),
+        "JOB_AUDIO_DIR": os.path.join(workdir, "job_audio"),
+        "CHECKPOINT_DB_PATH": os.path.join(workdir, "checkpoints.db"),
+        "LOG_DIR": os.path.join(workdir, "logs"),
+        # Jobs are never submitted - file uploads cannot be scripted in AppTest
+        "AGENT_WORKERS": "0",
+    })
+    return server
+
+def seed_cases(count):
+    """Run one sample call through the agent graph (stubbed Groq) and store it count times"""
+    from agentic_utils import run_agent_flow
+    from case_store_utils import create_case
+
+    sample_dir = os.path.join(REPO_DIR, "sample_audio")
+    sample_file = sorted(os.listdir(sample_dir))[0]
+    result = run_agent_flow(os.path.join(sample_dir, sample_file))
+    stored = result["final_output"].to_dict()
+    return [create_case(stored, filename=sample_file) for _ in range(count)]
+
+def _select_page(at, label):
+    radio = at.sidebar.radio[1]
+    radio.set_value(next(option for option in radio.options if label in option))
+
+def _widget(at, kind, *keys):
+    """First widget of kind with one of keys - the KB form switches keys after every add"""
+    for key in keys:
+        try:
+            return getattr(at, kind)(key=key)
+        except KeyError:
+            continue
+    raise KeyError(f"No {kind} with key in {keys}")
+
+def _button(at, text):
+    return next(button for button in at.button if text in button.label)
+
+def customer_steps(case_id):
+    """Customer browsing the pages and reading a finished case"""
+    return [
+        ("customer: open app", lambda at: None),
+        ("customer: architecture", lambda at: _select_page(at, "Architecture")),
+        ("customer: support page", lambda at: _select_page(at, "Customer Support")),
+        ("customer: view result", lambda at: at.session_state.__setitem__("current_case_id", case_id)),
+        ("customer: about", lambda at: _select_page(at, "About")),
+    ]
+
+def engineer_steps(session_number):
+    """Support engineer reviewing a pending case, then adding a case by hand"""
+    return [
+        ("engineer: open app", lambda at: None),
+        ("engineer: switch role", lambda at: at.sidebar.radio[0].set_value("Support Engineer")),
+        ("engineer: review page", lambda at: _select_page(at, "Customer Support")),
+        ("engineer: edit response", lambda at: at.text_area(key="editable_response").input(f"Edited answer {session_number}")),
+        ("engineer: approve", lambda at: _button(at, "Approve & Add").click()),
+        ("engineer: knowledge base", lambda at: _select_page(at, "Knowledge Base")),
+        ("engineer: type topic", lambda at: _widget(at, "text_input", "topic", "reset_topic").input(f"load_test_{session_number}")),
+        ("engineer: type description", lambda at: _widget(at, "text_area", "description", "reset_description").input("Customer cannot roam abroad.")),
+        ("engineer: pick sentiment", lambda at: _widget(at, "selectbox", "sentiment", "reset_sentiment").select("negative")),
+        ("engineer: type solution", lambda at: _widget(at, "text_area", "solution", "reset_solution").input("Enable roaming in the app.")),
+        ("engineer: add case", lambda at: _button(at, "Add New Case").click()),
+    ]
+
+def rss_bytes():
+    """Resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def run_session(steps, counter, timings, calls, opens, timeout):
+    """Drive one fresh session through steps, recording each step's rerun"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(REPO_DIR, APP_FILE), default_timeout=timeout)
+    for label, action in steps:
+        action(at)
+        counter.reset()
+        counter.active = True
+        started = time.perf_counter()
+        try:
+            # The app and chroma_db_utils print on every rerun - keep the report readable
+            with redirect_stdout(io.StringIO()):
+                at.run()
+        finally:
+            counter.active = False
+        timings[label].append((time.perf_counter() - started) * 1000)
+        calls[label].append(dict(counter.chroma))
+        opens[label].append(dict(counter.opens))
+        if at.exception:
+            raise RuntimeError(f"{label}: {at.exception[0].message}")
+    return at
+
+def report(timings, calls, opens):
+    from benchmarks import _latency_summary
+
+    print(f"{'step':<30} {'reruns':>6} {'p50 ms':>8} {'p95 ms':>8} {'chroma/run':>11} {'opens/run':>10}  chroma calls")
+    for label, values in timings.items():
+        summary = _latency_summary(values)
+        per_run, opened = Counter(), Counter()
+        for entry in calls[label]:
+            per_run.update(entry)
+        for entry in opens[label]:
+            opened.update(entry)
+        runs = len(values)
+        breakdown = ", ".join(f"{name} {count / runs:.1f}" for name, count in per_run.most_common())
+        print(
+            f"{label:<30} {runs:6d} {summary['p50']:8.1f} {summary['p95']:8.1f} "
+            f"{sum(per_run.values()) / runs:11.1f} {sum(opened.values()) / runs:10.1f}  {breakdown}"
+        )
+        if opened:
+            print(f"{'':<30} opens: " + ", ".join(f"{path} {count / runs:.1f}" for path, count in opened.most_common(4)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Streamlit load test with stubbed Groq")
+    parser.add_argument("--sessions", type=int, default=10, help="Sessions per role")
+    parser.add_argument("--warmup", type=int, default=1, help="Sessions per role left out of the memory trend")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds allowed per rerun")
+    parser.add_argument("--chroma-db", default=os.path.join(REPO_DIR, "data", "chroma_db"), help="Knowledge base to copy")
+    parser.add_argument("--stub-embeddings", action="store_true", help="Hashed vectors instead of the embedding model")
+    args = parser.parse_args(argv)
+
+    os.chdir(REPO_DIR)
+    # Deprecation and bare-mode notices are logged on every rerun - set before streamlit is imported
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+    workdir = tempfile.mkdtemp(prefix="ui_load_test_")
+    server = prepare_environment(workdir, args.chroma_db)
+    try:
+        if args.stub_embeddings:
+            stub_embeddings()
+        counter = CallCounter()
+        instrument_chroma(counter)
+        instrument_opens(counter)
+
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            case_ids = seed_cases(args.sessions + 2)
+        print(f"Seeded {len(case_ids)} pending cases in {workdir}")
+
+        timings, calls, opens = defaultdict(list), defaultdict(list), defaultdict(list)
+        memory = []
+        for session_number in range(args.sessions):
+            run_session(customer_steps(case_ids[-1]), counter, timings, calls, opens, args.timeout)
+            run_session(engineer_steps(session_number), counter, timings, calls, opens, args.timeout)
+            gc.collect()
+            memory.append((rss_bytes(), len(gc.get_objects())))
+
+        report(timings, calls, opens)
+
+        trend = memory[args.warmup:] if len(memory) > args.warmup + 1 else memory
+        sessions = max(len(trend) - 1, 1)
+        rss_growth = (trend[-1][0] - trend[0][0]) / sessions
+        object_growth = (trend[-1][1] - trend[0][1]) / sessions
+        print(
+            f"\nMemory after {len(memory)} session pairs: RSS {memory[-1][0] / 1e6:.1f} MB, "
+            f"growth {rss_growth / 1024:+.1f} KB and {object_growth:+.0f} GC objects per session pair "
+            f"(excluding {len(memory) - len(trend)} warm-up)"
+        )
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import os
+import time
+import shutil
+import logging
+import tempfile
+from contextlib import contextmanager
+from chroma_db_utils import get_env_var
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = ('.m4a', '.mp3', '.wav', '.ogg')
+
+def get_upload_dir():
+    """Directory where uploads are staged before they are queued"""
+    upload_dir = get_env_var('UPLOAD_DIR', 'data/uploads')
+    os.makedirs(upload_dir, exist_ok=True)
+    return upload_dir
+
+def stage_upload(uploaded_file, chunk_size=None):
+    """Stream an uploaded file to a unique path on disk and return that path
+
+    The file is copied in fixed-size chunks so at most chunk_size extra bytes
+    are held per upload, and every call gets its own file so concurrent
+    sessions never overwrite each other.
+    """
+    if chunk_size is None:
+        chunk_size = int(get_env_var('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    if extension not in ALLOWED_EXTENSIONS:
+        raise ValueError(f"Unsupported audio format: {extension or uploaded_file.name}")
+
+    fd, staged_path = tempfile.mkstemp(prefix="upload_", suffix=extension, dir=get_upload_dir())
+    try:
+        uploaded_file.seek(0)
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(uploaded_file, f, chunk_size)
+    except Exception:
+        remove_staged_file(staged_path)
+        raise
+    return staged_path
+
+def remove_staged_file(staged_path):
+    """Delete a staged file if it is still there"""
+    try:
+        os.remove(staged_path)
+    except FileNotFoundError:
+        pass
+
+@contextmanager
+def staged_upload(uploaded_file, chunk_size=None):
+    """Stage an upload for the duration of a with-block and always clean it up
+
+    Consumers that take ownership of the file (e.g. by moving it) leave nothing
+    behind to remove, so the cleanup is a no-op for them.
+    """
+    staged_path = stage_upload(uploaded_file, chunk_size)
+    try:
+        yield staged_path
+    finally:
+        remove_staged_file(staged_path)
+
+def cleanup_stale_uploads(max_age_seconds=None):
+    """Remove staged uploads left behind by crashed sessions"""
+    if max_age_seconds is None:
+        max_age_seconds = int(get_env_var('UPLOAD_MAX_AGE_SECONDS', 3600))
+
+    upload_dir = get_upload_dir()
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for item in os.listdir(upload_dir):
+        item_path = os.path.join(upload_dir, item)
+        try:
+            if item.startswith("upload_") and os.path.getmtime(item_path) < cutoff:
+                os.remove(item_path)
+                removed += 1
+        except OSError as e:
+            logger.warning(f"Error cleaning up {item_path}: {e}")
+
+    if removed:
+        logger.info(f"Cleaned up {removed} stale upload(s)")
+    return removed